@@ -0,0 +1,317 @@
+"""
+Period aggregation for the report routes.
+
+Short ranges are summed by the database itself (GROUP BY through SQLAlchemy).
+Long ranges (a year, several years by category, ...) go to DuckDB when it is
+installed: an embedded columnar engine that either attaches the same database
+read-only (DuckDB's sqlite/postgres extensions) or reads a Parquet export made
+with `python analytics.py export <folder>` (GPS_ANALYTICS_PARQUET).
+
+Neither Flask nor pandas is needed to run the queries.
+"""
+
+import json
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+from sqlalchemy import func, extract, cast, Date, DateTime, Float, Integer, String
+from sqlalchemy.engine import make_url
+
+from datastore.models import SiteActivity, Vehicle, VehicleActivity
+from datastore.version import data_version
+
+METRICS = ('hours_before_20h', 'hours_after_20h', 'km_before', 'km_after')
+GROUP_KEYS = ('vehicle', 'site', 'category', 'date', 'month')
+ENGINES = ('auto', 'sql', 'duckdb')
+# Ranges of at least this many days use DuckDB in 'auto' mode
+DUCKDB_MIN_DAYS = 92
+
+# After a DuckDB failure in 'auto' mode, queries use SQL for this many
+# seconds, then DuckDB is tried again (GPS_ANALYTICS_RETRY_SECONDS)
+DUCKDB_RETRY_SECONDS = int(os.environ.get('GPS_ANALYTICS_RETRY_SECONDS', 300))
+# Written next to the Parquet files: the data version they were exported at
+EXPORT_INFO = 'export.json'
+
+_duckdb_failed_at = None
+_stale_warned = None
+
+
+def duckdb_available():
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def choose_engine(start, end, engine='auto', min_days=DUCKDB_MIN_DAYS):
+    """Return 'sql' or 'duckdb' for a query over [start, end]."""
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown engine {engine!r}. Choose from: {", ".join(ENGINES)}')
+    if engine != 'auto':
+        return engine
+    if (end - start).days + 1 >= min_days and not _duckdb_cooling_down() and duckdb_available():
+        return 'duckdb'
+    return 'sql'
+
+
+def _duckdb_cooling_down():
+    return _duckdb_failed_at is not None and time.monotonic() - _duckdb_failed_at < DUCKDB_RETRY_SECONDS
+
+
+def export_version(parquet):
+    """Data version a Parquet export was made at, or None (unknown or older export)."""
+    try:
+        with open(Path(parquet) / EXPORT_INFO, encoding='utf-8') as f:
+            return json.load(f)['data_version']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _check_group_by(group_by):
+    group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+    unknown = [key for key in group_by if key not in GROUP_KEYS]
+    if unknown or not group_by:
+        raise ValueError(f'group_by must be a list of: {", ".join(GROUP_KEYS)}')
+    return group_by
+
+
+def _source(group_by, sites):
+    """site_activity when grouping or filtering by site, else vehicle_activity."""
+    return SiteActivity if 'site' in group_by or sites is not None else VehicleActivity
+
+
+def sql_totals(session, start, end, group_by=('vehicle',), sites=None):
+    """Sum the metrics over [start, end] with one GROUP BY query in the database.
+    `sites` restricts the sum to these sites (read from site_activity).
+    'days' counts the vehicle-days of each group.
+    """
+    group_by = _check_group_by(group_by)
+    A = _source(group_by, sites)
+    columns = []
+    for key in group_by:
+        if key == 'vehicle':
+            columns.append(A.vehicle_code.label('vehicle'))
+        elif key == 'site':
+            columns.append(A.site.label('site'))
+        elif key == 'category':
+            columns.append(func.coalesce(Vehicle.category, '').label('category'))
+        elif key == 'date':
+            columns.append(A.date.label('date'))
+        elif key == 'month':
+            # extract() compiles to strftime on SQLite and EXTRACT on PostgreSQL
+            columns.append(extract('year', A.date).label('year'))
+            columns.append(extract('month', A.date).label('month'))
+    sums = [func.sum(getattr(A, m)).label(m) for m in METRICS]
+    # site_activity has a row per site: count each vehicle-day once
+    days = func.count() if A is VehicleActivity else \
+        func.count(func.distinct(A.vehicle_code + '|' + cast(A.date, String)))
+
+    query = session.query(*columns, *sums, days.label('days')).filter(
+        A.date >= start,
+        A.date <= end
+    )
+    if sites is not None:
+        query = query.filter(A.site.in_(sorted(set(sites))))
+    if 'category' in group_by:
+        query = query.outerjoin(Vehicle, Vehicle.id == A.vehicle_code)
+    query = query.group_by(*columns).order_by(*columns)
+
+    rows = []
+    for row in query:
+        values = row._asdict()
+        if 'month' in group_by:
+            values['month'] = f"{int(values.pop('year')):04d}-{int(values['month']):02d}"
+        rows.append({key: values[key] for key in group_by} | {m: values[m] or 0.0 for m in METRICS} | {'days': values['days']})
+    return rows
+
+
+def _sql_literal(text):
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+TABLES = ('vehicle_activity', 'site_activity', 'vehicle')
+
+
+def duckdb_connect(db_url, parquet=None):
+    """Open an in-memory DuckDB connection exposing a view per table of TABLES."""
+    import duckdb
+
+    con = duckdb.connect()
+    if parquet:
+        folder = Path(parquet)
+        for table in TABLES:
+            if not (folder / (table + '.parquet')).exists():
+                continue  # export made before the table existed
+            con.execute(f'CREATE VIEW {table} AS SELECT * FROM read_parquet({_sql_literal(folder / (table + ".parquet"))})')
+        return con
+
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    if backend == 'sqlite':
+        con.execute(f'ATTACH {_sql_literal(url.database)} AS gps (TYPE sqlite, READ_ONLY)')
+    elif backend == 'postgresql':
+        dsn = ' '.join(f'{k}={v}' for k, v in (
+            ('host', url.host), ('port', url.port), ('dbname', url.database),
+            ('user', url.username), ('password', url.password)
+        ) if v)
+        con.execute(f'ATTACH {_sql_literal(dsn)} AS gps (TYPE postgres, READ_ONLY)')
+    else:
+        raise ValueError(f'DuckDB cannot attach a {backend} database; use a Parquet export')
+    for table in TABLES:
+        con.execute(f'CREATE VIEW {table} AS SELECT * FROM gps.{table}')
+    return con
+
+
+def duckdb_totals(db_url, start, end, group_by=('vehicle',), parquet=None, sites=None):
+    """Same result as sql_totals(), computed by DuckDB."""
+    group_by = _check_group_by(group_by)
+    expressions = {
+        'vehicle': 'a.vehicle_code',
+        'site': 'a.site',
+        'category': "coalesce(v.category, '')",
+        'date': 'CAST(a.date AS DATE)',
+        'month': "strftime(CAST(a.date AS DATE), '%Y-%m')",
+    }
+    select = ', '.join(f'{expressions[key]} AS {key}' for key in group_by)
+    sums = ', '.join(f'coalesce(sum(a.{m}), 0) AS {m}' for m in METRICS)
+    keys = ', '.join(str(i + 1) for i in range(len(group_by)))
+    params = sorted(set(sites)) if sites is not None else []
+    site_filter = f'AND a.site IN ({", ".join("?" for _ in params) or "NULL"}) ' if sites is not None else ''
+    source = _source(group_by, sites)
+    days = 'count(*)' if source is VehicleActivity else 'count(DISTINCT (a.vehicle_code, CAST(a.date AS DATE)))'
+    sql = (
+        f'SELECT {select}, {sums}, {days} AS days '
+        f'FROM {source.__tablename__} a LEFT JOIN vehicle v ON v.id = a.vehicle_code '
+        f'WHERE CAST(a.date AS DATE) BETWEEN ? AND ? {site_filter}'
+        f'GROUP BY {keys} ORDER BY {keys}'
+    )
+    con = duckdb_connect(db_url, parquet)
+    try:
+        cursor = con.execute(sql, [start, end, *params])
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+    finally:
+        con.close()
+
+
+def period_totals(session, start, end, group_by=('vehicle',), engine='auto',
+                  min_days=DUCKDB_MIN_DAYS, parquet=None, sites=None):
+    """Sum the metrics over [start, end] grouped by `group_by`, optionally only for `sites`.
+    Returns (rows, engine used). In 'auto' mode a DuckDB failure (e.g. the
+    sqlite extension cannot be installed, a locked file) falls back to the
+    SQL engine for DUCKDB_RETRY_SECONDS, and a Parquet export older than the
+    data (uploads or deletes since the export) is not used.
+    """
+    global _duckdb_failed_at, _stale_warned
+    chosen = choose_engine(start, end, engine, min_days)
+    if chosen == 'duckdb' and parquet and engine == 'auto':
+        exported, live = export_version(parquet), data_version(session)
+        if exported != live:
+            chosen = 'sql'
+            if _stale_warned != (exported, live):
+                _stale_warned = (exported, live)
+                print(f'⚠️  Parquet export {parquet} is stale (data version {exported}, now {live}); '
+                      f'using SQL aggregation until it is exported again')
+    if chosen == 'duckdb':
+        db_url = session.get_bind().url.render_as_string(hide_password=False)
+        try:
+            return duckdb_totals(db_url, start, end, group_by, parquet, sites), 'duckdb'
+        except Exception as e:
+            if engine == 'duckdb':
+                raise
+            _duckdb_failed_at = time.monotonic()
+            print(f'⚠️  DuckDB unavailable, using SQL aggregation for {DUCKDB_RETRY_SECONDS} s: {e}')
+    return sql_totals(session, start, end, group_by, sites), 'sql'
+
+
+def vehicle_summary(rows):
+    """Turn per-vehicle rows into the {vehicle: {metric: total}} dict used by the PDF builders."""
+    return {row['vehicle']: {m: row[m] for m in METRICS} for row in rows}
+
+
+def site_groups(rows):
+    """Turn per (site, vehicle) rows into {site: {vehicle: {metric: total}}} for the PDF builders."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(row['site'] or '-', {})[row['vehicle']] = {m: row[m] for m in METRICS}
+    return groups
+
+
+def _duckdb_type(sa_type):
+    if isinstance(sa_type, DateTime):
+        return 'TIMESTAMP'
+    if isinstance(sa_type, Date):
+        return 'DATE'
+    if isinstance(sa_type, Integer):
+        return 'BIGINT'
+    if isinstance(sa_type, Float):
+        return 'DOUBLE'
+    return 'VARCHAR'
+
+
+def export_parquet(session, folder, chunk_rows=100000):
+    """Write one Parquet file per table of TABLES to `folder` for DuckDB,
+    and EXPORT_INFO with the data version. Rows are streamed in chunks, so
+    the export runs in bounded memory.
+    """
+    import duckdb
+    import pandas as pd
+
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    # Read first: a write during the export makes it look stale, never fresh
+    version = data_version(session)
+    con = duckdb.connect()
+    counts = {}
+    try:
+        for model in (VehicleActivity, SiteActivity, Vehicle):
+            table = model.__tablename__
+            query = session.query(*model.__table__.columns).order_by(*model.__table__.primary_key.columns)
+            counts[table] = 0
+            # Explicit column types, so empty tables still export correctly
+            ddl = ', '.join(f'{c.name} {_duckdb_type(c.type)}' for c in model.__table__.columns)
+            con.execute(f'CREATE TABLE {table} ({ddl})')
+            for chunk in pd.read_sql(query.statement, session.connection(), chunksize=chunk_rows):
+                con.register('chunk', chunk)
+                con.execute(f'INSERT INTO {table} BY NAME SELECT * FROM chunk')
+                con.unregister('chunk')
+                counts[table] += len(chunk)
+            con.execute(f'COPY {table} TO {_sql_literal(folder / (table + ".parquet"))} (FORMAT parquet)')
+    finally:
+        con.close()
+    with open(folder / EXPORT_INFO, 'w', encoding='utf-8') as f:
+        json.dump({'data_version': version, 'exported_at': datetime.utcnow().isoformat(), 'rows': counts}, f)
+    return counts
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from datastore import session_scope
+
+    p = argparse.ArgumentParser(description="Analytics helpers (DuckDB)")
+    sub = p.add_subparsers(dest='command', required=True)
+    exp = sub.add_parser('export', help="Export the tables to Parquet for GPS_ANALYTICS_PARQUET")
+    exp.add_argument("folder", help="Output folder")
+    q = sub.add_parser('query', help="Print totals over a date range")
+    q.add_argument("start", type=date.fromisoformat)
+    q.add_argument("end", type=date.fromisoformat)
+    q.add_argument("--group-by", nargs='+', default=['vehicle'], choices=GROUP_KEYS)
+    q.add_argument("--site", nargs='+', help="Only these sites (Chantier)")
+    q.add_argument("--engine", default='auto', choices=ENGINES)
+    q.add_argument("--parquet", default=os.environ.get('GPS_ANALYTICS_PARQUET'), help="Parquet export folder")
+    args = p.parse_args()
+
+    with session_scope() as session:
+        if args.command == 'export':
+            for table, n in export_parquet(session, args.folder).items():
+                print(f"✓ {table}: {n} rows")
+        else:
+            rows, used = period_totals(session, args.start, args.end, args.group_by, args.engine,
+                                       parquet=args.parquet, sites=args.site)
+            print(f"{len(rows)} group(s) via {used}")
+            for row in rows:
+                print('  ' + '  '.join(f'{k}={round(v, 2) if isinstance(v, float) else v}' for k, v in row.items()))
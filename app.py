@@ -1,40 +1,167 @@
 import os
+import json
+import functools
+import threading
+import time
 from pathlib import Path
 from flask import Flask, render_template, request, send_file, jsonify
 from werkzeug.utils import secure_filename
-from report_logic import load_file, process_dataframe, generate_reports, format_decimal_hours
 from models import db, VehicleActivity, Vehicle
+from instrumentation import StageTimer, profiled
+import metrics
+import database
+import uploads
+import http_cache
+import analytics
+from datastore import database_url, existing_dates, store_daily_activity, sync_vehicle_registry, \
+    delete_activity, update_cumulative, range_totals, cumulative_missing, intervals_enabled, sites_enabled, \
+    create_missing_columns, create_missing_indexes, vehicle_timeline, vehicle_totals, list_vehicles, activity_dates, \
+    data_version, bump_data_version, ensure_data_version, request_metrics_enabled, request_metrics_days, \
+    store_request_metric, prune_request_metrics
 import tempfile
-from datetime import datetime
-import pandas as pd
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-import io
+from datetime import datetime, timedelta
+# pandas (via report_logic) and reportlab (via pdf_reports) are imported inside
+# the routes that need them, so startup and the JSON routes don't pay for them
 
 app = Flask(__name__)
+# Uploads are parsed from memory, spilling to an unnamed temp file in
+# UPLOAD_FOLDER only above UPLOAD_SPOOL_BYTES (GPS_UPLOAD_SPOOL_MB)
+app.request_class = uploads.UploadRequest
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max upload
 app.config['UPLOAD_FOLDER'] = Path(tempfile.gettempdir()) / 'gps_reports'
+app.config['UPLOAD_SPOOL_BYTES'] = uploads.SPOOL_BYTES
 app.config['OUTPUT_FOLDER'] = Path(tempfile.gettempdir()) / 'gps_reports_output'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///gps_reports.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url()  # GPS_DATABASE_URL or instance/gps_reports.db
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])  # PostgreSQL pool
+# SQLite tuning applied on every connection (see database.SQLITE_PROFILES)
+app.config['SQLITE_PROFILE'] = os.environ.get('GPS_SQLITE_PROFILE', 'performance')
+app.config['SQLITE_PRAGMAS'] = database.parse_pragmas(os.environ.get('GPS_SQLITE_PRAGMAS'))
+# Keep the parsed Course intervals so aggregates can be recomputed (recompute_activity.py)
+app.config['STORE_INTERVALS'] = intervals_enabled()
+app.config['STORE_SITES'] = sites_enabled()
+# Period aggregation engine: 'auto' uses DuckDB (if installed) for ranges of at least
+# ANALYTICS_MIN_DAYS days, optionally on a Parquet export (python analytics.py export)
+app.config['ANALYTICS_ENGINE'] = os.environ.get('GPS_ANALYTICS_ENGINE', 'auto')
+app.config['ANALYTICS_MIN_DAYS'] = int(os.environ.get('GPS_ANALYTICS_MIN_DAYS', analytics.DUCKDB_MIN_DAYS))
+app.config['ANALYTICS_PARQUET'] = os.environ.get('GPS_ANALYTICS_PARQUET') or None
+# Profiles are written only when enabled here AND requested with an X-Profile header
+app.config['PROFILE_FOLDER'] = Path(tempfile.gettempdir()) / 'gps_reports_profiles'
+app.config['PROFILING_ENABLED'] = os.environ.get('GPS_PROFILING', '0') == '1'
+# Uploads processed at once per worker process; more wait up to UPLOAD_QUEUE_TIMEOUT seconds
+app.config['UPLOAD_CONCURRENCY'] = int(os.environ.get('GPS_UPLOAD_CONCURRENCY', 1))
+app.config['UPLOAD_QUEUE_TIMEOUT'] = int(os.environ.get('GPS_UPLOAD_QUEUE_TIMEOUT', 120))
+# gzip/brotli of JSON and CSV responses (GPS_COMPRESS_RESPONSES=0 when a proxy compresses)
+app.config['COMPRESS_RESPONSES'] = os.environ.get('GPS_COMPRESS_RESPONSES', '1') == '1'
+# Per-request timings kept in request_metric (GPS_REQUEST_METRICS, GPS_REQUEST_METRICS_DAYS)
+app.config['REQUEST_METRICS'] = request_metrics_enabled()
+app.config['REQUEST_METRICS_DAYS'] = request_metrics_days()
+# Reuse generated reports while the data is unchanged (GPS_REPORT_CACHE=0 to always generate)
+app.config['REPORT_CACHE'] = os.environ.get('GPS_REPORT_CACHE', '1') == '1'
 
 # Create folders
 app.config['UPLOAD_FOLDER'].mkdir(parents=True, exist_ok=True)
 app.config['OUTPUT_FOLDER'].mkdir(parents=True, exist_ok=True)
 
 db.init_app(app)
+database.init_app(app, db)
+metrics.init_app(app)
+# ETags of the read routes follow the data version (bumped by every write)
+http_cache.init_app(app, lambda: data_version(db.session))
 
 with app.app_context():
     db.create_all()
+    for name in create_missing_columns(db.engine):
+        print(f"✓ Added column {name}")
+    for name in create_missing_indexes(db.engine):
+        print(f"✓ Created index {name}")
+    ensure_data_version(db.engine)
+    if cumulative_missing(db.session):
+        # First start after adding vehicle_cumulative: build it from the stored activity
+        print(f"✓ Built cumulative totals ({update_cumulative(db.session)} rows)")
+        db.session.commit()
 
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
+# gzip/zstd-compressed exports (report.csv.gz) and zip archives of exports
+COMPRESSED_EXTENSIONS = {'gz', 'zst', 'zstd'}
+ARCHIVE_EXTENSIONS = {'zip'}
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    parts = filename.lower().rsplit('.', 2)[1:]
+    if parts and parts[-1] in ARCHIVE_EXTENSIONS:
+        return True
+    if parts and parts[-1] in COMPRESSED_EXTENSIONS:
+        parts.pop()
+    return bool(parts) and parts[-1] in ALLOWED_EXTENSIONS
+
+# Items per page of the list routes (?limit=, capped at MAX_PAGE_SIZE);
+# the next page is requested with ?cursor=<the response's next>
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def page_limit():
+    return min(max(int(request.args.get('limit', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+
+# Uploads are CPU-heavy (pandas); capping them per worker keeps the other
+# threads free to answer report reads
+upload_slots = threading.BoundedSemaphore(app.config['UPLOAD_CONCURRENCY'])
+
+def upload_slot(view):
+    """Run `view` only while holding one of the worker's upload slots."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not upload_slots.acquire(timeout=app.config['UPLOAD_QUEUE_TIMEOUT']):
+            return jsonify({'error': 'Server busy processing other uploads, please retry in a moment'}), 503
+        try:
+            return view(*args, **kwargs)
+        finally:
+            upload_slots.release()
+    return wrapper
+
+# Old request_metric rows are deleted at most this often per process
+METRICS_PRUNE_SECONDS = 3600
+_metrics_pruned_at = float('-inf')
+
+def record_metrics(route, timings, status=200):
+    """Store a request's stage timings in the request_metric table (best effort),
+    pruning rows older than REQUEST_METRICS_DAYS at most once an hour."""
+    global _metrics_pruned_at
+    metrics.observe_pipeline(route, timings, status)
+    if not app.config['REQUEST_METRICS']:
+        return
+    try:
+        store_request_metric(db.session, route, timings, status)
+        if time.monotonic() - _metrics_pruned_at >= METRICS_PRUNE_SECONDS:
+            prune_request_metrics(db.session, app.config['REQUEST_METRICS_DAYS'])
+            _metrics_pruned_at = time.monotonic()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+
+def period_summary(start, end, group_by=('vehicle',), engine=None, sites=None):
+    """Totals over [start, end] from the configured analytics engine; returns (rows, engine used)."""
+    return analytics.period_totals(
+        db.session, start, end, group_by,
+        engine or app.config['ANALYTICS_ENGINE'],
+        app.config['ANALYTICS_MIN_DAYS'],
+        app.config['ANALYTICS_PARQUET'],
+        sites
+    )
+
+def site_options(data):
+    """Site filter and grouping of a period report request: "site" (a name or
+    a list of names) and "by_site" (one row per site and vehicle).
+    Returns (sites or None, by_site, filename suffix)."""
+    sites = data.get('site')
+    if isinstance(sites, str):
+        sites = [sites]
+    by_site = bool(data.get('by_site'))
+    suffix = ''
+    if sites:
+        suffix += '_' + secure_filename('-'.join(sites))
+    if by_site:
+        suffix += '_by-site'
+    return sites, by_site, suffix
 
 @app.route('/')
 def index():
@@ -44,7 +171,14 @@ def index():
 def serve_static(filename):
     return send_file(Path(__file__).parent / 'static' / filename)
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Expose in-process counters in the Prometheus text format."""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/upload', methods=['POST'])
+@upload_slot
+@profiled
 def upload_file():
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
@@ -55,86 +189,91 @@ def upload_file():
         return jsonify({'error': 'No selected file'}), 400
     
     if not allowed_file(file.filename):
-        return jsonify({'error': f'Invalid file type. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
+        return jsonify({'error': f'Invalid file type. Allowed: {", ".join(sorted(ALLOWED_EXTENSIONS))}, '
+                                 f'compressed ({", ".join(sorted(COMPRESSED_EXTENSIONS))}) or zip'}), 400
     
+    timer = StageTimer()
     try:
-        # Save uploaded file
-        filename = secure_filename(file.filename)
-        filepath = Path(app.config['UPLOAD_FOLDER']) / filename
-        file.save(str(filepath))
-        
-        # Load and process the file
-        df = load_file(filepath)
-        processed = process_dataframe(df, include_date=True)
+        # Parse straight from the request's spool; it was hashed while received
+        digest = uploads.upload_digest(file)
+        timer.count('spooled_to_disk', uploads.spooled_to_disk(file))
+        from report_logic import load_file, process_dataframe
+        with timer.stage('load_file'):
+            df = load_file(file.stream, name=secure_filename(file.filename))
+        # Form fields merge_overlaps / fix_durations (1 or 0) override GPS_MERGE_OVERLAPS / GPS_FIX_DURATIONS
+        merge = request.form.get('merge_overlaps')
+        fix = request.form.get('fix_durations')
+        processed, intervals, *extra = process_dataframe(df, include_date=True, timer=timer, return_intervals=True,
+                                                           return_metrics=app.config['STORE_SITES'],
+                                                           merge_overlaps=None if merge is None else merge == '1',
+                                                           fix_durations=None if fix is None else fix == '1')
+        if not app.config['STORE_INTERVALS']:
+            intervals = None
+        sites = extra[0]['sites'] if extra else None
         
         # First, check for duplicate dates
-        dates_to_add = set()
-        dates_existing = set()
-        
-        for _, row in processed.iterrows():
-            vehicle = row['vehicle']
-            day_map = row['day_map']
-            if day_map:
-                for (year, month, day), metrics in day_map.items():
-                    date_obj = datetime(year, month, day).date()
-                    dates_to_add.add(date_obj)
-                    
-                    # Check if this date-vehicle combo already exists
-                    existing = VehicleActivity.query.filter_by(
-                        date=date_obj,
-                        vehicle_code=vehicle
-                    ).first()
-                    
-                    if existing:
-                        dates_existing.add(date_obj)
+        with timer.stage('duplicate_check'):
+            dates_existing = existing_dates(db.session, processed)
         
         # If any dates already exist, return warning
         if dates_existing:
             existing_dates_str = ', '.join([d.isoformat() for d in sorted(dates_existing)])
+            timings = timer.to_dict()
+            record_metrics('upload', timings, 409)
             return jsonify({
                 'error': 'Duplicate Upload Prevented',
                 'message': f'The following date(s) are already in the database and will NOT be re-uploaded:\n\n{existing_dates_str}\n\nTo re-upload this data, please delete the existing records first.',
                 'duplicate': True,
-                'existing_dates': [d.isoformat() for d in sorted(dates_existing)]
+                'existing_dates': [d.isoformat() for d in sorted(dates_existing)],
+                'sha256': digest,
+                'timings': timings
             }), 409
         
         # Store in database only new records
-        stored_count = 0
-        for _, row in processed.iterrows():
-            vehicle = row['vehicle']
-            day_map = row['day_map']
-            if day_map:
-                for (year, month, day), metrics in day_map.items():
-                    # Create new record (we already checked above)
-                    activity = VehicleActivity(
-                        date=datetime(year, month, day).date(),
-                        vehicle_code=vehicle,
-                        hours_before_20h=metrics['before_sec'] / 3600,
-                        hours_after_20h=metrics['after_sec'] / 3600,
-                        km_before=metrics['km_before'],
-                        km_after=metrics['km_after']
-                    )
-                    db.session.add(activity)
-                    stored_count += 1
+        with timer.stage('insert'):
+            stored_count = store_daily_activity(db.session, processed, intervals, sites)
         
-        db.session.commit()
+        with timer.stage('commit'):
+            db.session.commit()
+        timer.count('records_stored', stored_count)
+        if intervals is not None:
+            timer.count('intervals_stored', len(intervals))
+        if sites is not None:
+            timer.count('site_rows_stored', len(sites))
+        
+        timings = timer.to_dict()
+        record_metrics('upload', timings)
         
         return jsonify({
             'success': True,
             'message': f'✓ Successfully stored {stored_count} new records in database.',
-            'records': stored_count
+            'records': stored_count,
+            'km_coerced': processed.attrs.get('km_coerced', 0),
+            'overlaps': processed.attrs.get('overlaps'),
+            'durations': processed.attrs.get('durations'),
+            'sha256': digest,
+            'timings': timings
         })
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
+    finally:
+        # Frees the spool (memory, or its temp file) now rather than at teardown
+        file.close()
 
 @app.route('/dates')
+@http_cache.versioned
 def get_dates():
-    """Get list of available dates in database."""
+    """Dates available in database, newest first, one page at a time:
+    optional from/to (YYYY-MM-DD), limit and cursor."""
     try:
-        dates = db.session.query(VehicleActivity.date).distinct().order_by(VehicleActivity.date.desc()).all()
+        start = datetime.fromisoformat(request.args['from']).date() if request.args.get('from') else None
+        end = datetime.fromisoformat(request.args['to']).date() if request.args.get('to') else None
+        before = datetime.fromisoformat(request.args['cursor']).date() if request.args.get('cursor') else None
+        dates, next_cursor = activity_dates(db.session, start, end, before=before, limit=page_limit())
         return jsonify({
-            'dates': [d[0].isoformat() for d in dates]
+            'dates': [d.isoformat() for d in dates],
+            'next': next_cursor.isoformat() if next_cursor else None
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -146,7 +285,7 @@ def delete_date(date_str):
         target_date = datetime.fromisoformat(date_str).date()
         
         # Delete all records for this date
-        deleted_count = VehicleActivity.query.filter_by(date=target_date).delete()
+        deleted_count = delete_activity(db.session, target_date).get(target_date, 0)
         db.session.commit()
         
         return jsonify({
@@ -158,7 +297,50 @@ def delete_date(date_str):
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+@app.route('/report/delete', methods=['DELETE', 'POST'])
+def delete_range():
+    """Delete many dates in one transaction.
+
+    JSON body: {"from": "2025-12-01", "to": "2025-12-31"} or {"dates": [...]},
+    optionally with "vehicles": ["C024", ...] to delete only those vehicles.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        vehicles = data.get('vehicles') or None
+        if isinstance(vehicles, str):
+            vehicles = [vehicles]
+        
+        if data.get('dates'):
+            dates = [datetime.fromisoformat(d).date() for d in data['dates']]
+            counts = delete_activity(db.session, dates=dates, vehicles=vehicles)
+            label = f"{len(set(dates))} date(s)"
+        elif data.get('from'):
+            start = datetime.fromisoformat(data['from']).date()
+            end = datetime.fromisoformat(data.get('to') or data['from']).date()
+            if end < start:
+                return jsonify({'error': 'to must not be before from'}), 400
+            counts = delete_activity(db.session, start, end, vehicles=vehicles)
+            label = f"{start} to {end}"
+        else:
+            return jsonify({'error': 'from/to or dates are required'}), 400
+        db.session.commit()
+        
+        deleted = sum(counts.values())
+        if vehicles:
+            label += f" ({', '.join(sorted(set(vehicles)))})"
+        return jsonify({
+            'success': True,
+            'message': f'Deleted {deleted} records for {label}',
+            'deleted': deleted,
+            'per_date': {d.isoformat(): n for d, n in counts.items()}
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/report/by-date', methods=['POST'])
+@profiled
+@http_cache.cached_report
 def report_by_date():
     """Generate report for a specific date."""
     try:
@@ -170,46 +352,59 @@ def report_by_date():
             return jsonify({'error': 'Date is required'}), 400
         
         target_date = datetime.fromisoformat(date_str).date()
+        timer = StageTimer()
         
         # Query database for this date
-        records = VehicleActivity.query.filter_by(date=target_date).all()
+        with timer.stage('query'):
+            records = VehicleActivity.query.filter_by(date=target_date).all()
+        timer.count('records', len(records))
         
         if not records:
             return jsonify({'error': f'No records found for {date_str}'}), 404
         
         # Get vehicle details for report
         vehicles_dict = {}
-        all_vehicles = Vehicle.query.all()
-        for v in all_vehicles:
-            vehicles_dict[v.id] = v
-        
-        if format_type == 'pdf':
-            # Generate PDF
-            pdf_buffer = generate_pdf_report_by_date(target_date, records, vehicles_dict)
-            output_folder = Path(app.config['OUTPUT_FOLDER'])
-            filename = f"report_{target_date.isoformat()}.pdf"
-            filepath = output_folder / filename
-            with open(filepath, 'wb') as f:
-                f.write(pdf_buffer.getvalue())
-        else:
-            # Generate CSV (original behavior)
-            data_list = [r.to_dict() for r in records]
-            report_df = pd.DataFrame(data_list)
-            output_folder = Path(app.config['OUTPUT_FOLDER'])
-            filename = f"report_{target_date.isoformat()}.csv"
-            filepath = output_folder / filename
-            report_df.to_csv(filepath, index=False)
+        with timer.stage('vehicles'):
+            all_vehicles = Vehicle.query.all()
+            for v in all_vehicles:
+                vehicles_dict[v.id] = v
+        
+        with timer.stage('render'):
+            if format_type == 'pdf':
+                # Generate PDF
+                from pdf_reports import generate_pdf_report_by_date
+                pdf_buffer = generate_pdf_report_by_date(target_date, records, vehicles_dict)
+                output_folder = Path(app.config['OUTPUT_FOLDER'])
+                filename = f"report_{target_date.isoformat()}.pdf"
+                filepath = output_folder / filename
+                with open(filepath, 'wb') as f:
+                    f.write(pdf_buffer.getvalue())
+            else:
+                # Generate CSV (original behavior)
+                data_list = [r.to_dict() for r in records]
+                import pandas as pd
+                report_df = pd.DataFrame(data_list)
+                output_folder = Path(app.config['OUTPUT_FOLDER'])
+                filename = f"report_{target_date.isoformat()}.csv"
+                filepath = output_folder / filename
+                report_df.to_csv(filepath, index=False)
+        
+        timings = timer.to_dict()
+        record_metrics('report_by_date', timings)
         
         return jsonify({
             'success': True,
             'message': f'Report generated for {target_date}',
             'filename': filename,
-            'rows': len(records)
+            'rows': len(records),
+            'timings': timings
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/report/by-month', methods=['POST'])
+@profiled
+@http_cache.cached_report
 def report_by_month():
     """Generate report for a specific month."""
     try:
@@ -220,75 +415,80 @@ def report_by_month():
         
         if not year or not month:
             return jsonify({'error': 'Year and month are required'}), 400
+        sites, by_site, suffix = site_options(data)
         
-        # Query database for this month
-        records = VehicleActivity.query.filter(
-            db.func.strftime('%Y', VehicleActivity.date) == str(year).zfill(4),
-            db.func.strftime('%m', VehicleActivity.date) == str(month).zfill(2)
-        ).all()
+        timer = StageTimer()
         
-        if not records:
+        # Query database for this month
+        with timer.stage('query'):
+            # Date range instead of strftime(): portable across backends and uses the date index
+            month_start = datetime(int(year), int(month), 1).date()
+            month_end = datetime(int(year) + int(month) // 12, int(month) % 12 + 1, 1).date() - timedelta(days=1)
+            rows, engine = period_summary(month_start, month_end, ('site', 'vehicle') if by_site else ('vehicle',), sites=sites)
+        timer.count('records', sum(row['days'] for row in rows))
+        
+        if not rows:
             return jsonify({'error': f'No records found for {year}-{month:02d}'}), 404
         
-        # Aggregate by vehicle
-        summary = {}
-        for record in records:
-            vehicle = record.vehicle_code
-            if vehicle not in summary:
-                summary[vehicle] = {
-                    'hours_before_20h': 0.0,
-                    'hours_after_20h': 0.0,
-                    'km_before': 0.0,
-                    'km_after': 0.0
-                }
-            summary[vehicle]['hours_before_20h'] += record.hours_before_20h
-            summary[vehicle]['hours_after_20h'] += record.hours_after_20h
-            summary[vehicle]['km_before'] += record.km_before
-            summary[vehicle]['km_after'] += record.km_after
+        with timer.stage('aggregate'):
+            summary = analytics.vehicle_summary(rows)
         
         # Get vehicle details for report
         vehicles_dict = {}
-        all_vehicles = Vehicle.query.all()
-        for v in all_vehicles:
-            vehicles_dict[v.id] = v
+        with timer.stage('vehicles'):
+            all_vehicles = Vehicle.query.all()
+            for v in all_vehicles:
+                vehicles_dict[v.id] = v
         
         output_folder = Path(app.config['OUTPUT_FOLDER'])
         
-        if format_type == 'pdf':
-            # Generate PDF
-            pdf_buffer = generate_pdf_report_by_month(year, month, summary, vehicles_dict)
-            filename = f"report_{year:04d}-{month:02d}.pdf"
-            filepath = output_folder / filename
-            with open(filepath, 'wb') as f:
-                f.write(pdf_buffer.getvalue())
-        else:
-            # Generate CSV
-            data_list = []
-            for vehicle, metrics in summary.items():
-                data_list.append({
-                    'year_month': f'{year:04d}-{month:02d}',
-                    'vehicle': vehicle,
-                    'hours_before_20h': round(metrics['hours_before_20h'], 2),
-                    'hours_after_20h': round(metrics['hours_after_20h'], 2),
-                    'km_before': round(metrics['km_before'], 3),
-                    'km_after': round(metrics['km_after'], 3)
-                })
+        with timer.stage('render'):
+            if format_type == 'pdf':
+                # Generate PDF
+                from pdf_reports import generate_pdf_report_by_month
+                pdf_buffer = generate_pdf_report_by_month(year, month, summary, vehicles_dict,
+                                                          analytics.site_groups(rows) if by_site else None, sites)
+                filename = f"report_{year:04d}-{month:02d}{suffix}.pdf"
+                filepath = output_folder / filename
+                with open(filepath, 'wb') as f:
+                    f.write(pdf_buffer.getvalue())
+            else:
+                # Generate CSV
+                data_list = []
+                for metrics in rows:
+                    data_list.append({
+                        'year_month': f'{year:04d}-{month:02d}',
+                        **({'site': metrics['site']} if by_site else {}),
+                        'vehicle': metrics['vehicle'],
+                        'hours_before_20h': round(metrics['hours_before_20h'], 2),
+                        'hours_after_20h': round(metrics['hours_after_20h'], 2),
+                        'km_before': round(metrics['km_before'], 3),
+                        'km_after': round(metrics['km_after'], 3)
+                    })
             
-            report_df = pd.DataFrame(data_list)
-            filename = f"report_{year:04d}-{month:02d}.csv"
-            filepath = output_folder / filename
-            report_df.to_csv(filepath, index=False)
+                import pandas as pd
+                report_df = pd.DataFrame(data_list)
+                filename = f"report_{year:04d}-{month:02d}{suffix}.csv"
+                filepath = output_folder / filename
+                report_df.to_csv(filepath, index=False)
+        
+        timings = timer.to_dict()
+        record_metrics('report_by_month', timings)
         
         return jsonify({
             'success': True,
             'message': f'Report generated for {year}-{month:02d}',
             'filename': filename,
-            'rows': len(summary)
+            'rows': len(rows),
+            'engine': engine,
+            'timings': timings
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/report/by-week', methods=['POST'])
+@profiled
+@http_cache.cached_report
 def report_by_week():
     """Generate report for a specific week (ISO 8601 week number)."""
     try:
@@ -301,6 +501,7 @@ def report_by_week():
         
         if not year or not week:
             return jsonify({'error': 'Year and week are required'}), 400
+        sites, by_site, suffix = site_options(data)
         
         # Calculate start and end dates for the ISO week
         # ISO 8601: Week 1 is the week with the first Thursday
@@ -312,75 +513,225 @@ def report_by_week():
         week_start_str = week_start.strftime('%Y-%m-%d')
         week_end_str = week_end.strftime('%Y-%m-%d')
         
+        timer = StageTimer()
+        
         # Query database for this week
-        records = VehicleActivity.query.filter(
-            VehicleActivity.date >= week_start_str,
-            VehicleActivity.date <= week_end_str
-        ).all()
+        with timer.stage('query'):
+            rows, engine = period_summary(week_start.date(), week_end.date(), ('site', 'vehicle') if by_site else ('vehicle',), sites=sites)
+        timer.count('records', sum(row['days'] for row in rows))
         
-        if not records:
+        if not rows:
             return jsonify({'error': f'No records found for week {week} of {year}'}), 404
         
-        # Aggregate by vehicle
-        summary = {}
-        for record in records:
-            vehicle = record.vehicle_code
-            if vehicle not in summary:
-                summary[vehicle] = {
-                    'hours_before_20h': 0.0,
-                    'hours_after_20h': 0.0,
-                    'km_before': 0.0,
-                    'km_after': 0.0
-                }
-            summary[vehicle]['hours_before_20h'] += record.hours_before_20h
-            summary[vehicle]['hours_after_20h'] += record.hours_after_20h
-            summary[vehicle]['km_before'] += record.km_before
-            summary[vehicle]['km_after'] += record.km_after
+        with timer.stage('aggregate'):
+            summary = analytics.vehicle_summary(rows)
         
         # Get vehicle details for report
         vehicles_dict = {}
-        all_vehicles = Vehicle.query.all()
-        for v in all_vehicles:
-            vehicles_dict[v.id] = v
-        
-        if format_type == 'pdf':
-            # Generate PDF with aggregated summary
-            pdf_buffer = generate_pdf_report_by_week(year, week, week_start_str, week_end_str, summary, vehicles_dict)
-            output_folder = Path(app.config['OUTPUT_FOLDER'])
-            filename = f"report_{year:04d}-W{week:02d}.pdf"
-            filepath = output_folder / filename
-            with open(filepath, 'wb') as f:
-                f.write(pdf_buffer.getvalue())
-        else:
-            # Generate CSV
-            data_list = []
-            for vehicle, metrics in summary.items():
-                data_list.append({
-                    'year_week': f'{year:04d}-W{week:02d}',
-                    'week_start': week_start_str,
-                    'week_end': week_end_str,
-                    'vehicle': vehicle,
-                    'hours_before_20h': round(metrics['hours_before_20h'], 2),
-                    'hours_after_20h': round(metrics['hours_after_20h'], 2),
-                    'km_before': round(metrics['km_before'], 3),
-                    'km_after': round(metrics['km_after'], 3)
-                })
+        with timer.stage('vehicles'):
+            all_vehicles = Vehicle.query.all()
+            for v in all_vehicles:
+                vehicles_dict[v.id] = v
+        
+        with timer.stage('render'):
+            if format_type == 'pdf':
+                # Generate PDF with aggregated summary
+                from pdf_reports import generate_pdf_report_by_week
+                pdf_buffer = generate_pdf_report_by_week(year, week, week_start_str, week_end_str, summary, vehicles_dict,
+                                                         analytics.site_groups(rows) if by_site else None, sites)
+                output_folder = Path(app.config['OUTPUT_FOLDER'])
+                filename = f"report_{year:04d}-W{week:02d}{suffix}.pdf"
+                filepath = output_folder / filename
+                with open(filepath, 'wb') as f:
+                    f.write(pdf_buffer.getvalue())
+            else:
+                # Generate CSV
+                data_list = []
+                for metrics in rows:
+                    data_list.append({
+                        'year_week': f'{year:04d}-W{week:02d}',
+                        'week_start': week_start_str,
+                        'week_end': week_end_str,
+                        **({'site': metrics['site']} if by_site else {}),
+                        'vehicle': metrics['vehicle'],
+                        'hours_before_20h': round(metrics['hours_before_20h'], 2),
+                        'hours_after_20h': round(metrics['hours_after_20h'], 2),
+                        'km_before': round(metrics['km_before'], 3),
+                        'km_after': round(metrics['km_after'], 3)
+                    })
             
-            report_df = pd.DataFrame(data_list)
-            output_folder = Path(app.config['OUTPUT_FOLDER'])
-            filename = f"report_{year:04d}-W{week:02d}.csv"
-            filepath = output_folder / filename
-            report_df.to_csv(filepath, index=False)
+                import pandas as pd
+                report_df = pd.DataFrame(data_list)
+                output_folder = Path(app.config['OUTPUT_FOLDER'])
+                filename = f"report_{year:04d}-W{week:02d}{suffix}.csv"
+                filepath = output_folder / filename
+                report_df.to_csv(filepath, index=False)
+        
+        timings = timer.to_dict()
+        record_metrics('report_by_week', timings)
         
         return jsonify({
             'success': True,
             'message': f'Report generated for week {week} of {year}',
             'filename': filename,
-            'rows': len(summary)
+            'rows': len(rows),
+            'engine': engine,
+            'timings': timings
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/report/by-range', methods=['POST'])
+@profiled
+@http_cache.cached_report
+def report_by_range():
+    """Generate report for any date range (e.g. a payroll period from the 21st to the 20th).
+
+    Totals come from the per-vehicle cumulative table: one difference per
+    vehicle, whatever the length of the range. With a site filter or
+    by_site they are summed from site_activity instead.
+    """
+    try:
+        data = request.json
+        start_str = data.get('from')
+        end_str = data.get('to')
+        format_type = data.get('format', 'csv').lower()  # 'csv' or 'pdf'
+        
+        if not start_str or not end_str:
+            return jsonify({'error': 'from and to dates are required'}), 400
+        
+        start = datetime.fromisoformat(start_str).date()
+        end = datetime.fromisoformat(end_str).date()
+        if end < start:
+            return jsonify({'error': 'to must not be before from'}), 400
+        sites, by_site, suffix = site_options(data)
+        
+        timer = StageTimer()
+        
+        with timer.stage('query'):
+            if sites is not None or by_site:
+                rows, _ = period_summary(start, end, ('site', 'vehicle') if by_site else ('vehicle',), sites=sites)
+            else:
+                rows = [{'vehicle': vehicle, **metrics} for vehicle, metrics in range_totals(db.session, start, end).items()]
+            summary = analytics.vehicle_summary(rows)
+        timer.count('records', sum(row['days'] for row in rows))
+        
+        if not rows:
+            return jsonify({'error': f'No records found from {start} to {end}'}), 404
+        
+        # Get vehicle details for report
+        vehicles_dict = {}
+        with timer.stage('vehicles'):
+            all_vehicles = Vehicle.query.all()
+            for v in all_vehicles:
+                vehicles_dict[v.id] = v
+        
+        output_folder = Path(app.config['OUTPUT_FOLDER'])
+        
+        with timer.stage('render'):
+            if format_type == 'pdf':
+                from pdf_reports import generate_pdf_report_by_range
+                pdf_buffer = generate_pdf_report_by_range(start.isoformat(), end.isoformat(), summary, vehicles_dict,
+                                                          analytics.site_groups(rows) if by_site else None, sites)
+                filename = f"report_{start.isoformat()}_{end.isoformat()}{suffix}.pdf"
+                filepath = output_folder / filename
+                with open(filepath, 'wb') as f:
+                    f.write(pdf_buffer.getvalue())
+            else:
+                data_list = []
+                for metrics in rows:
+                    data_list.append({
+                        'from': start.isoformat(),
+                        'to': end.isoformat(),
+                        **({'site': metrics['site']} if by_site else {}),
+                        'vehicle': metrics['vehicle'],
+                        'hours_before_20h': round(metrics['hours_before_20h'], 2),
+                        'hours_after_20h': round(metrics['hours_after_20h'], 2),
+                        'km_before': round(metrics['km_before'], 3),
+                        'km_after': round(metrics['km_after'], 3),
+                        'days': metrics['days']
+                    })
+                
+                import pandas as pd
+                report_df = pd.DataFrame(data_list)
+                filename = f"report_{start.isoformat()}_{end.isoformat()}{suffix}.csv"
+                filepath = output_folder / filename
+                report_df.to_csv(filepath, index=False)
+        
+        timings = timer.to_dict()
+        record_metrics('report_by_range', timings)
+        
+        return jsonify({
+            'success': True,
+            'message': f'Report generated from {start} to {end}',
+            'filename': filename,
+            'rows': len(rows),
+            'timings': timings
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/report/summary', methods=['POST'])
+@profiled
+@http_cache.cached_report
+def report_summary():
+    """Totals over any date range, grouped by vehicle, site, category, date and/or month.
+
+    JSON body: {"from": "2025-01-01", "to": "2025-12-31", "group_by": ["category", "month"],
+    "site": "Chantier A" | [...], "format": "json" | "csv", "engine": "auto" | "sql" | "duckdb"}
+    """
+    try:
+        data = request.json
+        if not data.get('from') or not data.get('to'):
+            return jsonify({'error': 'from and to dates are required'}), 400
+        start = datetime.fromisoformat(data['from']).date()
+        end = datetime.fromisoformat(data['to']).date()
+        if end < start:
+            return jsonify({'error': 'to must not be before from'}), 400
+        group_by = data.get('group_by', ['vehicle'])
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        format_type = data.get('format', 'json').lower()
+        sites, _, suffix = site_options(data)
+        
+        timer = StageTimer()
+        with timer.stage('query'):
+            rows, engine = period_summary(start, end, group_by, data.get('engine'), sites)
+        timer.count('groups', len(rows))
+        
+        for row in rows:
+            for key, value in row.items():
+                if isinstance(value, float):
+                    row[key] = round(value, 3)
+                elif hasattr(value, 'isoformat'):
+                    row[key] = value.isoformat()
+        
+        filename = None
+        if format_type == 'csv':
+            with timer.stage('render'):
+                import pandas as pd
+                filename = f"summary_{start.isoformat()}_{end.isoformat()}_{'-'.join(group_by)}{suffix}.csv"
+                pd.DataFrame(rows).to_csv(Path(app.config['OUTPUT_FOLDER']) / filename, index=False)
+        
+        timings = timer.to_dict()
+        record_metrics('report_summary', timings)
+        
+        response = {
+            'success': True,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'engine': engine,
+            'rows': len(rows),
+            'timings': timings
+        }
+        if filename:
+            response['filename'] = filename
+        else:
+            response['data'] = rows
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/download/<filename>')
 def download_file(filename):
     try:
@@ -395,8 +746,13 @@ def download_file(filename):
         return jsonify({'error': str(e)}), 400
 
 @app.route('/vehicles/upload', methods=['POST'])
+@upload_slot
 def upload_vehicles():
-    """Upload vehicle data from Excel file."""
+    """Upload vehicle data from Excel file.
+
+    Form field `mode`: `upsert` (default) adds and updates vehicles;
+    `mirror` also deletes vehicles that are not in the file.
+    """
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     
@@ -404,9 +760,14 @@ def upload_vehicles():
     
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
+
+    mode = request.form.get('mode', 'upsert')
+    if mode not in ('upsert', 'mirror'):
+        return jsonify({'error': "mode must be 'upsert' or 'mirror'"}), 400
     
     try:
         # Read Excel file
+        import pandas as pd
         df = pd.read_excel(file)
         
         # Validate required columns
@@ -414,43 +775,42 @@ def upload_vehicles():
         if not required_cols.issubset(df.columns):
             return jsonify({'error': f'Excel must have columns: {", ".join(required_cols)}'}), 400
         
-        # Process and store vehicles
-        added = 0
-        updated = 0
+        # Validate rows; the registry is then written in bulk
+        rows = []
         errors = []
+        skipped_ids = set()
         
-        for idx, row in df.iterrows():
+        for idx, values in enumerate(df[['ID', 'Matricule', 'Name', 'Category']].itertuples(index=False, name=None)):
             try:
-                vehicle_id = str(row['ID']).strip()
-                matricule = str(row['Matricule']).strip()
-                name = str(row['Name']).strip()
-                category = str(row['Category']).strip()
+                vehicle_id, matricule, name, category = ('' if pd.isna(v) else str(v).strip() for v in values)
                 
                 if not vehicle_id or not matricule or not name or not category:
                     errors.append(f"Row {idx+2}: Missing required fields")
+                    if vehicle_id:
+                        skipped_ids.add(vehicle_id)
                     continue
                 
-                existing = Vehicle.query.filter_by(id=vehicle_id).first()
-                if existing:
-                    existing.matricule = matricule
-                    existing.name = name
-                    existing.category = category
-                    updated += 1
-                else:
-                    vehicle = Vehicle(id=vehicle_id, matricule=matricule, name=name, category=category)
-                    db.session.add(vehicle)
-                    added += 1
+                rows.append({'id': vehicle_id, 'matricule': matricule, 'name': name, 'category': category})
             except Exception as e:
                 errors.append(f"Row {idx+2}: {str(e)}")
+
+        if mode == 'mirror' and not rows:
+            return jsonify({'error': 'Mirror mode refused: the file has no valid vehicle rows', 'errors': errors}), 400
         
+        counts = sync_vehicle_registry(db.session, rows, mirror=(mode == 'mirror'), keep_ids=skipped_ids)
         db.session.commit()
         
+        message = f"Added {counts['added']} vehicles, updated {counts['updated']} vehicles"
+        if mode == 'mirror':
+            message += f", deleted {counts['deleted']} vehicles"
         return jsonify({
             'success': True,
-            'added': added,
-            'updated': updated,
+            'mode': mode,
+            'added': counts['added'],
+            'updated': counts['updated'],
+            'deleted': counts['deleted'],
             'errors': errors,
-            'message': f'Added {added} vehicles, updated {updated} vehicles'
+            'message': message
         })
     except Exception as e:
         db.session.rollback()
@@ -476,6 +836,7 @@ def add_vehicle():
         
         vehicle = Vehicle(id=vehicle_id, matricule=matricule, name=name, category=category)
         db.session.add(vehicle)
+        bump_data_version(db.session)
         db.session.commit()
         
         return jsonify({
@@ -488,18 +849,24 @@ def add_vehicle():
         return jsonify({'error': str(e)}), 400
 
 @app.route('/vehicles', methods=['GET'])
+@http_cache.versioned
 def get_vehicles():
-    """Get list of all vehicles."""
+    """Registered vehicles in id order, one page at a time: q searches id,
+    name and matricule, category (repeatable) filters, limit and cursor."""
     try:
-        vehicles = Vehicle.query.all()
+        vehicles, next_cursor, total = list_vehicles(db.session, search=request.args.get('q', '').strip() or None,
+                                                     categories=request.args.getlist('category') or None,
+                                                     after=request.args.get('cursor') or None, limit=page_limit())
         return jsonify({
             'vehicles': [v.to_dict() for v in vehicles],
-            'total': len(vehicles)
+            'total': total,
+            'next': next_cursor
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/vehicles/<vehicle_id>', methods=['GET'])
+@http_cache.versioned
 def get_vehicle(vehicle_id):
     """Get vehicle details."""
     try:
@@ -510,6 +877,35 @@ def get_vehicle(vehicle_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/vehicles/<vehicle_id>/activity', methods=['GET'])
+@http_cache.versioned
+def get_vehicle_activity(vehicle_id):
+    """Daily activity of one vehicle: ?from=&to= (optional, YYYY-MM-DD),
+    limit (days per page) and cursor (the previous page's `next`).
+    """
+    try:
+        start = datetime.fromisoformat(request.args['from']).date() if request.args.get('from') else None
+        end = datetime.fromisoformat(request.args['to']).date() if request.args.get('to') else None
+        if start and end and end < start:
+            return jsonify({'error': 'to must not be before from'}), 400
+        after = datetime.fromisoformat(request.args['cursor']).date() if request.args.get('cursor') else None
+        limit = page_limit()
+        
+        days, next_cursor = vehicle_timeline(db.session, vehicle_id, start, end, after=after, limit=limit)
+        vehicle = db.session.get(Vehicle, vehicle_id)
+        return jsonify({
+            'vehicle': vehicle.to_dict() if vehicle else {'id': vehicle_id},
+            'from': start.isoformat() if start else None,
+            'to': end.isoformat() if end else None,
+            # Totals of the whole range, not only of this page: sent with the
+            # first page only, the following pages are the same range
+            'totals': vehicle_totals(db.session, vehicle_id, start, end) if after is None else None,
+            'days': days,
+            'next': next_cursor
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/vehicles/<vehicle_id>', methods=['DELETE'])
 def delete_vehicle(vehicle_id):
     """Delete a vehicle."""
@@ -519,6 +915,7 @@ def delete_vehicle(vehicle_id):
             return jsonify({'error': 'Vehicle not found'}), 404
         
         db.session.delete(vehicle)
+        bump_data_version(db.session)
         db.session.commit()
         
         return jsonify({
@@ -530,6 +927,7 @@ def delete_vehicle(vehicle_id):
         return jsonify({'error': str(e)}), 400
 
 @app.route('/categories', methods=['GET'])
+@http_cache.versioned
 def get_categories():
     """Get list of all categories."""
     try:
@@ -540,398 +938,11 @@ def get_categories():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-def generate_pdf_report_by_date(target_date, records, vehicles_dict):
-    """Generate a professional PDF report for a specific date."""
-    pdf_buffer = io.BytesIO()
-    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    story = []
-    
-    # Title
-    story.append(Paragraph('📊 RAPPORT D\'ACTIVITÉ QUOTIDIEN', title_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Date info
-    info_style = ParagraphStyle('Info', parent=styles['Normal'], fontSize=12, alignment=TA_CENTER)
-    # Format date in French
-    date_str = target_date.strftime('%d %B %Y').replace('January', 'Janvier').replace('February', 'Février').replace('March', 'Mars').replace('April', 'Avril').replace('May', 'Mai').replace('June', 'Juin').replace('July', 'Juillet').replace('August', 'Août').replace('September', 'Septembre').replace('October', 'Octobre').replace('November', 'Novembre').replace('December', 'Décembre')
-    story.append(Paragraph(f'<b>Date du Rapport:</b> {date_str}', info_style))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Group by category
-    categories_dict = {}
-    for record in records:
-        vehicle = record.vehicle_code
-        vehicle_obj = vehicles_dict.get(vehicle)
-        category = vehicle_obj.category if vehicle_obj else 'Unknown'
-        
-        if category not in categories_dict:
-            categories_dict[category] = []
-        categories_dict[category].append(record)
-    
-    # Create tables for each category
-    for category in sorted(categories_dict.keys()):
-        story.append(Paragraph(f'<b>{category}</b>', styles['Heading2']))
-        
-        # Table data with formatted cells
-        table_data = [['ID Véhicule', 'Nom du Véhicule', 'Matricule', 'Avant 20:00\n(Heures)', 'Après 20:00\n(Heures)', 'Avant 20:00\n(KM)', 'Après 20:00\n(KM)']]
-        
-        for record in categories_dict[category]:
-            vehicle_obj = vehicles_dict.get(record.vehicle_code)
-            vehicle_name = vehicle_obj.name if vehicle_obj else '-'
-            matricule = f'<font size="8">{vehicle_obj.matricule if vehicle_obj else "-"}</font>'
-            
-            table_data.append([
-                record.vehicle_code,
-                vehicle_name,
-                Paragraph(matricule, styles['Normal']),
-                format_decimal_hours(record.hours_before_20h),
-                format_decimal_hours(record.hours_after_20h),
-                f"{record.km_before:.2f}",
-                f"{record.km_after:.2f}"
-            ])
-        
-        # Add totals row
-        total_hours_before = sum(r.hours_before_20h for r in categories_dict[category])
-        total_hours_after = sum(r.hours_after_20h for r in categories_dict[category])
-        total_km_before = sum(r.km_before for r in categories_dict[category])
-        total_km_after = sum(r.km_after for r in categories_dict[category])
-        
-        table_data.append([
-            'TOTAL',
-            '', '',
-            format_decimal_hours(total_hours_before),
-            format_decimal_hours(total_hours_after),
-            f"{total_km_before:.2f}",
-            f"{total_km_after:.2f}"
-        ])
-        
-        # Style table with proper column widths
-        table = Table(table_data, colWidths=[0.9*inch, 2.2*inch, 1.1*inch, 0.95*inch, 0.95*inch, 0.95*inch, 0.95*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#E7E6E6')),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#F2F2F2')]),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6)
-        ]))
-        
-        story.append(table)
-        story.append(Spacer(1, 0.3*inch))
-    
-    doc.build(story)
-    pdf_buffer.seek(0)
-    return pdf_buffer
-
-def generate_pdf_report_by_month(year, month, summary, vehicles_dict):
-    """Generate a professional PDF report for a specific month."""
-    pdf_buffer = io.BytesIO()
-    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    story = []
-    
-    # Title
-    story.append(Paragraph('📊 RAPPORT D\'ACTIVITÉ MENSUEL', title_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Month info - Format in French
-    from datetime import date
-    french_months = {1: 'Janvier', 2: 'Février', 3: 'Mars', 4: 'Avril', 5: 'Mai', 6: 'Juin', 7: 'Juillet', 8: 'Août', 9: 'Septembre', 10: 'Octobre', 11: 'Novembre', 12: 'Décembre'}
-    month_name = f'{french_months[month]} {year}'
-    info_style = ParagraphStyle('Info', parent=styles['Normal'], fontSize=12, alignment=TA_CENTER)
-    story.append(Paragraph(f'<b>Période du Rapport:</b> {month_name}', info_style))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Group by category
-    categories_dict = {}
-    for vehicle_code, metrics in summary.items():
-        vehicle_obj = vehicles_dict.get(vehicle_code)
-        category = vehicle_obj.category if vehicle_obj else 'Unknown'
-        
-        if category not in categories_dict:
-            categories_dict[category] = {}
-        categories_dict[category][vehicle_code] = metrics
-    
-    # Create tables for each category
-    for category in sorted(categories_dict.keys()):
-        story.append(Paragraph(f'<b>{category}</b>', styles['Heading2']))
-        
-        # Table data with formatted cells
-        table_data = [['ID Véhicule', 'Nom du Véhicule', 'Matricule', 'Avant 20:00\n(Heures)', 'Après 20:00\n(Heures)', 'Avant 20:00\n(KM)', 'Après 20:00\n(KM)']]
-        
-        for vehicle_code in sorted(categories_dict[category].keys()):
-            metrics = categories_dict[category][vehicle_code]
-            vehicle_obj = vehicles_dict.get(vehicle_code)
-            vehicle_name = vehicle_obj.name if vehicle_obj else '-'
-            matricule = f'<font size="8">{vehicle_obj.matricule if vehicle_obj else "-"}</font>'
-            
-            table_data.append([
-                vehicle_code,
-                vehicle_name,
-                Paragraph(matricule, styles['Normal']),
-                format_decimal_hours(metrics['hours_before_20h']),
-                format_decimal_hours(metrics['hours_after_20h']),
-                f"{metrics['km_before']:.2f}",
-                f"{metrics['km_after']:.2f}"
-            ])
-        
-        # Add totals row
-        total_hours_before = sum(m['hours_before_20h'] for m in categories_dict[category].values())
-        total_hours_after = sum(m['hours_after_20h'] for m in categories_dict[category].values())
-        total_km_before = sum(m['km_before'] for m in categories_dict[category].values())
-        total_km_after = sum(m['km_after'] for m in categories_dict[category].values())
-        
-        table_data.append([
-            'TOTAL',
-            '', '',
-            format_decimal_hours(total_hours_before),
-            format_decimal_hours(total_hours_after),
-            f"{total_km_before:.2f}",
-            f"{total_km_after:.2f}"
-        ])
-        
-        # Style table with proper column widths
-        table = Table(table_data, colWidths=[0.9*inch, 2.2*inch, 1.1*inch, 0.95*inch, 0.95*inch, 0.95*inch, 0.95*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#E7E6E6')),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#F2F2F2')]),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6)
-        ]))
-        
-        story.append(table)
-        story.append(Spacer(1, 0.3*inch))
-    
-    doc.build(story)
-    pdf_buffer.seek(0)
-    return pdf_buffer
-
-def generate_pdf_report_by_week(year, week, week_start, week_end, summary, vehicles_dict):
-    """Generate a professional PDF report for a specific week."""
-    pdf_buffer = io.BytesIO()
-    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    story = []
-    
-    # Title
-    story.append(Paragraph('📊 RAPPORT D\'ACTIVITÉ HEBDOMADAIRE', title_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Date info
-    info_style = ParagraphStyle('Info', parent=styles['Normal'], fontSize=12, alignment=TA_CENTER)
-    story.append(Paragraph(f'<b>Semaine:</b> {year}-W{week:02d} ({week_start} à {week_end})', info_style))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Group by category
-    categories_dict = {}
-    for vehicle_code in summary.keys():
-        vehicle_obj = vehicles_dict.get(vehicle_code)
-        category = vehicle_obj.category if vehicle_obj else 'Unknown'
-        
-        if category not in categories_dict:
-            categories_dict[category] = {}
-        categories_dict[category][vehicle_code] = summary[vehicle_code]
-    
-    # Create tables for each category
-    for category in sorted(categories_dict.keys()):
-        story.append(Paragraph(f'<b>{category}</b>', styles['Heading2']))
-        
-        # Table data with formatted cells
-        table_data = [['ID Véhicule', 'Nom du Véhicule', 'Matricule', 'Avant 20:00\n(Heures)', 'Après 20:00\n(Heures)', 'Avant 20:00\n(KM)', 'Après 20:00\n(KM)']]
-        
-        for vehicle_code in sorted(categories_dict[category].keys()):
-            metrics = categories_dict[category][vehicle_code]
-            vehicle_obj = vehicles_dict.get(vehicle_code)
-            vehicle_name = vehicle_obj.name if vehicle_obj else '-'
-            matricule = f'<font size="8">{vehicle_obj.matricule if vehicle_obj else "-"}</font>'
-            
-            table_data.append([
-                vehicle_code,
-                vehicle_name,
-                Paragraph(matricule, styles['Normal']),
-                format_decimal_hours(metrics['hours_before_20h']),
-                format_decimal_hours(metrics['hours_after_20h']),
-                f"{metrics['km_before']:.2f}",
-                f"{metrics['km_after']:.2f}"
-            ])
-        
-        # Add totals row
-        total_hours_before = sum(m['hours_before_20h'] for m in categories_dict[category].values())
-        total_hours_after = sum(m['hours_after_20h'] for m in categories_dict[category].values())
-        total_km_before = sum(m['km_before'] for m in categories_dict[category].values())
-        total_km_after = sum(m['km_after'] for m in categories_dict[category].values())
-        
-        table_data.append([
-            'TOTAL',
-            '', '',
-            format_decimal_hours(total_hours_before),
-            format_decimal_hours(total_hours_after),
-            f"{total_km_before:.2f}",
-            f"{total_km_after:.2f}"
-        ])
-        
-        # Style table with proper column widths
-        table = Table(table_data, colWidths=[0.9*inch, 2.2*inch, 1.1*inch, 0.95*inch, 0.95*inch, 0.95*inch, 0.95*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#E7E6E6')),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#F2F2F2')]),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6)
-        ]))
-        
-        story.append(table)
-        story.append(Spacer(1, 0.3*inch))
-    
-    doc.build(story)
-    pdf_buffer.seek(0)
-    return pdf_buffer
-
-def generate_vehicle_list_pdf():
-    """Generate a professional PDF with all vehicles grouped by category."""
-    pdf_buffer = io.BytesIO()
-    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    story = []
-    
-    # Title
-    story.append(Paragraph('🚗 LISTE DES VÉHICULES', title_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Get all vehicles from database
-    all_vehicles = Vehicle.query.all()
-    
-    if not all_vehicles:
-        story.append(Paragraph('Aucun véhicule enregistré dans le système.', styles['Normal']))
-    else:
-        # Group vehicles by category
-        categories_dict = {}
-        for vehicle in all_vehicles:
-            if vehicle.category not in categories_dict:
-                categories_dict[vehicle.category] = []
-            categories_dict[vehicle.category].append(vehicle)
-        
-        # Create tables for each category
-        for category in sorted(categories_dict.keys()):
-            story.append(Paragraph(f'<b>{category}</b>', styles['Heading2']))
-            
-            # Table data
-            table_data = [['ID Véhicule', 'Nom du Véhicule', 'Matricule']]
-            
-            for vehicle in sorted(categories_dict[category], key=lambda v: v.id):
-                table_data.append([
-                    vehicle.id,
-                    vehicle.name,
-                    vehicle.matricule
-                ])
-            
-            # Add total row
-            table_data.append([
-                f'TOTAL: {len(categories_dict[category])} véhicules',
-                '', ''
-            ])
-            
-            # Style table
-            table = Table(table_data, colWidths=[1.5*inch, 2.5*inch, 1.5*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#E7E6E6')),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#F2F2F2')])
-            ]))
-            
-            story.append(table)
-            story.append(Spacer(1, 0.3*inch))
-    
-    doc.build(story)
-    pdf_buffer.seek(0)
-    return pdf_buffer
-
 @app.route('/vehicles/download/pdf', methods=['GET'])
 def download_vehicle_list_pdf():
     """Download vehicle list as PDF."""
     try:
+        from pdf_reports import generate_vehicle_list_pdf
         pdf_buffer = generate_vehicle_list_pdf()
         
         return send_file(
@@ -948,7 +959,8 @@ def list_files():
     try:
         output_folder = Path(app.config['OUTPUT_FOLDER'])
         files = list(output_folder.glob('report_*'))
-        return jsonify({
+        # Not tied to the data version: the ETag is a hash of the listing
+        return http_cache.conditional(jsonify({
             'files': [
                 {
                     'name': f.name,
@@ -957,7 +969,7 @@ def list_files():
                 }
                 for f in files
             ]
-        })
+        }))
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
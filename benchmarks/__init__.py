@@ -0,0 +1,4 @@
+"""Performance benchmarks for the ingest and report pipeline.
+
+Run the whole suite with:  python -m benchmarks.run_benchmarks
+"""
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark: simultaneous uploads while report reads keep running.
+
+Each uploader sends its own synthetic export (distinct dates, so none is
+rejected as duplicate) while reader threads call /report/by-date and /dates
+in a loop. Reports upload wall time, read latency percentiles during the
+uploads and the number of failed requests ("database is locked").
+
+Usage:
+  python -m benchmarks.bench_concurrency --profile default
+  python -m benchmarks.bench_concurrency --profile performance --uploaders 4 --readers 8
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.synthetic import write_rapport_csv
+
+SEED_DATE = datetime(2025, 11, 1)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run_concurrency(app_module, workdir, uploaders=4, readers=4, vehicles=50, days=7, rows_per_day=20):
+    """Run the mixed upload/read workload against `app_module` and return results."""
+    from models import db, VehicleActivity, VehicleCumulative, SiteActivity, CourseInterval
+
+    workdir = Path(workdir)
+    # The readers repeat one report: generate it every time instead of reusing it
+    app_module.app.config['REPORT_CACHE'] = False
+    with app_module.app.app_context():
+        VehicleActivity.query.delete()
+        VehicleCumulative.query.delete()
+        SiteActivity.query.delete()
+        CourseInterval.query.delete()
+        db.session.commit()
+
+    # One seeded day for the readers, then one export per uploader after it
+    seed_csv = workdir / 'concurrency_seed.csv'
+    write_rapport_csv(seed_csv, vehicles, 1, rows_per_day, start_date=SEED_DATE)
+    with open(seed_csv, 'rb') as f:
+        app_module.app.test_client().post('/upload', data={'file': (f, 'seed.csv')}, content_type='multipart/form-data')
+
+    upload_files = []
+    for i in range(uploaders):
+        path = workdir / f'concurrency_{i}.csv'
+        write_rapport_csv(path, vehicles, days, rows_per_day, seed=i, start_date=SEED_DATE + timedelta(days=1 + i * days))
+        upload_files.append(path)
+
+    uploads_done = threading.Event()
+    start_barrier = threading.Barrier(uploaders + readers)
+    lock = threading.Lock()
+    upload_times, upload_errors, stored = [], [], []
+    read_times, read_errors = [], []
+
+    def uploader(path):
+        client = app_module.app.test_client()
+        start_barrier.wait()
+        t0 = time.perf_counter()
+        with open(path, 'rb') as f:
+            resp = client.post('/upload', data={'file': (f, path.name)}, content_type='multipart/form-data')
+        elapsed = time.perf_counter() - t0
+        with lock:
+            upload_times.append(elapsed)
+            if resp.status_code == 200:
+                stored.append(resp.get_json()['records'])
+            else:
+                upload_errors.append(resp.get_json().get('error'))
+
+    def reader():
+        client = app_module.app.test_client()
+        start_barrier.wait()
+        i = 0
+        while not uploads_done.is_set():
+            t0 = time.perf_counter()
+            if i % 2:
+                resp = client.get('/dates')
+            else:
+                resp = client.post('/report/by-date', json={'date': SEED_DATE.date().isoformat(), 'format': 'csv'})
+            elapsed = time.perf_counter() - t0
+            with lock:
+                read_times.append(elapsed)
+                if resp.status_code != 200:
+                    read_errors.append(resp.get_json().get('error'))
+            i += 1
+
+    upload_threads = [threading.Thread(target=uploader, args=(p,)) for p in upload_files]
+    reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+    t0 = time.perf_counter()
+    for t in upload_threads + reader_threads:
+        t.start()
+    for t in upload_threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    uploads_done.set()
+    for t in reader_threads:
+        t.join()
+
+    return {
+        'concurrent_uploads': {
+            'best': min(upload_times), 'mean': sum(upload_times) / len(upload_times),
+            'wall': wall, 'rows': sum(stored), 'errors': len(upload_errors),
+            'error_samples': sorted(set(upload_errors))[:3],
+        },
+        'reads_during_upload': {
+            'best': min(read_times) if read_times else 0.0,
+            'mean': sum(read_times) / len(read_times) if read_times else 0.0,
+            'p50': percentile(read_times, 50), 'p95': percentile(read_times, 95),
+            'rows': len(read_times), 'errors': len(read_errors),
+            'error_samples': sorted(set(read_errors))[:3],
+        },
+    }
+
+
+def main():
+    import argparse
+
+    p = argparse.ArgumentParser(description="Concurrent upload/read benchmark")
+    p.add_argument("--profile", default=None, help="SQLite profile (default, performance, safe)")
+    p.add_argument("--uploaders", type=int, default=4, help="Simultaneous uploads")
+    p.add_argument("--readers", type=int, default=4, help="Reader threads")
+    p.add_argument("--vehicles", type=int, default=50, help="Fleet size per export")
+    p.add_argument("--days", type=int, default=7, help="Days per export")
+    p.add_argument("--rows-per-day", type=int, default=20, help="Rows per vehicle and day")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='gps_bench_conc_') as tmp:
+        workdir = Path(tmp)
+        os.environ['GPS_DATABASE_URL'] = f"sqlite:///{workdir / 'bench.db'}"
+        if args.profile:
+            os.environ['GPS_SQLITE_PROFILE'] = args.profile
+        import app as app_module
+        app_module.app.config['UPLOAD_FOLDER'] = workdir
+        app_module.app.config['OUTPUT_FOLDER'] = workdir
+
+        print(f"SQLite profile: {app_module.app.config['SQLITE_PROFILE']}")
+        results = run_concurrency(app_module, workdir, args.uploaders, args.readers, args.vehicles, args.days, args.rows_per_day)
+        with app_module.app.app_context():
+            app_module.db.engine.dispose()
+
+    up = results['concurrent_uploads']
+    rd = results['reads_during_upload']
+    print(f"Uploads: {args.uploaders} in {up['wall']:.2f}s (mean {up['mean']:.2f}s), {up['rows']} records, {up['errors']} error(s)")
+    print(f"Reads:   {rd['rows']} requests, p50 {rd['p50'] * 1000:.1f} ms, p95 {rd['p95'] * 1000:.1f} ms, {rd['errors']} error(s)")
+    for err in up['error_samples'] + rd['error_samples']:
+        print(f"  ⚠️  {err}")
+
+
+if __name__ == '__main__':
+    main()
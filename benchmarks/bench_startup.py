@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark based on `python -X importtime`.
+
+Imports each entry module in a fresh interpreter (against a throw-away
+database) and reports the cumulative import time, the heaviest imported
+packages and whether pandas/reportlab were pulled in at startup.
+
+Usage:
+  python -m benchmarks.bench_startup
+  python -m benchmarks.bench_startup --module app --top 15
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules whose startup cost is tracked, and packages that must stay lazy in each
+STARTUP_MODULES = {
+    'app': ('pandas', 'reportlab'),
+    'datastore': ('flask', 'pandas', 'reportlab'),
+    'report_logic': ('reportlab', 'flask'),
+}
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into {module: (self_us, cumulative_us, depth)}."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(parts[0]), int(parts[1]), depth)
+    return modules
+
+
+def import_profile(module, db_url):
+    """Import `module` in a fresh interpreter; return (total seconds, modules dict)."""
+    env = dict(os.environ, GPS_DATABASE_URL=db_url, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f'import {module} failed:\n{proc.stderr[-2000:]}')
+    modules = parse_importtime(proc.stderr)
+    total_us = sum(cum for self_us, cum, depth in modules.values() if depth == 0)
+    return total_us / 1e6, modules
+
+
+def heaviest(modules, top=10):
+    """Top-level packages sorted by cumulative import time (seconds)."""
+    packages = {}
+    for name, (self_us, cum, depth) in modules.items():
+        root = name.split('.')[0]
+        if name == root or depth == 0:
+            packages[root] = max(packages.get(root, 0), cum)
+    return sorted(((k, v / 1e6) for k, v in packages.items()), key=lambda kv: -kv[1])[:top]
+
+
+def run_startup(repeat=3, modules=None):
+    """Return benchmark results for each module in STARTUP_MODULES."""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='gps_bench_start_') as tmp:
+        db_url = f"sqlite:///{Path(tmp) / 'startup.db'}"
+        for module, must_stay_lazy in STARTUP_MODULES.items():
+            if modules and module not in modules:
+                continue
+            times = []
+            imported = {}
+            for _ in range(repeat):
+                total, imported = import_profile(module, db_url)
+                times.append(total)
+            eager = sorted(pkg for pkg in must_stay_lazy if pkg in imported)
+            results[f'import_{module}'] = {
+                'best': min(times), 'mean': sum(times) / len(times),
+                'eager_heavy_imports': eager,
+                'heaviest': [[name, round(sec, 4)] for name, sec in heaviest(imported, 5)],
+            }
+    return results
+
+
+def main():
+    import argparse
+
+    p = argparse.ArgumentParser(description="Measure import/startup time of the app modules")
+    p.add_argument("--module", nargs='+', choices=list(STARTUP_MODULES), help="Modules to measure")
+    p.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module")
+    p.add_argument("--top", type=int, default=10, help="Heaviest packages to list")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='gps_bench_start_') as tmp:
+        db_url = f"sqlite:///{Path(tmp) / 'startup.db'}"
+        for module in args.module or STARTUP_MODULES:
+            times = []
+            for _ in range(args.repeat):
+                total, imported = import_profile(module, db_url)
+                times.append(total)
+            print(f"\nimport {module}: best {min(times) * 1000:.1f} ms, mean {sum(times) / len(times) * 1000:.1f} ms")
+            eager = [pkg for pkg in STARTUP_MODULES[module] if pkg in imported]
+            if eager:
+                print(f"  ⚠️  loaded at startup: {', '.join(eager)}")
+            for name, sec in heaviest(imported, args.top):
+                print(f"  {name:<24} {sec * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the ingest and report pipeline.
+
+Generates a synthetic Rapport export, times each stage of the pipeline
+(parsing, processing, DB insert, report routes, PDF builders) against a
+throw-away database and appends the results to a JSON history file. Each run
+is compared with the previous run that used the same parameters so
+regressions show up before deploying.
+
+Usage:
+  python -m benchmarks.run_benchmarks
+  python -m benchmarks.run_benchmarks --vehicles 200 --days 31 --repeat 5
+  python -m benchmarks.run_benchmarks --only pipeline reports --fail-on-regression
+  GPS_SQLITE_PROFILE=default python -m benchmarks.run_benchmarks --only concurrency
+  python -m benchmarks.run_benchmarks --database-url postgresql+psycopg://localhost/gps_bench
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.synthetic import write_rapport_csv, registry_rows
+import database
+
+DEFAULT_HISTORY = Path(__file__).resolve().parent / 'results' / 'history.json'
+START_DATE = datetime(2025, 12, 1)
+
+
+def measure(fn, repeat=3, setup=None):
+    """Run `fn` `repeat` times (calling `setup` untimed before each run).
+    Returns ({'best': s, 'mean': s}, last return value of fn).
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return {'best': min(times), 'mean': sum(times) / len(times)}, result
+
+
+def get_app(ctx):
+    """Import the Flask app once, pointed at the benchmark's temporary folders.
+    GPS_DATABASE_URL is set in main() before this import happens.
+    """
+    if 'app' not in ctx:
+        import app as app_module
+        app_module.app.config['UPLOAD_FOLDER'] = ctx['workdir'] / 'uploads'
+        app_module.app.config['OUTPUT_FOLDER'] = ctx['workdir'] / 'output'
+        app_module.app.config['UPLOAD_FOLDER'].mkdir(exist_ok=True)
+        app_module.app.config['OUTPUT_FOLDER'].mkdir(exist_ok=True)
+        # Repeated identical report requests must generate the report each time
+        app_module.app.config['REPORT_CACHE'] = False
+        ctx['app'] = app_module
+    return ctx['app']
+
+
+def clear_activity(app_module):
+    """Empty every table an upload writes, so each timed upload starts from the same state."""
+    from models import db, VehicleActivity, VehicleCumulative, SiteActivity, CourseInterval
+    with app_module.app.app_context():
+        VehicleActivity.query.delete()
+        VehicleCumulative.query.delete()
+        SiteActivity.query.delete()
+        CourseInterval.query.delete()
+        db.session.commit()
+
+
+def load_registry(ctx):
+    app_module = get_app(ctx)
+    from models import db, Vehicle
+    with app_module.app.app_context():
+        Vehicle.query.delete()
+        for row in registry_rows(ctx['params']['vehicles']):
+            db.session.add(Vehicle(**row))
+        db.session.commit()
+
+
+def bench_pipeline(ctx):
+    """load_file, process_dataframe and split_interval_at_20."""
+    from report_logic import load_file, process_dataframe, split_interval_at_20, course_mask, parse_datetime
+    results = {}
+    repeat = ctx['repeat']
+
+    results['load_file'], df = measure(lambda: load_file(ctx['csv']), repeat)
+    results['load_file']['rows'] = len(df)
+
+    results['process_dataframe'], processed = measure(lambda: process_dataframe(df, include_date=True), repeat)
+    results['process_dataframe']['rows'] = len(df)
+    ctx['processed'] = processed
+
+    # Build the Course intervals once, then time the split on its own
+    course = df[course_mask(df['CAA']).to_numpy()]
+    intervals = []
+    for start_str, stop_str in zip(course['Heure de départ'], course["Heure d'arrêt"]):
+        start = parse_datetime(start_str)
+        stop = datetime.combine(start.date(), datetime.strptime(stop_str.strip(), '%H:%M').time())
+        intervals.append((start, stop))
+
+    def split_all():
+        for start, stop in intervals:
+            split_interval_at_20(start, stop)
+        return len(intervals)
+
+    results['split_interval_at_20'], n = measure(split_all, repeat)
+    results['split_interval_at_20']['rows'] = n
+    return results
+
+
+def store_processed(processed):
+    """Insert process_dataframe output the way /upload does; returns record count."""
+    from datastore import store_daily_activity
+    from models import db
+    count = store_daily_activity(db.session, processed)
+    db.session.commit()
+    return count
+
+
+def bench_database(ctx):
+    """DB insert of processed aggregates and the full /upload route."""
+    from report_logic import load_file, process_dataframe
+    app_module = get_app(ctx)
+    results = {}
+    repeat = ctx['repeat']
+    processed = ctx.get('processed')
+    if processed is None:
+        processed = process_dataframe(load_file(ctx['csv']), include_date=True)
+
+    def insert():
+        with app_module.app.app_context():
+            return store_processed(processed)
+
+    results['db_insert'], n = measure(insert, repeat, setup=lambda: clear_activity(app_module))
+    results['db_insert']['rows'] = n
+
+    client = app_module.app.test_client()
+
+    def upload():
+        with open(ctx['csv'], 'rb') as f:
+            resp = client.post('/upload', data={'file': (f, 'bench.csv')}, content_type='multipart/form-data')
+        if resp.status_code != 200:
+            raise RuntimeError(f'/upload failed: {resp.get_json()}')
+        return resp.get_json()['records']
+
+    results['upload_route'], n = measure(upload, repeat, setup=lambda: clear_activity(app_module))
+    results['upload_route']['rows'] = n
+    return results
+
+
+def ensure_data(ctx):
+    """Make sure the benchmark database holds the synthetic upload and registry."""
+    app_module = get_app(ctx)
+    from models import VehicleActivity
+    with app_module.app.app_context():
+        has_data = VehicleActivity.query.first() is not None
+    if not has_data:
+        with open(ctx['csv'], 'rb') as f:
+            app_module.app.test_client().post('/upload', data={'file': (f, 'bench.csv')}, content_type='multipart/form-data')
+    load_registry(ctx)
+    return app_module
+
+
+def bench_reports(ctx):
+    """Each report route, in CSV and PDF format."""
+    app_module = ensure_data(ctx)
+    client = app_module.app.test_client()
+    iso_year, iso_week, _ = START_DATE.isocalendar()
+    routes = {
+        'by_date': ('/report/by-date', {'date': START_DATE.date().isoformat()}),
+        'by_week': ('/report/by-week', {'year': iso_year, 'week': iso_week}),
+        'by_month': ('/report/by-month', {'year': START_DATE.year, 'month': START_DATE.month}),
+        'by_range': ('/report/by-range', {'from': START_DATE.date().isoformat(),
+                                          'to': (START_DATE + timedelta(days=ctx['params']['days'] - 1)).date().isoformat()}),
+    }
+    results = {}
+    for name, (url, payload) in routes.items():
+        for fmt in ('csv', 'pdf'):
+            def call():
+                resp = client.post(url, json=dict(payload, format=fmt))
+                if resp.status_code != 200:
+                    raise RuntimeError(f'{url} failed: {resp.get_json()}')
+                return resp.get_json()['rows']
+
+            key = f'report_{name}_{fmt}'
+            results[key], rows = measure(call, ctx['repeat'])
+            results[key]['rows'] = rows
+    return results
+
+
+def bench_pdf(ctx):
+    """Each PDF builder on its own, without the route and DB query."""
+    app_module = ensure_data(ctx)
+    import pdf_reports
+    from models import Vehicle, VehicleActivity
+    results = {}
+    repeat = ctx['repeat']
+    target = START_DATE.date()
+
+    with app_module.app.app_context():
+        vehicles_dict = {v.id: v for v in Vehicle.query.all()}
+        day_records = VehicleActivity.query.filter_by(date=target).all()
+        summary = {}
+        for record in VehicleActivity.query.all():
+            m = summary.setdefault(record.vehicle_code, {'hours_before_20h': 0.0, 'hours_after_20h': 0.0, 'km_before': 0.0, 'km_after': 0.0})
+            m['hours_before_20h'] += record.hours_before_20h
+            m['hours_after_20h'] += record.hours_after_20h
+            m['km_before'] += record.km_before
+            m['km_after'] += record.km_after
+
+        results['pdf_by_date'], _ = measure(
+            lambda: pdf_reports.generate_pdf_report_by_date(target, day_records, vehicles_dict), repeat)
+        results['pdf_by_date']['rows'] = len(day_records)
+        results['pdf_by_month'], _ = measure(
+            lambda: pdf_reports.generate_pdf_report_by_month(target.year, target.month, summary, vehicles_dict), repeat)
+        results['pdf_by_month']['rows'] = len(summary)
+        results['pdf_by_week'], _ = measure(
+            lambda: pdf_reports.generate_pdf_report_by_week(target.year, 1, '2025-12-01', '2025-12-07', summary, vehicles_dict), repeat)
+        results['pdf_by_week']['rows'] = len(summary)
+        results['pdf_vehicle_list'], _ = measure(pdf_reports.generate_vehicle_list_pdf, repeat)
+        results['pdf_vehicle_list']['rows'] = len(vehicles_dict)
+    return results
+
+
+def bench_concurrency(ctx):
+    """Simultaneous uploads with report reads running (see bench_concurrency.py)."""
+    from benchmarks.bench_concurrency import run_concurrency
+    app_module = get_app(ctx)
+    params = ctx['params']
+    results = run_concurrency(app_module, ctx['workdir'], vehicles=params['vehicles'], days=params['days'], rows_per_day=params['rows_per_day'])
+    for res in results.values():
+        res.pop('error_samples', None)
+    return results
+
+
+def bench_startup(ctx):
+    """Cold import time of the app and tools (see bench_startup.py)."""
+    from benchmarks.bench_startup import run_startup
+    return run_startup(ctx['repeat'])
+
+
+# Benchmark groups, run in this order
+BENCHMARKS = {
+    'startup': bench_startup,
+    'pipeline': bench_pipeline,
+    'database': bench_database,
+    'reports': bench_reports,
+    'pdf': bench_pdf,
+    'concurrency': bench_concurrency,
+}
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def load_history(path):
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def find_regressions(history, entry, threshold):
+    """Compare `entry` with the latest history entry that used the same params.
+    Returns a list of (name, previous_best, current_best) slower than threshold.
+    """
+    previous = next((h for h in reversed(history) if h.get('params') == entry['params']), None)
+    if not previous:
+        return []
+    regressions = []
+    for name, res in entry['results'].items():
+        prev = previous['results'].get(name)
+        if prev and res['best'] > prev['best'] * (1 + threshold):
+            regressions.append((name, prev['best'], res['best']))
+    return regressions
+
+
+def main():
+    import argparse
+
+    p = argparse.ArgumentParser(description="Benchmark the ingest and report pipeline")
+    p.add_argument("--vehicles", type=int, default=50, help="Fleet size of the synthetic export")
+    p.add_argument("--days", type=int, default=7, help="Days covered by the synthetic export")
+    p.add_argument("--rows-per-day", type=int, default=20, help="Rows per vehicle and day")
+    p.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (best is kept)")
+    p.add_argument("--only", nargs='+', choices=list(BENCHMARKS), help="Run only these groups")
+    p.add_argument("--history", default=str(DEFAULT_HISTORY), help="JSON history file")
+    p.add_argument("--threshold", type=float, default=0.2, help="Slowdown ratio reported as regression")
+    p.add_argument("--fail-on-regression", action='store_true', help="Exit with status 1 on regression")
+    p.add_argument("--database-url", help="Run against this database instead of a temporary SQLite file "
+                                          "(e.g. postgresql+psycopg://localhost/gps_bench); its tables are emptied")
+    args = p.parse_args()
+
+    params = {
+        'vehicles': args.vehicles, 'days': args.days, 'rows_per_day': args.rows_per_day,
+        'sqlite_profile': os.environ.get('GPS_SQLITE_PROFILE', 'performance'),
+    }
+    if args.database_url and database.backend_name(args.database_url) != 'sqlite':
+        # Keep SQLite runs comparable with the existing history
+        params['backend'] = database.backend_name(args.database_url)
+    with tempfile.TemporaryDirectory(prefix='gps_bench_') as tmp:
+        workdir = Path(tmp)
+        os.environ['GPS_DATABASE_URL'] = args.database_url or f"sqlite:///{workdir / 'bench.db'}"
+        csv_path = workdir / 'bench.csv'
+        rows = write_rapport_csv(csv_path, args.vehicles, args.days, args.rows_per_day)
+        print(f"Synthetic export: {rows} rows ({args.vehicles} vehicles x {args.days} days)")
+
+        ctx = {'csv': csv_path, 'workdir': workdir, 'repeat': args.repeat, 'params': params}
+        results = {}
+        for group, fn in BENCHMARKS.items():
+            if args.only and group not in args.only:
+                continue
+            print(f"\n[{group}]")
+            for name, res in fn(ctx).items():
+                results[name] = res
+                rows_info = f"  ({res['rows']} rows)" if 'rows' in res else ''
+                if res.get('eager_heavy_imports'):
+                    rows_info += f"  ⚠️  loads {', '.join(res['eager_heavy_imports'])} at import"
+                print(f"  {name:<28} best {res['best'] * 1000:9.1f} ms   mean {res['mean'] * 1000:9.1f} ms{rows_info}")
+
+        if 'app' in ctx:
+            # Release SQLite handles before the temp directory is removed
+            with ctx['app'].app.app_context():
+                ctx['app'].db.engine.dispose()
+
+    entry = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'params': params,
+        'results': results,
+    }
+    history = load_history(args.history)
+    regressions = find_regressions(history, entry, args.threshold)
+    history.append(entry)
+    Path(args.history).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.history, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    print(f"\n✓ Results appended to {args.history}")
+
+    if regressions:
+        print(f"\n⚠️  {len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for name, prev, cur in regressions:
+            print(f"  {name}: {prev * 1000:.1f} ms -> {cur * 1000:.1f} ms")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Synthetic generator for GPS "Rapport" exports.
+
+Writes CSV files in the same layout as the provider's export (metadata line,
+semicolon separator, French headers, comma decimals) so the pipeline can be
+benchmarked on fleets and periods much larger than sample.csv.
+"""
+
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+HEADER = [
+    'Code', 'Conducteur', 'Famille', 'Type', 'Marque', 'Telephone', 'Immat',
+    "Heure de départ", "Heure d'arrêt", 'Durée', 'Chantier', 'CAA', 'KM',
+    'Carburant Depart', 'Carburant Arrêt', 'Consomation Carburant'
+]
+METADATA_LINE = ';;;;;;1213;RAPPORT DATA;;'
+SITES = ['Chantier Nord', 'Chantier Sud', 'Depot Central', 'Carriere Est', 'Port']
+CATEGORIES = ['Camion', 'Engin', 'Voiture', 'Citerne']
+
+
+def vehicle_codes(vehicles):
+    """Return `vehicles` codes in the export's style (C001, PK002, V003, ...)."""
+    prefixes = ['C', 'PK', 'V']
+    return [f'{prefixes[i % len(prefixes)]}{i + 1:03d}' for i in range(vehicles)]
+
+
+def generate_rows(vehicles=50, days=7, rows_per_day=20, start_date=datetime(2025, 12, 1), seed=0):
+    """Yield export rows (lists of strings) for a synthetic fleet.
+
+    Each vehicle-day is a chain of alternating Arrêt/Course intervals that
+    covers the day from midnight, with roughly `rows_per_day` rows.
+    """
+    rng = random.Random(seed)
+    codes = vehicle_codes(vehicles)
+    mean_minutes = max(1440 / max(rows_per_day, 1), 2)
+
+    for day in range(days):
+        day_start = start_date + timedelta(days=day)
+        for code in codes:
+            t = 0
+            driving = rng.random() < 0.5
+            count = 0
+            while t < 1439 and count < rows_per_day:
+                dur = max(1, int(rng.uniform(0.2, 1.8) * mean_minutes))
+                end = min(t + dur, 1439)
+                start_dt = day_start + timedelta(minutes=t)
+                stop_dt = day_start + timedelta(minutes=end)
+                minutes = end - t
+                if driving:
+                    km = minutes * rng.uniform(0.1, 0.9)
+                    status = 'Course'
+                    site = rng.choice(SITES)
+                else:
+                    km = 0.0
+                    status = 'Arrêt'
+                    site = 'Hors Chantier'
+                yield [
+                    code, '', '', '', '', '', '',
+                    start_dt.strftime('%d/%m/%Y %H:%M'),
+                    stop_dt.strftime('%H:%M'),
+                    f'{minutes // 60}:{minutes % 60:02d}:00',
+                    site,
+                    status,
+                    f'{km:.1f} '.replace('.', ','),
+                    '', '', ''
+                ]
+                t = end
+                driving = not driving
+                count += 1
+
+
+def write_rapport_csv(path, vehicles=50, days=7, rows_per_day=20, seed=0, start_date=datetime(2025, 12, 1)):
+    """Write a synthetic Rapport CSV to `path` and return the number of data rows."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        f.write(METADATA_LINE + '\n')
+        f.write(';'.join(HEADER) + '\n')
+        for row in generate_rows(vehicles, days, rows_per_day, start_date=start_date, seed=seed):
+            f.write(';'.join(row) + '\n')
+            count += 1
+    return count
+
+
+def registry_rows(vehicles=50, seed=0):
+    """Return vehicle registry dicts (id, matricule, name, category) for the synthetic fleet."""
+    rng = random.Random(seed)
+    return [
+        {
+            'id': code,
+            'matricule': f'{rng.randint(10000, 99999)}-A-{rng.randint(1, 80)}',
+            'name': f'Vehicule {code}',
+            'category': rng.choice(CATEGORIES)
+        }
+        for code in vehicle_codes(vehicles)
+    ]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    p = argparse.ArgumentParser(description="Generate a synthetic Rapport CSV")
+    p.add_argument("output", help="Output CSV path")
+    p.add_argument("--vehicles", type=int, default=50, help="Fleet size")
+    p.add_argument("--days", type=int, default=7, help="Number of days")
+    p.add_argument("--rows-per-day", type=int, default=20, help="Rows per vehicle and day")
+    p.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = p.parse_args()
+
+    n = write_rapport_csv(args.output, args.vehicles, args.days, args.rows_per_day, args.seed)
+    print(f"Wrote {n} rows to {args.output}")
@@ -0,0 +1,193 @@
+"""
+Time bucketing engine: splits intervals, and their prorated KM, into N named
+buckets in one vectorized pass.
+
+A schedule is an ordered list of rules plus a default bucket. Each second of
+an interval goes to the first rule that matches it, otherwise to the default.
+'buckets' optionally lists bucket names to report even when no rule fills
+them. A rule may test:
+
+    hours           [(start_hour, end_hour), ...] time-of-day windows (end <= 24)
+    weekdays        [0..6], Monday = 0
+    holiday         True: dates of the holiday calendar
+    first_day_only  True: only the calendar day the interval starts on
+
+The historical before/after 20:00 split is cutoff_schedule(20): time before
+the first 20:00 of the start day is "before", everything after it (including
+past midnight) is "after".
+
+How it works: every interval is cut into one piece per calendar day it
+touches, each day into elementary slots between the schedule's boundaries,
+and the bucket of each (day type, slot) pair is looked up in a table built
+once per schedule. No Python loop runs per interval.
+"""
+
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+DAY = 86400
+
+
+def cutoff_schedule(ref_hour=20):
+    """The historical single cut-off split (buckets 'before' and 'after').
+    A cut-off at 0 puts everything "after", at 24 the whole start day "before".
+    """
+    if not 0 <= ref_hour <= 24:
+        raise ValueError(f'Cut-off hour must be between 0 and 24, got {ref_hour}')
+    rules = [{'bucket': 'before', 'hours': [(0, ref_hour)], 'first_day_only': True}] if ref_hour > 0 else []
+    return {'rules': rules, 'default': 'after', 'buckets': ['before', 'after']}
+
+
+# Tariff buckets: holidays and Sundays whole-day, night 22:00-06:00, day otherwise
+TARIFF_SCHEDULE = {
+    'rules': [
+        {'bucket': 'holiday', 'holiday': True},
+        {'bucket': 'sunday', 'weekdays': [6]},
+        {'bucket': 'night', 'hours': [(22, 24), (0, 6)]},
+    ],
+    'default': 'day',
+}
+
+SCHEDULE_NAMES = ('cutoff', 'tariff')
+
+
+def get_schedule(name, ref_hour=20):
+    """Named schedule: 'cutoff' (split at ref_hour) or 'tariff'."""
+    if name == 'cutoff':
+        return cutoff_schedule(ref_hour)
+    if name == 'tariff':
+        return TARIFF_SCHEDULE
+    raise ValueError(f"Unknown schedule {name!r} (expected one of {', '.join(SCHEDULE_NAMES)})")
+
+
+def bucket_names(schedule):
+    """Bucket names: those listed in the schedule's optional 'buckets' (kept
+    even when no rule can fill them), then in rule order, the default last."""
+    names = list(schedule.get('buckets', ()))
+    for rule in schedule['rules']:
+        if rule['bucket'] not in names:
+            names.append(rule['bucket'])
+    if schedule['default'] not in names:
+        names.append(schedule['default'])
+    return names
+
+
+def parse_holidays(spec):
+    """Holiday dates from "2025-01-01,2025-05-01" or a file with one date per line."""
+    if not spec:
+        return []
+    if os.path.isfile(spec):
+        with open(spec, encoding='utf-8') as f:
+            items = [line.split('#')[0].strip() for line in f]
+    else:
+        items = [item.strip() for item in spec.split(',')]
+    return sorted({date.fromisoformat(item) for item in items if item})
+
+
+def _slots(schedule):
+    """Elementary time-of-day slots (seconds) delimited by every rule boundary."""
+    edges = {0, DAY}
+    for rule in schedule['rules']:
+        for a, b in rule.get('hours', ()):
+            if not 0 <= a < b <= 24:
+                raise ValueError(f"Invalid hours window {(a, b)} in rule {rule['bucket']!r}")
+            edges.update((int(a * 3600), int(b * 3600)))
+    edges = np.array(sorted(edges), dtype=np.int64)
+    return edges[:-1], edges[1:]
+
+
+def _rule_matches(rule, slot_start, slot_end, weekday, holiday, first_day):
+    if rule.get('first_day_only') and not first_day:
+        return False
+    if rule.get('holiday') and not holiday:
+        return False
+    if 'weekdays' in rule and weekday not in rule['weekdays']:
+        return False
+    if 'hours' in rule:
+        return any(a * 3600 <= slot_start and slot_end <= b * 3600 for a, b in rule['hours'])
+    return True
+
+
+def _lookup_table(schedule, slot_starts, slot_ends):
+    """Bucket index per (day class, slot); class = weekday * 4 + holiday * 2 + first_day."""
+    names = bucket_names(schedule)
+    table = np.full((28, len(slot_starts)), names.index(schedule['default']), dtype=np.int64)
+    for weekday in range(7):
+        for holiday in (0, 1):
+            for first_day in (0, 1):
+                cls = weekday * 4 + holiday * 2 + first_day
+                for j, (a, b) in enumerate(zip(slot_starts, slot_ends)):
+                    for rule in schedule['rules']:
+                        if _rule_matches(rule, a, b, weekday, holiday, first_day):
+                            table[cls, j] = names.index(rule['bucket'])
+                            break
+    return table
+
+
+def split_buckets(start, stop, schedule, holidays=()):
+    """Split intervals [start, stop) into the schedule's buckets.
+    Returns (names, seconds): seconds is an (intervals x buckets) float array.
+    """
+    s = np.asarray(start, dtype='datetime64[s]').astype(np.int64)
+    e = np.maximum(np.asarray(stop, dtype='datetime64[s]').astype(np.int64), s)
+    names = bucket_names(schedule)
+    n, nb = len(s), len(names)
+    if n == 0:
+        return names, np.zeros((0, nb))
+
+    # One piece per calendar day touched by each interval
+    first = s // DAY
+    counts = np.maximum(e - 1, s) // DAY - first + 1
+    owner = np.repeat(np.arange(n), counts)
+    offset = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    day = first[owner] + offset
+    piece_start = np.maximum(s[owner], day * DAY) - day * DAY
+    piece_end = np.minimum(e[owner], (day + 1) * DAY) - day * DAY
+
+    weekday = (day + 3) % 7  # 1970-01-01 was a Thursday
+    holiday_days = np.array([np.datetime64(d, 'D') for d in holidays], dtype='datetime64[D]').astype(np.int64)
+    holiday = np.isin(day, holiday_days)
+    cls = weekday * 4 + holiday * 2 + (offset == 0)
+
+    slot_starts, slot_ends = _slots(schedule)
+    overlap = np.clip(np.minimum(piece_end[:, None], slot_ends) - np.maximum(piece_start[:, None], slot_starts), 0, None)
+    bucket = _lookup_table(schedule, slot_starts, slot_ends)[cls]
+
+    index = np.repeat(owner, len(slot_starts)) * nb + bucket.ravel()
+    seconds = np.bincount(index, weights=overlap.ravel().astype(float), minlength=n * nb)
+    return names, seconds.reshape(n, nb)
+
+
+def prorate_km(km, seconds):
+    """Split each interval's KM across buckets in proportion to the seconds."""
+    km = np.asarray(km, dtype=float)
+    total = seconds.sum(axis=1)
+    share = np.divide(seconds, total[:, None], out=np.zeros_like(seconds), where=total[:, None] > 0)
+    return share * km[:, None]
+
+
+def bucket_intervals(intervals: pd.DataFrame, schedule, holidays=(), by=()):
+    """Per vehicle-day bucket totals of intervals (columns vehicle, start, stop, km).
+    Returns vehicle, date, the extra `by` columns (e.g. 'site'), then
+    `<bucket>_sec` and `km_<bucket>` per bucket; the day is the start date.
+    Intervals with stop <= start are ignored.
+    """
+    iv = intervals[intervals['stop'] > intervals['start']]
+    names, seconds = split_buckets(iv['start'].to_numpy(), iv['stop'].to_numpy(), schedule, holidays)
+    km = prorate_km(iv['km'].to_numpy(dtype=float), seconds)
+    data = {
+        'vehicle': iv['vehicle'].to_numpy(),
+        'date': pd.to_datetime(iv['start']).dt.normalize().to_numpy(),
+    }
+    for column in by:
+        data[column] = iv[column].to_numpy()
+    for i, name in enumerate(names):
+        data[f'{name}_sec'] = seconds[:, i]
+    for i, name in enumerate(names):
+        data[f'km_{name}'] = km[:, i]
+    daily = pd.DataFrame(data).groupby(['vehicle', 'date', *by], sort=True).sum().reset_index()
+    daily['date'] = daily['date'].dt.date
+    return daily
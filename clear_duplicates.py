@@ -4,37 +4,57 @@ Script to identify and clear duplicate records from the database.
 Useful when the same CSV file has been uploaded multiple times.
 """
 
-from models import db, VehicleActivity, Vehicle
-from app import app
-from datetime import datetime
+from datastore import session_scope, create_schema, VehicleActivity, SiteActivity, CourseInterval, update_cumulative, \
+    bump_data_version
+from sqlalchemy import func
 from collections import defaultdict
 
-def find_duplicates():
-    """Find duplicate records (same date + vehicle_code)."""
-    with app.app_context():
-        # Group records by date and vehicle_code
-        records = VehicleActivity.query.all()
-        
-        grouped = defaultdict(list)
-        for record in records:
-            key = (record.date, record.vehicle_code)
-            grouped[key].append(record)
-        
-        duplicates = {k: v for k, v in grouped.items() if len(v) > 1}
-        
-        if not duplicates:
-            print("✓ No duplicate records found!")
-            return {}
-        
-        print(f"\n⚠️  Found {len(duplicates)} duplicate(s):\n")
-        for (date, vehicle), records in sorted(duplicates.items()):
-            print(f"  Date: {date} | Vehicle: {vehicle}")
-            print(f"    Records: {len(records)}")
-            for i, rec in enumerate(records, 1):
-                print(f"      [{i}] ID={rec.id} | Hours: {rec.hours_before_20h:.2f}h/{rec.hours_after_20h:.2f}h | KM: {rec.km_before:.2f}/{rec.km_after:.2f} | Uploaded: {rec.uploaded_at}")
-            print()
-        
-        return duplicates
+def find_duplicates(session):
+    """Find duplicate records (same date + vehicle_code) in `session`."""
+    # Group records by date and vehicle_code
+    records = session.query(VehicleActivity).all()
+    
+    grouped = defaultdict(list)
+    for record in records:
+        key = (record.date, record.vehicle_code)
+        grouped[key].append(record)
+    
+    duplicates = {k: v for k, v in grouped.items() if len(v) > 1}
+    
+    if not duplicates:
+        print("✓ No duplicate records found!")
+        return {}
+    
+    print(f"\n⚠️  Found {len(duplicates)} duplicate(s):\n")
+    for (date, vehicle), records in sorted(duplicates.items()):
+        print(f"  Date: {date} | Vehicle: {vehicle}")
+        print(f"    Records: {len(records)}")
+        for i, rec in enumerate(records, 1):
+            print(f"      [{i}] ID={rec.id} | Hours: {rec.hours_before_20h:.2f}h/{rec.hours_after_20h:.2f}h | KM: {rec.km_before:.2f}/{rec.km_after:.2f} | Uploaded: {rec.uploaded_at}")
+        print()
+    
+    return duplicates
+
+def delete_child_rows(session, removed, keep_latest=True):
+    """Delete the site and interval rows stored by the removed uploads
+    ((date, vehicle, uploaded_at) of each deleted record). Intervals stored
+    before they carried uploaded_at keep one copy of each (start, stop, km),
+    or none without `keep_latest`. Returns the count."""
+    deleted = 0
+    for date, vehicle, uploaded_at in removed:
+        for model in (SiteActivity, CourseInterval):
+            deleted += session.query(model).filter(
+                model.date == date, model.vehicle_code == vehicle, model.uploaded_at == uploaded_at
+            ).delete(synchronize_session=False)
+    C = CourseInterval
+    for date, vehicle in sorted({(d, v) for d, v, _ in removed}):
+        legacy = session.query(C.id).filter(C.date == date, C.vehicle_code == vehicle, C.uploaded_at.is_(None))
+        if keep_latest:
+            kept = session.query(func.max(C.id)).filter(C.date == date, C.vehicle_code == vehicle, C.uploaded_at.is_(None)) \
+                .group_by(C.start, C.stop, C.km)
+            legacy = legacy.filter(C.id.not_in(kept.scalar_subquery()))
+        deleted += session.query(C).filter(C.id.in_(legacy.scalar_subquery())).delete(synchronize_session=False)
+    return deleted
 
 def clear_duplicates(keep_latest=True):
     """
@@ -43,13 +63,15 @@ def clear_duplicates(keep_latest=True):
     Args:
         keep_latest: If True, keep the most recently uploaded record
     """
-    with app.app_context():
-        duplicates = find_duplicates()
+    with session_scope() as session:
+        duplicates = find_duplicates(session)
         
         if not duplicates:
             return
         
         total_deleted = 0
+        touched = set()
+        removed = []
         
         for (date, vehicle), records in duplicates.items():
             if keep_latest:
@@ -62,10 +84,18 @@ def clear_duplicates(keep_latest=True):
             
             for record in to_delete:
                 print(f"  🗑️  Deleting: {date} | {vehicle} | Uploaded: {record.uploaded_at}")
-                db.session.delete(record)
+                session.delete(record)
+                touched.add((date, vehicle))
+                removed.append((date, vehicle, record.uploaded_at))
                 total_deleted += 1
         
-        db.session.commit()
+        if touched:
+            session.flush()
+            children = delete_child_rows(session, removed, keep_latest)
+            print(f"  🗑️  Deleting {children} site/interval row(s) of those uploads")
+            update_cumulative(session, since=min(d for d, _ in touched), vehicles={v for _, v in touched})
+            bump_data_version(session)
+        session.commit()
         print(f"\n✓ Deleted {total_deleted} duplicate record(s)")
         print("✓ Database cleaned!")
 
@@ -78,10 +108,12 @@ if __name__ == '__main__':
     
     if len(sys.argv) > 1 and sys.argv[1] == '--clear':
         print("\n⚠️  CLEARING DUPLICATES (keeping latest uploads)...\n")
+        create_schema()  # the data version row the clear bumps
         clear_duplicates(keep_latest=True)
     else:
         print("\nScanning for duplicates...\n")
-        find_duplicates()
+        with session_scope() as session:
+            find_duplicates(session)
         print("\nTo CLEAR duplicates, run:")
         print("  python clear_duplicates.py --clear")
         print("\nThis will DELETE old duplicate records, keeping only the latest upload.")
@@ -0,0 +1,40 @@
+"""
+Lightweight data access: the tables plus a plain SQLAlchemy engine/session.
+
+Maintenance scripts use this instead of `from app import app`, which would
+load Flask, pandas and reportlab and create the schema as a side effect.
+
+    from datastore import session_scope, VehicleActivity
+
+    with session_scope() as session:
+        session.query(VehicleActivity).count()
+"""
+
+from datastore.models import Base, Vehicle, VehicleActivity, VehicleCumulative, CourseInterval, SiteActivity, DataVersion, \
+    RequestMetric
+from datastore.session import DEFAULT_DATABASE_URL, database_url, get_engine, session_scope, create_schema, \
+    create_missing_columns, create_missing_indexes
+from datastore.activity import store_daily_activity, existing_dates, delete_activity, activity_dates
+from datastore.bulk import bulk_insert
+from datastore.cumulative import update_cumulative, range_totals, cumulative_missing
+from datastore.intervals import intervals_enabled, store_intervals, load_intervals, recompute_activity
+from datastore.request_metrics import request_metrics_enabled, request_metrics_days, store_request_metric, \
+    prune_request_metrics
+from datastore.sites import sites_enabled, store_site_activity
+from datastore.timeline import vehicle_timeline, vehicle_totals
+from datastore.version import data_version, bump_data_version, ensure_data_version
+from datastore.vehicles import sync_vehicle_registry, upsert_vehicles, list_vehicles
+
+__all__ = [
+    'Base', 'Vehicle', 'VehicleActivity', 'VehicleCumulative', 'CourseInterval', 'SiteActivity', 'DataVersion', 'RequestMetric',
+    'DEFAULT_DATABASE_URL', 'database_url', 'get_engine', 'session_scope', 'create_schema', 'create_missing_columns',
+    'create_missing_indexes',
+    'store_daily_activity', 'existing_dates', 'delete_activity', 'activity_dates',
+    'sync_vehicle_registry', 'upsert_vehicles', 'list_vehicles', 'bulk_insert',
+    'update_cumulative', 'range_totals', 'cumulative_missing',
+    'intervals_enabled', 'store_intervals', 'load_intervals', 'recompute_activity',
+    'request_metrics_enabled', 'request_metrics_days', 'store_request_metric', 'prune_request_metrics',
+    'sites_enabled', 'store_site_activity',
+    'vehicle_timeline', 'vehicle_totals',
+    'data_version', 'bump_data_version', 'ensure_data_version',
+]
@@ -0,0 +1,115 @@
+"""
+Storing processed daily activity (the output of report_logic.process_dataframe).
+"""
+
+from datetime import date, datetime
+
+from sqlalchemy import delete, func
+
+from datastore.bulk import bulk_insert
+from datastore.cumulative import update_cumulative
+from datastore.intervals import store_intervals, interval_filters
+from datastore.models import CourseInterval, SiteActivity, VehicleActivity
+from datastore.sites import store_site_activity
+from datastore.version import bump_data_version
+
+
+def daily_rows(processed):
+    """Yield (date, vehicle, metrics) for each vehicle-day in `processed`."""
+    for vehicle, day_map in zip(processed['vehicle'], processed['day_map']):
+        if day_map:
+            for (year, month, day), metrics in day_map.items():
+                yield date(year, month, day), vehicle, metrics
+
+
+def existing_dates(session, processed):
+    """Return the sorted dates of `processed` that already have a record for the same vehicle."""
+    wanted = {(d, v) for d, v, _ in daily_rows(processed)}
+    if not wanted:
+        return []
+    dates = {d for d, _ in wanted}
+    stored = session.query(VehicleActivity.date, VehicleActivity.vehicle_code).filter(
+        VehicleActivity.date.in_(dates)
+    ).all()
+    return sorted({d for d, v in stored if (d, v) in wanted})
+
+
+def activity_dates(session, start=None, end=None, before=None, limit=100):
+    """One page of the dates with activity, newest first, within [start, end]
+    and older than `before` (the previous page's cursor). Reads the date
+    index only. Returns (dates, next_cursor).
+    """
+    A = VehicleActivity
+    filters = []
+    if start is not None:
+        filters.append(A.date >= start)
+    if end is not None:
+        filters.append(A.date <= end)
+    if before is not None:
+        filters.append(A.date < before)
+    dates = [d for (d,) in session.query(A.date).filter(*filters).distinct()
+             .order_by(A.date.desc()).limit(limit + 1)]
+    next_cursor = dates[limit - 1] if len(dates) > limit else None
+    return dates[:limit], next_cursor
+
+
+def store_daily_activity(session, processed, intervals=None, sites=None):
+    """Insert one VehicleActivity per vehicle-day of `processed` in bulk
+    (COPY on PostgreSQL) and update the cumulative totals of the vehicles
+    concerned; returns the count. `intervals` (from process_dataframe(...,
+    return_intervals=True)) and `sites` (metrics['sites'] with
+    return_metrics=True) are stored too when given. The caller commits.
+    """
+    uploaded_at = datetime.utcnow()
+    rows = [
+        {
+            'date': day,
+            'vehicle_code': vehicle,
+            'hours_before_20h': metrics['before_sec'] / 3600,
+            'hours_after_20h': metrics['after_sec'] / 3600,
+            'km_before': metrics['km_before'],
+            'km_after': metrics['km_after'],
+            'uploaded_at': uploaded_at,
+        }
+        for day, vehicle, metrics in daily_rows(processed)
+    ]
+    count = bulk_insert(session, VehicleActivity, rows)
+    store_intervals(session, intervals, uploaded_at)
+    store_site_activity(session, sites, uploaded_at)
+    if rows:
+        update_cumulative(session, since=min(r['date'] for r in rows), vehicles={r['vehicle_code'] for r in rows})
+        bump_data_version(session)
+    return count
+
+
+def delete_activity(session, start=None, end=None, dates=None, vehicles=None):
+    """Delete the activity of [start, end] (or of the listed `dates`),
+    optionally only for `vehicles`, with one DELETE, along with the stored
+    intervals, site rows and cumulative totals. Returns {date: deleted count}.
+    The caller commits.
+    """
+    A = VehicleActivity
+    if dates is not None:
+        dates = sorted(set(dates))
+        if not dates:
+            return {}
+        filters = [A.date.in_(dates)]
+    else:
+        if start is None:
+            raise ValueError('start (or dates) is required')
+        end = start if end is None else end
+        filters = [A.date >= start, A.date <= end]
+    if vehicles is not None:
+        vehicles = sorted(set(vehicles))
+        filters.append(A.vehicle_code.in_(vehicles))
+
+    counts = dict(session.query(A.date, func.count()).filter(*filters).group_by(A.date).order_by(A.date).all())
+    # Site rows exist without activity rows (idle-only vehicle-days)
+    deleted = sum(session.execute(delete(model).where(*interval_filters(start, end, dates, vehicles, model=model))).rowcount
+                  for model in (CourseInterval, SiteActivity))
+    if counts:
+        session.execute(delete(A).where(*filters))
+        update_cumulative(session, since=min(counts), vehicles=vehicles)
+    if counts or deleted:
+        bump_data_version(session)
+    return counts
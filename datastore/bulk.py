@@ -0,0 +1,57 @@
+"""
+Backend-specific bulk loading.
+
+PostgreSQL loads rows with COPY ... FROM STDIN (psycopg 3 or psycopg2);
+other backends use one executemany INSERT.
+"""
+
+import csv
+import io
+
+from sqlalchemy import insert
+
+
+def _copy_psycopg(cursor, sql, columns, rows):
+    # psycopg 3: stream rows, the driver does the escaping
+    with cursor.copy(sql) as copy:
+        for row in rows:
+            copy.write_row([row[c] for c in columns])
+
+
+def _copy_psycopg2(cursor, sql, columns, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        # Unquoted empty field = NULL in COPY's CSV format
+        writer.writerow(['' if row[c] is None else row[c] for c in columns])
+    buf.seek(0)
+    cursor.copy_expert(f'{sql} WITH (FORMAT csv)', buf)
+
+
+def copy_rows(session, table, rows):
+    """Load `rows` (dicts with the same keys) into `table` with COPY.
+    Runs on the session's connection, so it is part of its transaction.
+    """
+    columns = list(rows[0])
+    sql = f'COPY {table.name} ({", ".join(columns)}) FROM STDIN'
+    cursor = session.connection().connection.dbapi_connection.cursor()
+    try:
+        if hasattr(cursor, 'copy'):
+            _copy_psycopg(cursor, sql, columns, rows)
+        else:
+            _copy_psycopg2(cursor, sql, columns, rows)
+    finally:
+        cursor.close()
+
+
+def bulk_insert(session, model, rows):
+    """Insert `rows` (list of dicts) into `model`'s table; returns the count.
+    The caller commits.
+    """
+    if not rows:
+        return 0
+    if session.get_bind().dialect.name == 'postgresql':
+        copy_rows(session, model.__table__, rows)
+    else:
+        session.execute(insert(model.__table__), rows)
+    return len(rows)
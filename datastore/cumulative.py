@@ -0,0 +1,115 @@
+"""
+Per-vehicle cumulative daily totals (prefix sums) for arbitrary date ranges.
+
+vehicle_cumulative holds, per vehicle and activity date, the running sums of
+vehicle_activity. A range total is the difference of two rows per vehicle, so
+its cost does not depend on the range length. Writers of vehicle_activity call
+update_cumulative() in the same transaction; only the suffix from the first
+changed date is rewritten, which for a normal upload (new days at the end) is
+just the uploaded days.
+"""
+
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.orm import aliased
+
+from datastore.bulk import bulk_insert
+from datastore.models import VehicleActivity, VehicleCumulative
+
+METRICS = ('hours_before_20h', 'hours_after_20h', 'km_before', 'km_after')
+
+
+def _latest_rows(session, bound, inclusive, vehicles=None):
+    """{vehicle: cumulative row} for each vehicle's last date <= bound (< bound if not inclusive).
+
+    Index seeks only, whatever the length of the history: the vehicle codes
+    are enumerated by a loose index scan (recursive "next code after" on the
+    primary key), then each vehicle's row is found with ORDER BY date DESC
+    LIMIT 1 on its (vehicle_code, date) key.
+    """
+    C = VehicleCumulative
+    codes = select(func.min(C.vehicle_code).label('code')).cte('codes', recursive=True)
+    following = aliased(C)
+    codes = codes.union_all(
+        select(select(func.min(following.vehicle_code)).where(following.vehicle_code > codes.c.code)
+               .scalar_subquery())
+        .where(codes.c.code.is_not(None))
+    )
+    latest = aliased(C)
+    latest_date = select(latest.date).where(
+        latest.vehicle_code == codes.c.code,
+        latest.date <= bound if inclusive else latest.date < bound
+    ).order_by(latest.date.desc()).limit(1).scalar_subquery()
+    rows = session.query(C).select_from(codes).join(C, and_(C.vehicle_code == codes.c.code, C.date == latest_date))
+    if vehicles is not None:
+        rows = rows.filter(codes.c.code.in_(vehicles))
+    return {row.vehicle_code: row for row in rows}
+
+
+def update_cumulative(session, since=None, vehicles=None):
+    """Rewrite the cumulative rows from `since` on (all dates if None) for
+    `vehicles` (all if None) after vehicle_activity changed. Returns the number
+    of rows written. The caller commits.
+    """
+    C, A = VehicleCumulative, VehicleActivity
+    if vehicles is not None:
+        vehicles = sorted(set(vehicles))
+        if not vehicles:
+            return 0
+
+    stale = delete(C)
+    if since is not None:
+        stale = stale.where(C.date >= since)
+    if vehicles is not None:
+        stale = stale.where(C.vehicle_code.in_(vehicles))
+    session.execute(stale)
+
+    base = _latest_rows(session, since, inclusive=False, vehicles=vehicles) if since is not None else {}
+
+    daily = session.query(
+        A.vehicle_code, A.date,
+        *[func.sum(getattr(A, m)).label(m) for m in METRICS],
+        func.count().label('days')
+    )
+    if since is not None:
+        daily = daily.filter(A.date >= since)
+    if vehicles is not None:
+        daily = daily.filter(A.vehicle_code.in_(vehicles))
+    daily = daily.group_by(A.vehicle_code, A.date).order_by(A.vehicle_code, A.date)
+
+    rows = []
+    running = {}
+    for row in daily:
+        totals = running.get(row.vehicle_code)
+        if totals is None:
+            prev = base.get(row.vehicle_code)
+            totals = {m: getattr(prev, m) if prev else 0.0 for m in METRICS}
+            totals['days'] = prev.days if prev else 0
+            running[row.vehicle_code] = totals
+        for m in METRICS:
+            totals[m] += getattr(row, m) or 0.0
+        totals['days'] += row.days
+        rows.append({'vehicle_code': row.vehicle_code, 'date': row.date, **totals})
+    return bulk_insert(session, C, rows)
+
+
+def range_totals(session, start, end):
+    """Return {vehicle: {metric: total, 'days': n}} over [start, end] from the
+    cumulative rows; vehicles without activity in the range are left out.
+    """
+    upper = _latest_rows(session, end, inclusive=True)
+    lower = _latest_rows(session, start, inclusive=False)
+    totals = {}
+    for vehicle, hi in upper.items():
+        lo = lower.get(vehicle)
+        days = hi.days - (lo.days if lo else 0)
+        if days <= 0:
+            continue
+        totals[vehicle] = {m: getattr(hi, m) - (getattr(lo, m) if lo else 0.0) for m in METRICS}
+        totals[vehicle]['days'] = days
+    return dict(sorted(totals.items()))
+
+
+def cumulative_missing(session):
+    """True when activity exists but the cumulative table is empty (e.g. after upgrading)."""
+    return session.query(VehicleCumulative.vehicle_code).first() is None \
+        and session.query(VehicleActivity.id).first() is not None
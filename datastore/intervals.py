@@ -0,0 +1,141 @@
+"""
+Raw "Course" intervals (vehicle, start, stop, km, site) kept next to the daily
+aggregates, so the aggregates can be recomputed for another cut-off hour
+without re-uploading the original exports.
+"""
+
+import os
+from datetime import datetime
+
+from sqlalchemy import and_, bindparam, delete, select, update
+
+from datastore.bulk import bulk_insert
+from datastore.cumulative import update_cumulative
+from datastore.models import CourseInterval, SiteActivity, VehicleActivity
+from datastore.version import bump_data_version
+
+
+def intervals_enabled():
+    """Whether uploads store their Course intervals (GPS_STORE_INTERVALS, on by default)."""
+    return os.environ.get('GPS_STORE_INTERVALS', '1') == '1'
+
+
+def store_intervals(session, intervals, uploaded_at=None):
+    """Insert the intervals returned by process_dataframe(..., return_intervals=True).
+    Returns the count. The caller commits.
+    """
+    if intervals is None or not len(intervals):
+        return 0
+    starts = intervals['start'].dt.to_pydatetime()
+    stops = intervals['stop'].dt.to_pydatetime()
+    sites = intervals['site'] if 'site' in intervals else [None] * len(intervals)
+    rows = [
+        {'vehicle_code': vehicle, 'date': start.date(), 'start': start, 'stop': stop, 'km': float(km), 'site': site,
+         'uploaded_at': uploaded_at}
+        for vehicle, start, stop, km, site in zip(intervals['vehicle'], starts, stops, intervals['km'], sites)
+    ]
+    return bulk_insert(session, CourseInterval, rows)
+
+
+def interval_filters(start=None, end=None, dates=None, vehicles=None, model=CourseInterval):
+    """WHERE clauses on CourseInterval (or another table with date and
+    vehicle_code columns) matching delete_activity()'s arguments."""
+    C = model
+    filters = []
+    if dates is not None:
+        filters.append(C.date.in_(sorted(set(dates))))
+    if start is not None:
+        filters.append(C.date >= start)
+    if end is not None:
+        filters.append(C.date <= end)
+    if vehicles is not None:
+        filters.append(C.vehicle_code.in_(sorted(set(vehicles))))
+    return filters
+
+
+def load_intervals(session, start=None, end=None, vehicles=None):
+    """Return the stored intervals as a DataFrame (vehicle, start, stop, km,
+    site; site is None for intervals stored before sites were kept)."""
+    import pandas as pd
+
+    C = CourseInterval
+    query = select(C.vehicle_code, C.start, C.stop, C.km, C.site).where(*interval_filters(start, end, vehicles=vehicles))
+    rows = session.execute(query.order_by(C.vehicle_code, C.start)).all()
+    df = pd.DataFrame(rows, columns=['vehicle', 'start', 'stop', 'km', 'site'])
+    df['start'] = pd.to_datetime(df['start'])
+    df['stop'] = pd.to_datetime(df['stop'])
+    df['km'] = df['km'].astype(float).fillna(0.0)
+    return df
+
+
+def recompute_activity(session, ref_hour, start=None, end=None, vehicles=None):
+    """Rebuild the daily aggregates of the vehicle-days that have stored
+    intervals, splitting at `ref_hour`, and the before/after hours and KM of
+    their site rows. Returns (vehicle-days rewritten, intervals read, site
+    vehicle-days rewritten). Site rows of vehicle-days whose intervals were
+    stored without their site are left unchanged. The caller commits.
+    """
+    from report_logic import aggregate_intervals
+
+    intervals = load_intervals(session, start, end, vehicles)
+    if intervals.empty:
+        return 0, 0, 0
+    daily = aggregate_intervals(intervals, ref_hour)
+
+    # Only replace the days the intervals cover (older uploads may have none)
+    A = VehicleActivity
+    for day, group in daily.groupby('date'):
+        session.execute(delete(A).where(A.date == day, A.vehicle_code.in_(group['vehicle'].tolist())))
+
+    uploaded_at = datetime.utcnow()
+    rows = [
+        {
+            'date': row.date,
+            'vehicle_code': row.vehicle,
+            'hours_before_20h': row.before_sec / 3600,
+            'hours_after_20h': row.after_sec / 3600,
+            'km_before': row.km_before,
+            'km_after': row.km_after,
+            'uploaded_at': uploaded_at,
+        }
+        for row in daily.itertuples(index=False)
+    ]
+    bulk_insert(session, A, rows)
+    site_days = _recompute_sites(session, intervals, ref_hour)
+    update_cumulative(session, since=daily['date'].min(), vehicles=set(daily['vehicle']))
+    bump_data_version(session)
+    return len(rows), len(intervals), site_days
+
+
+def _recompute_sites(session, intervals, ref_hour):
+    """Rewrite the split columns of the site rows from the intervals of the
+    vehicle-days whose intervals all have a site. Idle, waiting and fuel come
+    from the other export rows, which are not stored, and are kept."""
+    from report_logic import aggregate_intervals
+
+    days = intervals.assign(date=intervals['start'].dt.date)
+    complete = days.groupby(['vehicle', 'date'])['site'].transform(lambda s: s.notna().all())
+    days = days[complete]
+    if days.empty:
+        return 0
+    sites = aggregate_intervals(days, ref_hour, by=('site',))
+
+    S = SiteActivity.__table__
+    split = {'hours_before_20h': 0.0, 'hours_after_20h': 0.0, 'km_before': 0.0, 'km_after': 0.0}
+    for day, group in sites.groupby('date'):
+        session.execute(update(S).where(S.c.date == day, S.c.vehicle_code.in_(sorted(set(group['vehicle']))))
+                        .values(**split))
+    stmt = update(S).where(and_(S.c.date == bindparam('day'), S.c.vehicle_code == bindparam('vehicle'),
+                                S.c.site == bindparam('site_name'))) \
+        .values({column: bindparam(f'new_{column}') for column in split})
+    session.execute(stmt, [
+        {
+            'day': row.date, 'vehicle': row.vehicle, 'site_name': row.site,
+            'new_hours_before_20h': row.before_sec / 3600,
+            'new_hours_after_20h': row.after_sec / 3600,
+            'new_km_before': row.km_before,
+            'new_km_after': row.km_after,
+        }
+        for row in sites.itertuples(index=False)
+    ])
+    return len(sites[['vehicle', 'date']].drop_duplicates())
@@ -0,0 +1,170 @@
+"""
+Table definitions, on plain SQLAlchemy so they can be used without Flask.
+
+models.py binds them to Flask-SQLAlchemy for the web app (adding `.query`).
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Text, Index
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+
+class Vehicle(Base):
+    __tablename__ = 'vehicle'
+    # Category filter of /vehicles, walked in id order for the cursor; also /categories
+    __table_args__ = (Index('ix_vehicle_category_id', 'category', 'id'),)
+    
+    id = Column(String(50), primary_key=True)  # Vehicle code (e.g., C024)
+    matricule = Column(String(100), nullable=False)  # Registration plate
+    name = Column(String(255), nullable=False)
+    category = Column(String(100), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Vehicle {self.id} {self.matricule} {self.name} ({self.category})>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'matricule': self.matricule,
+            'name': self.name,
+            'category': self.category
+        }
+
+class VehicleActivity(Base):
+    __tablename__ = 'vehicle_activity'
+    # (vehicle, date): one vehicle over a date range is an index range scan
+    # (per-vehicle timeline, cumulative rebuilds); it also serves vehicle lookups
+    __table_args__ = (Index('ix_vehicle_activity_vehicle_date', 'vehicle_code', 'date'),)
+    
+    id = Column(Integer, primary_key=True)
+    date = Column(Date, nullable=False, index=True)
+    vehicle_code = Column(String(50), nullable=False)
+    hours_before_20h = Column(Float, default=0.0)
+    hours_after_20h = Column(Float, default=0.0)
+    km_before = Column(Float, default=0.0)
+    km_after = Column(Float, default=0.0)
+    uploaded_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<VehicleActivity {self.date} {self.vehicle_code}>'
+    
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat(),
+            'vehicle': self.vehicle_code,
+            'hours_before_20h': round(self.hours_before_20h, 2),
+            'hours_after_20h': round(self.hours_after_20h, 2),
+            'km_before': round(self.km_before, 3),
+            'km_after': round(self.km_after, 3)
+        }
+
+class VehicleCumulative(Base):
+    """Running totals per vehicle: each row holds the sums of all activity of
+    the vehicle up to and including `date` (only dates with activity have a
+    row). The total over [a, b] is row(last date <= b) - row(last date < a).
+    Maintained by datastore.cumulative on every insert/delete of activity.
+    """
+    __tablename__ = 'vehicle_cumulative'
+    
+    vehicle_code = Column(String(50), primary_key=True)
+    date = Column(Date, primary_key=True)
+    hours_before_20h = Column(Float, default=0.0)
+    hours_after_20h = Column(Float, default=0.0)
+    km_before = Column(Float, default=0.0)
+    km_after = Column(Float, default=0.0)
+    days = Column(Integer, default=0)  # activity records so far
+    
+    def __repr__(self):
+        return f'<VehicleCumulative {self.vehicle_code} {self.date}>'
+
+class SiteActivity(Base):
+    """Activity of a vehicle on a site ("Chantier") for one day, stored on
+    upload next to VehicleActivity. The metric columns have the same names as
+    VehicleActivity's, so period reports can read either table.
+    """
+    __tablename__ = 'site_activity'
+    __table_args__ = (
+        Index('ix_site_activity_site_date', 'site', 'date'),
+        Index('ix_site_activity_vehicle_date', 'vehicle_code', 'date'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    date = Column(Date, nullable=False, index=True)
+    vehicle_code = Column(String(50), nullable=False)
+    site = Column(String(255), nullable=False, default='')
+    hours_before_20h = Column(Float, default=0.0)
+    hours_after_20h = Column(Float, default=0.0)
+    km_before = Column(Float, default=0.0)
+    km_after = Column(Float, default=0.0)
+    idle_hours = Column(Float, default=0.0)
+    wait_hours = Column(Float, default=0.0)
+    fuel_used = Column(Float, default=0.0)
+    uploaded_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SiteActivity {self.date} {self.vehicle_code} {self.site}>'
+
+class CourseInterval(Base):
+    """A parsed "Course" row of an uploaded export, kept so the daily
+    aggregates can be recomputed (other cut-off hour, ...) without the CSV.
+    `date` is the start date, the day the interval is counted on. `site` and
+    `uploaded_at` (that of the upload's VehicleActivity rows) are NULL for
+    intervals stored before they were kept.
+    """
+    __tablename__ = 'course_interval'
+    __table_args__ = (Index('ix_course_interval_vehicle_date', 'vehicle_code', 'date'),)
+    
+    id = Column(Integer, primary_key=True)
+    vehicle_code = Column(String(50), nullable=False)
+    date = Column(Date, nullable=False, index=True)
+    start = Column(DateTime, nullable=False)
+    stop = Column(DateTime, nullable=False)
+    km = Column(Float, default=0.0)
+    site = Column(String(255))
+    uploaded_at = Column(DateTime)
+    
+    def __repr__(self):
+        return f'<CourseInterval {self.vehicle_code} {self.start} -> {self.stop}>'
+
+class DataVersion(Base):
+    """Single-row counter bumped in the same transaction as every change to
+    the activity or the vehicle registry; the read routes derive their ETags
+    from it (see http_cache.py).
+    """
+    __tablename__ = 'data_version'
+    
+    id = Column(Integer, primary_key=True)  # always 1
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DataVersion {self.version}>'
+
+class RequestMetric(Base):
+    __tablename__ = 'request_metric'
+    
+    id = Column(Integer, primary_key=True)
+    route = Column(String(100), nullable=False, index=True)
+    status = Column(Integer, default=200)
+    total_ms = Column(Float, default=0.0)
+    stages = Column(Text)  # JSON: {stage: milliseconds}
+    rows = Column(Text)    # JSON: {counter: rows}
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<RequestMetric {self.route} {self.total_ms}ms>'
+    
+    def to_dict(self):
+        import json
+        return {
+            'route': self.route,
+            'status': self.status,
+            'total_ms': self.total_ms,
+            'stages_ms': json.loads(self.stages or '{}'),
+            'rows': json.loads(self.rows or '{}'),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,41 @@
+"""
+Per-request stage timings (the `timings` of /upload and the report routes),
+kept for a limited number of days so the table does not grow without bound.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+
+from datastore.models import RequestMetric
+
+
+def request_metrics_enabled():
+    """Whether request timings are stored (GPS_REQUEST_METRICS, on by default)."""
+    return os.environ.get('GPS_REQUEST_METRICS', '1') == '1'
+
+
+def request_metrics_days():
+    """Days of request timings kept (GPS_REQUEST_METRICS_DAYS, default 30)."""
+    return int(os.environ.get('GPS_REQUEST_METRICS_DAYS', 30))
+
+
+def store_request_metric(session, route, timings, status=200):
+    """Add one row from a StageTimer.to_dict() output. The caller commits."""
+    session.add(RequestMetric(
+        route=route,
+        status=status,
+        total_ms=timings['total_ms'],
+        stages=json.dumps(timings['stages_ms']),
+        rows=json.dumps(timings['rows'])
+    ))
+
+
+def prune_request_metrics(session, days, now=None):
+    """Delete the rows older than `days` days (by the created_at index).
+    Returns the count. The caller commits.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    return session.execute(delete(RequestMetric).where(RequestMetric.created_at < cutoff)).rowcount
@@ -0,0 +1,104 @@
+"""
+Engine and session helpers for scripts that work without the Flask app.
+"""
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from database import install_sqlite_pragmas, sqlite_pragmas, parse_pragmas, engine_options
+from datastore.models import Base
+from datastore.version import ensure_data_version
+
+DEFAULT_DATABASE_URL = 'sqlite:///gps_reports.db'
+# Flask-SQLAlchemy puts relative SQLite paths in the app's instance folder
+INSTANCE_PATH = Path(__file__).resolve().parent.parent / 'instance'
+
+_engines = {}
+
+
+def database_url(url=None):
+    """Return the database URL (argument, GPS_DATABASE_URL or default).
+    Relative SQLite paths are resolved against instance/ like the web app does,
+    so scripts and app always open the same file.
+    """
+    url = make_url(url or os.environ.get('GPS_DATABASE_URL', DEFAULT_DATABASE_URL))
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:' \
+            and not url.database.startswith('file:') and not os.path.isabs(url.database):
+        url = url.set(database=str(INSTANCE_PATH / url.database))
+    return url.render_as_string(hide_password=False)
+
+
+def get_engine(url=None):
+    """Return a (cached) engine with the configured SQLite profile or pool applied."""
+    url = database_url(url)
+    if url not in _engines:
+        if url.startswith('sqlite:///'):
+            Path(make_url(url).database).parent.mkdir(parents=True, exist_ok=True)
+        engine = create_engine(url, **engine_options(url))
+        install_sqlite_pragmas(engine, sqlite_pragmas(
+            os.environ.get('GPS_SQLITE_PROFILE', 'performance'),
+            parse_pragmas(os.environ.get('GPS_SQLITE_PRAGMAS'))
+        ))
+        _engines[url] = engine
+    return _engines[url]
+
+
+@contextmanager
+def session_scope(url=None):
+    """Session that commits on success and rolls back on error."""
+    session = Session(get_engine(url))
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def create_schema(url=None, drop=False):
+    """Create all tables (dropping them first if `drop`) and the data version row."""
+    engine = get_engine(url)
+    if drop:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    create_missing_columns(engine)
+    create_missing_indexes(engine)
+    ensure_data_version(engine)
+    return engine
+
+
+def create_missing_columns(bind):
+    """Add the nullable columns added to existing tables since they were
+    created (create_all leaves existing tables alone). Returns "table.column" names."""
+    inspector = inspect(bind)
+    created = []
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    created.append(f'{table.name}.{column.name}')
+    return created
+
+
+def create_missing_indexes(bind):
+    """Create indexes added to existing tables since they were created
+    (create_all only creates the indexes of new tables). Returns their names."""
+    inspector = inspect(bind)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        existing = {i['name'] for i in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name not in existing:
+                index.create(bind)
+                created.append(index.name)
+    return created
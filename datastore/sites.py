@@ -0,0 +1,41 @@
+"""
+Per-site ("Chantier") daily activity, stored on upload so cost allocation by
+site is a query instead of a rerun over the raw exports.
+"""
+
+import os
+from datetime import datetime
+
+from datastore.bulk import bulk_insert
+from datastore.models import SiteActivity
+
+
+def sites_enabled():
+    """Whether uploads store per-site activity (GPS_STORE_SITES, on by default)."""
+    return os.environ.get('GPS_STORE_SITES', '1') == '1'
+
+
+def store_site_activity(session, sites, uploaded_at=None):
+    """Insert the per-site rows of process_dataframe(..., return_metrics=True)
+    (metrics['sites']). Returns the count. The caller commits.
+    """
+    if sites is None or not len(sites):
+        return 0
+    uploaded_at = uploaded_at or datetime.utcnow()
+    rows = [
+        {
+            'date': row.date,
+            'vehicle_code': row.vehicle,
+            'site': row.site,
+            'hours_before_20h': row.before_sec / 3600,
+            'hours_after_20h': row.after_sec / 3600,
+            'km_before': row.km_before,
+            'km_after': row.km_after,
+            'idle_hours': row.idle_sec / 3600,
+            'wait_hours': row.wait_sec / 3600,
+            'fuel_used': row.fuel_used,
+            'uploaded_at': uploaded_at,
+        }
+        for row in sites.itertuples(index=False)
+    ]
+    return bulk_insert(session, SiteActivity, rows)
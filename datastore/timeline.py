@@ -0,0 +1,66 @@
+"""
+Day-by-day activity of one vehicle, read a page at a time through the
+(vehicle_code, date) index of vehicle_activity.
+"""
+
+from sqlalchemy import func
+
+from datastore.models import VehicleActivity
+
+# Days per page when no limit is given
+PAGE_DAYS = 100
+
+METRICS = ('hours_before_20h', 'hours_after_20h', 'km_before', 'km_after')
+
+
+def _filters(vehicle, start=None, end=None):
+    A = VehicleActivity
+    filters = [A.vehicle_code == vehicle]
+    if start is not None:
+        filters.append(A.date >= start)
+    if end is not None:
+        filters.append(A.date <= end)
+    return filters
+
+
+def _day(row):
+    day = {
+        'date': row.date.isoformat(),
+        'hours_before_20h': round(row.hours_before_20h or 0.0, 2),
+        'hours_after_20h': round(row.hours_after_20h or 0.0, 2),
+        'km_before': round(row.km_before or 0.0, 3),
+        'km_after': round(row.km_after or 0.0, 3),
+    }
+    day['hours_total'] = round(day['hours_before_20h'] + day['hours_after_20h'], 2)
+    day['km_total'] = round(day['km_before'] + day['km_after'], 3)
+    return day
+
+
+def vehicle_timeline(session, vehicle, start=None, end=None, after=None, limit=PAGE_DAYS):
+    """Daily activity of `vehicle` over [start, end] (open-ended when None), in
+    date order: at most `limit` days, those after the date `after` (the
+    previous page's cursor). Returns (days, next_cursor); next_cursor is None
+    on the last page. Several records of a vehicle-day are summed.
+    """
+    A = VehicleActivity
+    filters = _filters(vehicle, start, end)
+    if after is not None:
+        filters.append(A.date > after)
+    rows = session.query(A.date, *(func.sum(getattr(A, m)).label(m) for m in METRICS)) \
+        .filter(*filters).group_by(A.date).order_by(A.date).limit(limit + 1).all()
+    days = [_day(row) for row in rows[:limit]]
+    next_cursor = days[-1]['date'] if len(rows) > limit else None
+    return days, next_cursor
+
+
+def vehicle_totals(session, vehicle, start=None, end=None):
+    """Totals and active days of `vehicle` over [start, end], from the same index range."""
+    A = VehicleActivity
+    row = session.query(func.count(func.distinct(A.date)).label('days'), func.min(A.date).label('first'),
+                        func.max(A.date).label('last'), *(func.sum(getattr(A, m)).label(m) for m in METRICS)) \
+        .filter(*_filters(vehicle, start, end)).one()
+    totals = {m: round(getattr(row, m) or 0.0, 3 if m.startswith('km') else 2) for m in METRICS}
+    totals['days'] = row.days
+    totals['first_date'] = row.first.isoformat() if row.first else None
+    totals['last_date'] = row.last.isoformat() if row.last else None
+    return totals
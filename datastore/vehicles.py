@@ -0,0 +1,110 @@
+"""
+Bulk synchronisation and paginated listing of the vehicle registry.
+"""
+
+from sqlalchemy import insert, update, delete, func, or_
+
+from datastore.models import Vehicle
+from datastore.version import bump_data_version
+
+REGISTRY_FIELDS = ('matricule', 'name', 'category')
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+DELETE_CHUNK = 500
+
+
+def _dialect_insert(session):
+    """Return the dialect's INSERT construct supporting ON CONFLICT, or None."""
+    name = session.get_bind().dialect.name
+    if name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def upsert_vehicles(session, rows):
+    """Insert or update `rows` (dicts with id and REGISTRY_FIELDS) in bulk."""
+    if not rows:
+        return
+    dialect_insert = _dialect_insert(session)
+    if dialect_insert is not None:
+        stmt = dialect_insert(Vehicle)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Vehicle.id],
+            set_={field: getattr(stmt.excluded, field) for field in REGISTRY_FIELDS}
+        )
+        session.execute(stmt, rows)
+        return
+    # Other backends: split by the existing ids and use bulk INSERT / UPDATE
+    existing = {vid for (vid,) in session.query(Vehicle.id).filter(Vehicle.id.in_([r['id'] for r in rows]))}
+    new_rows = [r for r in rows if r['id'] not in existing]
+    old_rows = [r for r in rows if r['id'] in existing]
+    if new_rows:
+        session.execute(insert(Vehicle), new_rows)
+    if old_rows:
+        session.execute(update(Vehicle), old_rows)
+
+
+def sync_vehicle_registry(session, rows, mirror=False, keep_ids=()):
+    """Apply a registry file to the vehicle table in one transaction (caller commits).
+
+    `rows` are valid dicts (id, matricule, name, category) in file order; the
+    last row wins when an id repeats. With `mirror`, vehicles absent from the
+    file are deleted, except ids in `keep_ids` (rows of the file that had
+    errors). Returns {'added', 'updated', 'unchanged', 'deleted'}.
+    """
+    existing = {v.id: v for v in session.query(Vehicle.id, Vehicle.matricule, Vehicle.name, Vehicle.category)}
+
+    latest = {}
+    added = updated = unchanged = 0
+    for row in rows:
+        if row['id'] in latest or row['id'] in existing:
+            updated += 1
+        else:
+            added += 1
+        latest[row['id']] = row
+
+    changed = []
+    for vid, row in latest.items():
+        current = existing.get(vid)
+        if current is not None and all(getattr(current, f) == row[f] for f in REGISTRY_FIELDS):
+            # Nothing to write for identical rows
+            unchanged += 1
+            continue
+        changed.append(row)
+    upsert_vehicles(session, changed)
+
+    deleted = 0
+    if mirror:
+        to_delete = sorted(set(existing) - set(latest) - set(keep_ids))
+        for i in range(0, len(to_delete), DELETE_CHUNK):
+            chunk = to_delete[i:i + DELETE_CHUNK]
+            session.execute(delete(Vehicle).where(Vehicle.id.in_(chunk)))
+        deleted = len(to_delete)
+
+    if changed or deleted:
+        bump_data_version(session)
+    return {'added': added, 'updated': updated, 'unchanged': unchanged, 'deleted': deleted}
+
+
+def list_vehicles(session, search=None, categories=None, after=None, limit=100):
+    """One page of the registry in id order: vehicles whose id, name or
+    matricule contains `search` (case-insensitive), in `categories` when
+    given, with an id greater than `after` (the previous page's cursor).
+    Returns (vehicles, next_cursor, total matching).
+    """
+    filters = []
+    if search:
+        pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        filters.append(or_(*(column.ilike(pattern, escape='\\')
+                             for column in (Vehicle.id, Vehicle.name, Vehicle.matricule))))
+    if categories:
+        filters.append(Vehicle.category.in_(categories))
+    total = session.query(func.count(Vehicle.id)).filter(*filters).scalar()
+    if after is not None:
+        filters.append(Vehicle.id > after)
+    vehicles = session.query(Vehicle).filter(*filters).order_by(Vehicle.id).limit(limit + 1).all()
+    next_cursor = vehicles[limit - 1].id if len(vehicles) > limit else None
+    return vehicles[:limit], next_cursor, total
@@ -0,0 +1,41 @@
+"""
+Data version: a counter bumped by every write to the activity tables or the
+vehicle registry, in the writer's transaction. Anything derived from the data
+(HTTP ETags, cached reports) is valid as long as the version is unchanged.
+
+The single row (id 1) is created with the schema (ensure_data_version), so a
+bump is one UPDATE: concurrent writers queue on its row lock instead of racing
+to insert it.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from datastore.models import DataVersion
+
+
+def data_version(session):
+    """Current data version (0 before the first write)."""
+    version = session.query(DataVersion.version).filter(DataVersion.id == 1).scalar()
+    return version or 0
+
+
+def ensure_data_version(bind):
+    """Create the data version row (version 0) if it does not exist yet.
+    Called with the schema, before any writer runs."""
+    try:
+        with bind.begin() as connection:
+            if connection.execute(select(DataVersion.id).where(DataVersion.id == 1)).first() is None:
+                connection.execute(insert(DataVersion).values(id=1, version=0, updated_at=datetime.utcnow()))
+    except IntegrityError:
+        pass  # created by another process in the meantime
+
+
+def bump_data_version(session):
+    """Increment the data version; it becomes visible when the caller commits."""
+    session.execute(
+        update(DataVersion).where(DataVersion.id == 1)
+        .values(version=DataVersion.version + 1, updated_at=datetime.utcnow())
+    )
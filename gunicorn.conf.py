@@ -0,0 +1,49 @@
+"""
+Gunicorn settings for production (python serve.py or gunicorn -c gunicorn.conf.py wsgi:app).
+
+Every value can be set from the environment:
+  GPS_BIND               address to listen on (default 127.0.0.1:8000)
+  GPS_WORKERS            worker processes (default: CPU count, at least 2)
+  GPS_THREADS            threads per worker (default 4)
+  GPS_TIMEOUT            seconds before a silent worker is restarted (default 300,
+                         large uploads take minutes)
+  GPS_MAX_REQUESTS       recycle a worker after this many requests (default 1000)
+  GPS_WARM_IMPORTS       import pandas/reportlab in the master so workers inherit
+                         them on fork (default 1)
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GPS_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('GPS_WORKERS', max(2, multiprocessing.cpu_count())))
+# Threaded workers: while one thread parses an upload, the others keep
+# answering report reads (SQLite I/O and reportlab release the GIL often)
+worker_class = 'gthread'
+threads = int(os.environ.get('GPS_THREADS', 4))
+timeout = int(os.environ.get('GPS_TIMEOUT', 300))
+graceful_timeout = 30
+keepalive = 5
+# Return memory held by pandas after big uploads by recycling workers
+max_requests = int(os.environ.get('GPS_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+# Import the app (and run db.create_all) once in the master, not in every worker
+preload_app = True
+accesslog = '-'
+
+
+def on_starting(server):
+    """The app imports pandas and reportlab lazily; load them once here so
+    every (re)started worker gets them from the fork instead of importing."""
+    if os.environ.get('GPS_WARM_IMPORTS', '1') == '1':
+        import report_logic  # noqa: F401 - pandas, numpy
+        import pdf_reports  # noqa: F401 - reportlab
+
+
+def post_fork(server, worker):
+    """Drop the pooled connections inherited from the master without closing
+    them (close=False): they still belong to the master, and SQLite handles
+    must never be shared across processes. The worker opens its own."""
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
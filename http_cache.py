@@ -0,0 +1,155 @@
+"""
+HTTP caching of the read routes and compression of JSON/CSV responses.
+
+Uploads, deletes, recomputes and vehicle edits bump the data version
+(datastore.version) in their transaction. The read routes (`versioned`) get
+an ETag made of that version and the request URL, so a dashboard refresh on
+unchanged data is answered with 304 Not Modified after one primary-key
+lookup. Generated reports (`cached_report`) are reused while the version and
+the request body are unchanged, unless REPORT_CACHE is off. Hits and misses are counted in
+metrics.record_cache().
+"""
+
+import functools
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from flask import current_app, jsonify, request
+
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIMETYPES = {'application/json', 'text/csv'}
+# Smaller bodies are sent as is (compression would not pay for its headers)
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Generated reports remembered per process
+REPORT_CACHE_SIZE = 256
+
+_reports = OrderedDict()  # (endpoint, body, version) -> (payload, file mtime)
+_reports_lock = threading.Lock()
+
+
+def _version():
+    return current_app.extensions['http_cache']()
+
+
+def versioned(view):
+    """ETag (weak, from the data version and the URL) and 304 Not Modified
+    for a GET route whose response depends on nothing else."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = f'{_version()}:{request.full_path}'
+        etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+        if request.if_none_match.contains_weak(etag):
+            metrics.record_cache(True)
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            metrics.record_cache(False)
+        response.set_etag(etag, weak=True)
+        # Stored by the browser, but revalidated on every use
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
+
+def conditional(response):
+    """ETag from the body and 304 when it matches, for responses that do not
+    follow the data version (e.g. the list of generated files)."""
+    response.add_etag(weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.make_conditional(request)
+    metrics.record_cache(response.status_code == 304)
+    return response
+
+
+def cached_report(view):
+    """Reuse the JSON response of a report route (POST) for the same request
+    body and data version, as long as its file in OUTPUT_FOLDER is unchanged.
+    The reused response has "cached": true and no "timings" (they were those
+    of the generation)."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_app.config.get('REPORT_CACHE', True):
+            return view(*args, **kwargs)
+        body = json.dumps(request.get_json(silent=True), sort_keys=True, default=str)
+        key = (request.endpoint, body, _version())
+        with _reports_lock:
+            entry = _reports.get(key)
+        if entry is not None:
+            payload, mtime = entry
+            if _file_mtime(payload) == mtime:
+                with _reports_lock:
+                    _reports.move_to_end(key, last=True)
+                metrics.record_cache(True)
+                payload = {k: v for k, v in payload.items() if k != 'timings'}
+                return jsonify({**payload, 'cached': True})
+        metrics.record_cache(False)
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code == 200 and response.is_json:
+            payload = response.get_json()
+            with _reports_lock:
+                _reports[key] = (payload, _file_mtime(payload))
+                while len(_reports) > REPORT_CACHE_SIZE:
+                    _reports.popitem(last=False)
+        return response
+    return wrapper
+
+
+def _file_mtime(payload):
+    filename = payload.get('filename')
+    if not filename:
+        return None
+    path = Path(current_app.config['OUTPUT_FOLDER']) / filename
+    return path.stat().st_mtime_ns if path.exists() else -1
+
+
+def _compress(response):
+    if response.status_code != 200 or response.mimetype not in COMPRESS_MIMETYPES \
+            or 'Content-Encoding' in response.headers or request.range is not None:
+        return response
+    response.vary.add('Accept-Encoding')
+    accept = request.accept_encodings
+    encoding = 'br' if brotli is not None and accept['br'] else 'gzip' if accept['gzip'] else None
+    if encoding is None:
+        return response
+    # send_file streams from disk; report files are read here to be compressed
+    response.direct_passthrough = False
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    if encoding == 'br':
+        data = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    # The encoded bytes differ from the file's, so a strong ETag becomes weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app, get_version):
+    """Use `get_version()` (the current data version) for the ETags and
+    compress JSON/CSV responses when COMPRESS_RESPONSES is set."""
+    app.extensions['http_cache'] = get_version
+
+    @app.after_request
+    def _compress_response(response):
+        if app.config.get('COMPRESS_RESPONSES', True):
+            return _compress(response)
+        return response
@@ -3,20 +3,18 @@
 Database inspection script to view raw VehicleActivity records and verify calculations.
 """
 
-from models import db, VehicleActivity, Vehicle
-from app import app
-from datetime import datetime
+from datastore import session_scope, VehicleActivity, Vehicle
 
 def inspect_database(date_str=None, vehicle_id=None):
     """Inspect and display database records with calculation verification."""
     
-    with app.app_context():
+    with session_scope() as session:
         print("\n" + "="*100)
         print("DATABASE RECORDS INSPECTION")
         print("="*100)
         
         # Build query
-        query = VehicleActivity.query
+        query = session.query(VehicleActivity)
         
         if date_str:
             query = query.filter(VehicleActivity.date == date_str)
@@ -36,7 +34,7 @@ def inspect_database(date_str=None, vehicle_id=None):
         
         # Display each record
         for i, record in enumerate(records, 1):
-            vehicle = Vehicle.query.filter_by(id=record.vehicle_code).first()
+            vehicle = session.get(Vehicle, record.vehicle_code)
             vehicle_name = vehicle.name if vehicle else "UNKNOWN"
             
             print(f"[{i}] Date: {record.date} | Vehicle: {record.vehicle_code} ({vehicle_name})")
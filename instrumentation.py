@@ -0,0 +1,99 @@
+"""
+Per-stage timing and opt-in profiling for the upload and report pipeline.
+
+StageTimer is plain Python so report_logic can time its internal stages
+without depending on Flask; `profiled` wraps Flask views.
+"""
+
+import cProfile
+import functools
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+PROFILE_HEADER = 'X-Profile'
+
+
+class StageTimer:
+    """Collect wall-clock durations of named stages and row counters."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            # A stage entered several times accumulates
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - t0)
+
+    def count(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def to_dict(self):
+        return {
+            'total_ms': round(self.total() * 1000, 2),
+            'stages_ms': {k: round(v * 1000, 2) for k, v in self.stages.items()},
+            'rows': dict(self.counters)
+        }
+
+
+def profiled(view):
+    """Profile a Flask view when the request carries an X-Profile header.
+
+    `X-Profile: 1` (or `cprofile`) writes a cProfile .prof file,
+    `X-Profile: pyinstrument` writes an HTML report if pyinstrument is
+    installed. Files go to PROFILE_FOLDER and are only written when
+    PROFILING_ENABLED is set; the file name is returned in X-Profile-File.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask import request, current_app
+
+        mode = request.headers.get(PROFILE_HEADER, '').strip().lower()
+        if not mode or mode == '0' or not current_app.config.get('PROFILING_ENABLED'):
+            return view(*args, **kwargs)
+
+        folder = Path(current_app.config['PROFILE_FOLDER'])
+        folder.mkdir(parents=True, exist_ok=True)
+        name = f"{request.endpoint}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+        profiler = None
+        if mode == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+                profiler = Profiler()
+            except ImportError:
+                mode = 'cprofile'
+
+        if profiler is not None:
+            profiler.start()
+            try:
+                rv = view(*args, **kwargs)
+            finally:
+                profiler.stop()
+                path = folder / f'{name}.html'
+                path.write_text(profiler.output_html(), encoding='utf-8')
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                rv = view(*args, **kwargs)
+            finally:
+                profiler.disable()
+                path = folder / f'{name}.prof'
+                profiler.dump_stats(str(path))
+
+        response = current_app.make_response(rv)
+        response.headers['X-Profile-File'] = path.name
+        return response
+
+    return wrapper
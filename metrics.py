@@ -0,0 +1,210 @@
+"""
+In-process metrics exposed in the Prometheus text format at /metrics.
+
+Everything lives in memory of the current process (no external service);
+with several workers each process reports its own series and the scraper
+aggregates them.
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Latency buckets in seconds: API calls are milliseconds, uploads can take minutes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000, 5000)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_help = {}        # name -> (type, help text)
+_query_counter = threading.local()
+
+START_TIME = time.time()
+
+
+def _labels(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def describe(name, kind, text):
+    _help[name] = (kind, text)
+
+
+def inc(name, value=1, labels=None):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, labels=None, buckets=LATENCY_BUCKETS):
+    key = (name, _labels(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                h['counts'][i] += 1
+        h['sum'] += value
+        h['count'] += 1
+
+
+def get(name, labels=None):
+    return _counters.get((name, _labels(labels)), 0)
+
+
+describe('gps_http_requests_total', 'counter', 'HTTP requests by route, method and status.')
+describe('gps_http_request_duration_seconds', 'histogram', 'HTTP request latency by route.')
+describe('gps_db_queries_total', 'counter', 'SQL statements executed.')
+describe('gps_db_queries_per_request', 'histogram', 'SQL statements executed per HTTP request, by route.')
+describe('gps_pipeline_runs_total', 'counter', 'Upload and report runs by route and status.')
+describe('gps_pipeline_duration_seconds', 'histogram', 'Upload and report processing time by route.')
+describe('gps_pipeline_stage_seconds_total', 'counter', 'Time spent per pipeline stage.')
+describe('gps_rows_parsed_total', 'counter', 'Export rows read by /upload.')
+describe('gps_rows_ingested_total', 'counter', 'Daily activity records stored by /upload.')
+describe('gps_report_cache_hits_total', 'counter', 'Requests answered from cache (304 Not Modified or a reused report).')
+describe('gps_report_cache_misses_total', 'counter', 'Cacheable requests that had to be computed.')
+describe('gps_report_cache_hit_ratio', 'gauge', 'Report cache hits / (hits + misses).')
+describe('process_resident_memory_bytes', 'gauge', 'Resident memory size in bytes.')
+describe('process_max_resident_memory_bytes', 'gauge', 'Peak resident memory size in bytes.')
+describe('process_cpu_seconds_total', 'counter', 'User and system CPU time in seconds.')
+describe('process_start_time_seconds', 'gauge', 'Start time of the process since the epoch.')
+
+
+def observe_pipeline(route, timings, status=200):
+    """Record an upload or report run from its StageTimer.to_dict() output."""
+    inc('gps_pipeline_runs_total', labels={'route': route, 'status': str(status)})
+    observe('gps_pipeline_duration_seconds', timings['total_ms'] / 1000, {'route': route})
+    for stage, ms in timings['stages_ms'].items():
+        inc('gps_pipeline_stage_seconds_total', ms / 1000, {'route': route, 'stage': stage})
+    rows = timings.get('rows', {})
+    if 'records_stored' in rows:
+        inc('gps_rows_ingested_total', rows['records_stored'])
+    if route == 'upload' and 'rows_input' in rows:
+        inc('gps_rows_parsed_total', rows['rows_input'])
+
+
+def record_cache(hit):
+    """Count a cache lookup (http_cache: conditional GETs and reused reports)."""
+    inc('gps_report_cache_hits_total' if hit else 'gps_report_cache_misses_total')
+
+
+def _memory():
+    """Return (current RSS, peak RSS) in bytes; None where unavailable."""
+    current = peak = None
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    current = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if peak is None:
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            pass
+    if current is None:
+        try:
+            import psutil
+            current = psutil.Process(os.getpid()).memory_info().rss
+        except ImportError:
+            pass
+    return current, peak
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + list(extra or [])
+    if not items:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in items)
+    return '{' + body + '}'
+
+
+def render():
+    """Return all metrics in the Prometheus text exposition format."""
+    hits = get('gps_report_cache_hits_total')
+    misses = get('gps_report_cache_misses_total')
+    current, peak = _memory()
+    gauges = {
+        'gps_report_cache_hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+        'process_cpu_seconds_total': time.process_time(),
+        'process_start_time_seconds': START_TIME,
+    }
+    if current is not None:
+        gauges['process_resident_memory_bytes'] = current
+    if peak is not None:
+        gauges['process_max_resident_memory_bytes'] = peak
+
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: dict(v, counts=list(v['counts'])) for k, v in _histograms.items()}
+    # Cache counters are always exposed so the ratio can be alerted on
+    counters.setdefault(('gps_report_cache_hits_total', ()), 0)
+    counters.setdefault(('gps_report_cache_misses_total', ()), 0)
+
+    def header(name):
+        kind, text = _help.get(name, ('untyped', ''))
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    for name in sorted({n for n, _ in counters}):
+        header(name)
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    for name in sorted({n for n, _ in histograms}):
+        header(name)
+        for (n, labels), h in sorted(histograms.items()):
+            if n != name:
+                continue
+            for bound, count in zip(h['buckets'], h['counts']):
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {h["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {h["sum"]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {h["count"]}')
+
+    for name, value in gauges.items():
+        header(name)
+        lines.append(f'{name} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    inc('gps_db_queries_total')
+    if getattr(_query_counter, 'active', False):
+        _query_counter.count += 1
+
+
+def init_app(app):
+    """Time every request and count its SQL statements."""
+    from flask import request, g
+
+    @app.before_request
+    def _start_request_metrics():
+        g._metrics_start = time.perf_counter()
+        _query_counter.active = True
+        _query_counter.count = 0
+
+    @app.after_request
+    def _end_request_metrics(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            elapsed = time.perf_counter() - start
+            inc('gps_http_requests_total', labels={'route': route, 'method': request.method, 'status': str(response.status_code)})
+            observe('gps_http_request_duration_seconds', elapsed, {'route': route, 'method': request.method})
+            observe('gps_db_queries_per_request', _query_counter.count, {'route': route}, buckets=QUERY_BUCKETS)
+        _query_counter.active = False
+        return response
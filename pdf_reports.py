@@ -0,0 +1,320 @@
+"""
+PDF report builders (reportlab).
+
+Kept out of app.py so reportlab is only imported when a PDF is requested.
+"""
+
+import io
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+
+from formatting import format_decimal_hours
+from models import Vehicle
+
+def generate_pdf_report_by_date(target_date, records, vehicles_dict):
+    """Generate a professional PDF report for a specific date."""
+    pdf_buffer = io.BytesIO()
+    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    
+    story = []
+    
+    # Title
+    story.append(Paragraph('📊 RAPPORT D\'ACTIVITÉ QUOTIDIEN', title_style))
+    story.append(Spacer(1, 0.2*inch))
+    
+    # Date info
+    info_style = ParagraphStyle('Info', parent=styles['Normal'], fontSize=12, alignment=TA_CENTER)
+    # Format date in French
+    date_str = target_date.strftime('%d %B %Y').replace('January', 'Janvier').replace('February', 'Février').replace('March', 'Mars').replace('April', 'Avril').replace('May', 'Mai').replace('June', 'Juin').replace('July', 'Juillet').replace('August', 'Août').replace('September', 'Septembre').replace('October', 'Octobre').replace('November', 'Novembre').replace('December', 'Décembre')
+    story.append(Paragraph(f'<b>Date du Rapport:</b> {date_str}', info_style))
+    story.append(Spacer(1, 0.3*inch))
+    
+    # Group by category
+    categories_dict = {}
+    for record in records:
+        vehicle = record.vehicle_code
+        vehicle_obj = vehicles_dict.get(vehicle)
+        category = vehicle_obj.category if vehicle_obj else 'Unknown'
+        
+        if category not in categories_dict:
+            categories_dict[category] = []
+        categories_dict[category].append(record)
+    
+    # Create tables for each category
+    for category in sorted(categories_dict.keys()):
+        story.append(Paragraph(f'<b>{category}</b>', styles['Heading2']))
+        
+        # Table data with formatted cells
+        table_data = [['ID Véhicule', 'Nom du Véhicule', 'Matricule', 'Avant 20:00\n(Heures)', 'Après 20:00\n(Heures)', 'Avant 20:00\n(KM)', 'Après 20:00\n(KM)']]
+        
+        for record in categories_dict[category]:
+            vehicle_obj = vehicles_dict.get(record.vehicle_code)
+            vehicle_name = vehicle_obj.name if vehicle_obj else '-'
+            matricule = f'<font size="8">{vehicle_obj.matricule if vehicle_obj else "-"}</font>'
+            
+            table_data.append([
+                record.vehicle_code,
+                vehicle_name,
+                Paragraph(matricule, styles['Normal']),
+                format_decimal_hours(record.hours_before_20h),
+                format_decimal_hours(record.hours_after_20h),
+                f"{record.km_before:.2f}",
+                f"{record.km_after:.2f}"
+            ])
+        
+        # Add totals row
+        total_hours_before = sum(r.hours_before_20h for r in categories_dict[category])
+        total_hours_after = sum(r.hours_after_20h for r in categories_dict[category])
+        total_km_before = sum(r.km_before for r in categories_dict[category])
+        total_km_after = sum(r.km_after for r in categories_dict[category])
+        
+        table_data.append([
+            'TOTAL',
+            '', '',
+            format_decimal_hours(total_hours_before),
+            format_decimal_hours(total_hours_after),
+            f"{total_km_before:.2f}",
+            f"{total_km_after:.2f}"
+        ])
+        
+        # Style table with proper column widths
+        table = Table(table_data, colWidths=[0.9*inch, 2.2*inch, 1.1*inch, 0.95*inch, 0.95*inch, 0.95*inch, 0.95*inch])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#E7E6E6')),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#F2F2F2')]),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6)
+        ]))
+        
+        story.append(table)
+        story.append(Spacer(1, 0.3*inch))
+    
+    doc.build(story)
+    pdf_buffer.seek(0)
+    return pdf_buffer
+
+def _period_summary_pdf(title, period_html, summary, vehicles_dict, groups=None, sites=None):
+    """Build a PDF of per-vehicle period totals, one table per category.
+    `groups` ({heading: {vehicle: metrics}}, e.g. per site) replaces the
+    category tables; `sites` adds the site filter to the period line.
+    """
+    pdf_buffer = io.BytesIO()
+    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    
+    story = []
+    
+    # Title
+    story.append(Paragraph(title, title_style))
+    story.append(Spacer(1, 0.2*inch))
+    
+    # Period info
+    info_style = ParagraphStyle('Info', parent=styles['Normal'], fontSize=12, alignment=TA_CENTER)
+    if sites:
+        period_html += f'<br/><b>Chantier:</b> {", ".join(sites)}'
+    story.append(Paragraph(period_html, info_style))
+    story.append(Spacer(1, 0.3*inch))
+    
+    # Group by category
+    categories_dict = dict(groups) if groups is not None else {}
+    for vehicle_code in (summary.keys() if groups is None else ()):
+        vehicle_obj = vehicles_dict.get(vehicle_code)
+        category = vehicle_obj.category if vehicle_obj else 'Unknown'
+        
+        if category not in categories_dict:
+            categories_dict[category] = {}
+        categories_dict[category][vehicle_code] = summary[vehicle_code]
+    
+    # Create tables for each category
+    for category in sorted(categories_dict.keys()):
+        story.append(Paragraph(f'<b>{category}</b>', styles['Heading2']))
+        
+        # Table data with formatted cells
+        table_data = [['ID Véhicule', 'Nom du Véhicule', 'Matricule', 'Avant 20:00\n(Heures)', 'Après 20:00\n(Heures)', 'Avant 20:00\n(KM)', 'Après 20:00\n(KM)']]
+        
+        for vehicle_code in sorted(categories_dict[category].keys()):
+            metrics = categories_dict[category][vehicle_code]
+            vehicle_obj = vehicles_dict.get(vehicle_code)
+            vehicle_name = vehicle_obj.name if vehicle_obj else '-'
+            matricule = f'<font size="8">{vehicle_obj.matricule if vehicle_obj else "-"}</font>'
+            
+            table_data.append([
+                vehicle_code,
+                vehicle_name,
+                Paragraph(matricule, styles['Normal']),
+                format_decimal_hours(metrics['hours_before_20h']),
+                format_decimal_hours(metrics['hours_after_20h']),
+                f"{metrics['km_before']:.2f}",
+                f"{metrics['km_after']:.2f}"
+            ])
+        
+        # Add totals row
+        total_hours_before = sum(m['hours_before_20h'] for m in categories_dict[category].values())
+        total_hours_after = sum(m['hours_after_20h'] for m in categories_dict[category].values())
+        total_km_before = sum(m['km_before'] for m in categories_dict[category].values())
+        total_km_after = sum(m['km_after'] for m in categories_dict[category].values())
+        
+        table_data.append([
+            'TOTAL',
+            '', '',
+            format_decimal_hours(total_hours_before),
+            format_decimal_hours(total_hours_after),
+            f"{total_km_before:.2f}",
+            f"{total_km_after:.2f}"
+        ])
+        
+        # Style table with proper column widths
+        table = Table(table_data, colWidths=[0.9*inch, 2.2*inch, 1.1*inch, 0.95*inch, 0.95*inch, 0.95*inch, 0.95*inch])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#E7E6E6')),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#F2F2F2')]),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6)
+        ]))
+        
+        story.append(table)
+        story.append(Spacer(1, 0.3*inch))
+    
+    doc.build(story)
+    pdf_buffer.seek(0)
+    return pdf_buffer
+
+def generate_pdf_report_by_month(year, month, summary, vehicles_dict, groups=None, sites=None):
+    """Generate a professional PDF report for a specific month."""
+    # Month info - Format in French
+    french_months = {1: 'Janvier', 2: 'Février', 3: 'Mars', 4: 'Avril', 5: 'Mai', 6: 'Juin', 7: 'Juillet', 8: 'Août', 9: 'Septembre', 10: 'Octobre', 11: 'Novembre', 12: 'Décembre'}
+    month_name = f'{french_months[month]} {year}'
+    return _period_summary_pdf('📊 RAPPORT D\'ACTIVITÉ MENSUEL', f'<b>Période du Rapport:</b> {month_name}', summary, vehicles_dict, groups, sites)
+
+def generate_pdf_report_by_week(year, week, week_start, week_end, summary, vehicles_dict, groups=None, sites=None):
+    """Generate a professional PDF report for a specific week."""
+    return _period_summary_pdf('📊 RAPPORT D\'ACTIVITÉ HEBDOMADAIRE', f'<b>Semaine:</b> {year}-W{week:02d} ({week_start} à {week_end})', summary, vehicles_dict, groups, sites)
+
+def generate_pdf_report_by_range(start, end, summary, vehicles_dict, groups=None, sites=None):
+    """Generate a professional PDF report for a custom date range."""
+    return _period_summary_pdf('📊 RAPPORT D\'ACTIVITÉ PAR PÉRIODE', f'<b>Période du Rapport:</b> du {start} au {end}', summary, vehicles_dict, groups, sites)
+
+def generate_vehicle_list_pdf():
+    """Generate a professional PDF with all vehicles grouped by category."""
+    pdf_buffer = io.BytesIO()
+    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    
+    story = []
+    
+    # Title
+    story.append(Paragraph('🚗 LISTE DES VÉHICULES', title_style))
+    story.append(Spacer(1, 0.2*inch))
+    
+    # Get all vehicles from database
+    all_vehicles = Vehicle.query.all()
+    
+    if not all_vehicles:
+        story.append(Paragraph('Aucun véhicule enregistré dans le système.', styles['Normal']))
+    else:
+        # Group vehicles by category
+        categories_dict = {}
+        for vehicle in all_vehicles:
+            if vehicle.category not in categories_dict:
+                categories_dict[vehicle.category] = []
+            categories_dict[vehicle.category].append(vehicle)
+        
+        # Create tables for each category
+        for category in sorted(categories_dict.keys()):
+            story.append(Paragraph(f'<b>{category}</b>', styles['Heading2']))
+            
+            # Table data
+            table_data = [['ID Véhicule', 'Nom du Véhicule', 'Matricule']]
+            
+            for vehicle in sorted(categories_dict[category], key=lambda v: v.id):
+                table_data.append([
+                    vehicle.id,
+                    vehicle.name,
+                    vehicle.matricule
+                ])
+            
+            # Add total row
+            table_data.append([
+                f'TOTAL: {len(categories_dict[category])} véhicules',
+                '', ''
+            ])
+            
+            # Style table
+            table = Table(table_data, colWidths=[1.5*inch, 2.5*inch, 1.5*inch])
+            table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 12),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#E7E6E6')),
+                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#F2F2F2')])
+            ]))
+            
+            story.append(table)
+            story.append(Spacer(1, 0.3*inch))
+    
+    doc.build(story)
+    pdf_buffer.seek(0)
+    return pdf_buffer
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Recompute the daily aggregates from the stored Course intervals.
+
+Use after changing the cut-off hour (GPS_REF_HOUR) so the history matches new
+uploads without re-uploading the original exports. Only vehicle-days uploaded
+while GPS_STORE_INTERVALS was on (the default) have intervals to recompute.
+The before/after columns of their site rows are recomputed too when the
+intervals were stored with their site.
+
+Usage:
+  python recompute_activity.py --ref-hour 21
+  python recompute_activity.py --ref-hour 21 --from 2025-01-01 --to 2025-12-31
+"""
+
+import argparse
+from datetime import date
+
+from datastore import session_scope, create_schema, recompute_activity
+from report_logic import REF_HOUR
+
+
+def main():
+    p = argparse.ArgumentParser(description="Recompute daily aggregates from stored Course intervals")
+    p.add_argument("--ref-hour", type=int, default=REF_HOUR, help=f"Cut-off hour (default {REF_HOUR})")
+    p.add_argument("--from", dest="start", type=date.fromisoformat, help="First date (YYYY-MM-DD)")
+    p.add_argument("--to", dest="end", type=date.fromisoformat, help="Last date (YYYY-MM-DD)")
+    p.add_argument("--vehicle", nargs='+', help="Only these vehicle codes")
+    args = p.parse_args()
+
+    if not 0 <= args.ref_hour <= 24:
+        p.error("--ref-hour must be between 0 and 24")
+
+    create_schema()
+    with session_scope() as session:
+        days, intervals, site_days = recompute_activity(session, args.ref_hour, args.start, args.end, args.vehicle)
+    if not intervals:
+        print("⚠️  No stored intervals in this range; nothing recomputed")
+    else:
+        print(f"✓ Recomputed {days} vehicle-day(s) from {intervals} interval(s) with cut-off {args.ref_hour}:00")
+        if site_days < days:
+            print(f"⚠️  {days - site_days} vehicle-day(s) have intervals stored without their site; "
+                  f"their site rows keep the previous cut-off")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,46 +1,233 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime, time, timedelta
 from pathlib import Path
 import math
+import os
 import re
 
-REF_HOUR = 20
+from bucketing import bucket_intervals, bucket_names, cutoff_schedule, prorate_km, split_buckets
+from instrumentation import StageTimer
+from formatting import format_decimal_hours, seconds_to_hhmm
 
+# Cut-off hour between the "before" and "after" buckets (GPS_REF_HOUR)
+REF_HOUR = int(os.environ.get('GPS_REF_HOUR', 20))
+# Merge overlapping Course rows of a vehicle before splitting (GPS_MERGE_OVERLAPS)
+MERGE_OVERLAPS = os.environ.get('GPS_MERGE_OVERLAPS', '0') == '1'
+# "Durée" vs stop - start: allowed difference in seconds, and whether to
+# correct stops that are whole days short (GPS_DURATION_TOLERANCE, GPS_FIX_DURATIONS)
+DURATION_TOLERANCE = float(os.environ.get('GPS_DURATION_TOLERANCE', 60))
+FIX_DURATIONS = os.environ.get('GPS_FIX_DURATIONS', '0') == '1'
+# "Durée" cells: H:MM or H:MM:SS (hours past 24, seconds with a decimal point or comma)
+DURATION_PATTERN = r'^(\d+):(\d{1,2})(?::(\d{1,2}(?:[.,]\d+)?))?$'
 
-def format_decimal_hours(decimal_hours):
-    """Convert decimal hours to 'XhYmin' format.
-    Example: 0.80 -> '48min', 1.33 -> '1h20min'
-    """
-    if not decimal_hours or decimal_hours == 0:
-        return '0min'
-    
-    hours = int(decimal_hours)
-    minutes = round((decimal_hours - hours) * 60)
-    
-    if minutes == 60:
-        hours += 1
-        minutes = 0
-    
-    if hours == 0:
-        return f'{minutes}min'
-    elif minutes == 0:
-        return f'{hours}h'
-    else:
-        return f'{hours}h{minutes}min'
+# Columns holding a few short strings repeated on every row; reading them as
+# categoricals stores each distinct value once and gives integer codes.
+CATEGORICAL_COLUMNS = {'Code': 'category', 'CAA': 'category'}
 
 
-def load_file(path: Path):
-    path = Path(path)
-    if not path.exists():
-        raise FileNotFoundError(path)
-    if path.suffix.lower() in ('.xls', '.xlsx'):
-        df = pd.read_excel(path)
-    else:
-        # Read with semicolon separator, skip first row (metadata)
-        df = pd.read_csv(path, encoding='utf-8', sep=';', skiprows=1)
+# Compressed exports are decompressed as a stream while pandas parses them
+COMPRESSED_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd', '.zstd': 'zstd', '.zip': 'zip'}
+EXPORT_SUFFIXES = ('.csv', '.xls', '.xlsx')
+
+
+def is_export(name, archives=True):
+    """Whether `name` is a CSV/Excel export, possibly gzip/zstd-compressed
+    (report.csv.gz), or with `archives` a .zip."""
+    suffixes = [s.lower() for s in Path(name).suffixes[-2:]]
+    if not suffixes:
+        return False
+    if suffixes[-1] == '.zip':
+        return archives
+    if suffixes[-1] in COMPRESSED_SUFFIXES:
+        suffixes.pop()
+    return bool(suffixes) and suffixes[-1] in EXPORT_SUFFIXES
+
+
+def report_stem(infile: Path):
+    """Name of the reports of `infile`, without its compression suffix."""
+    infile = Path(infile)
+    if infile.suffix.lower() in COMPRESSED_SUFFIXES and infile.suffix.lower() != '.zip':
+        infile = infile.with_suffix('')
+    return infile.stem
+
+
+def _decompressed(source, kind):
+    """Binary stream of the decompressed content of `source` (a path or file object)."""
+    if kind == 'gzip':
+        import gzip
+        return gzip.open(source, 'rb')
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError('Reading .zst exports requires the zstandard package (pip install zstandard)')
+    opened = not hasattr(source, 'read')
+    if opened:
+        source = open(source, 'rb')
+    return zstandard.ZstdDecompressor().stream_reader(source, closefd=opened)
+
+
+def _read_export(source, name):
+    """Parse one export (path or binary stream) according to `name`'s suffixes."""
+    suffix = Path(name).suffix.lower()
+    kind = COMPRESSED_SUFFIXES.get(suffix)
+    if kind == 'zip':
+        return _read_zip(source, name)
+    if kind:
+        with _decompressed(source, kind) as stream:
+            return _read_export(stream, name[:-len(suffix)])
+    if suffix in ('.xls', '.xlsx'):
+        if hasattr(source, 'read') and not source.seekable():
+            # openpyxl/xlrd need to seek (zstd streams cannot)
+            import io
+            source = io.BytesIO(source.read())
+        return pd.read_excel(source)
+    # Read with semicolon separator, skip first row (metadata)
+    # decimal=',' lets the C parser read French-locale numbers (KM) directly
+    return pd.read_csv(source, encoding='utf-8', sep=';', skiprows=1, dtype=CATEGORICAL_COLUMNS, decimal=',')
+
+
+def _read_zip(source, name):
+    """Parse every export of a zip archive, each member streamed from the
+    archive, and concatenate them."""
+    import zipfile
+    frames = []
+    with zipfile.ZipFile(source) as archive:
+        for member in sorted(archive.infolist(), key=lambda m: m.filename):
+            base = Path(member.filename).name
+            if member.is_dir() or base.startswith('.') or member.filename.startswith('__MACOSX/'):
+                continue
+            if is_export(base, archives=False):
+                with archive.open(member) as stream:
+                    frames.append(_read_export(stream, base))
+    if not frames:
+        raise ValueError(f'No CSV or Excel export found in {name}')
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True)
+    # Categories differ between files; concat falls back to object columns
+    for col, dtype in CATEGORICAL_COLUMNS.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
     return df
 
 
+def load_file(path: Path, name=None):
+    """Read an export from a path, or from a binary file object (e.g. an
+    upload's stream) whose file name is given as `name`. Exports may be
+    compressed (.csv.gz, .csv.zst) or a .zip of several exports, which are
+    concatenated; nothing is extracted to disk.
+    """
+    if hasattr(path, 'read'):
+        return _read_export(path, name or '')
+    source = Path(path)
+    if not source.exists():
+        raise FileNotFoundError(source)
+    return _read_export(source, source.name)
+
+
+def course_mask(caa: pd.Series):
+    """Return a boolean mask of rows whose CAA status is 'Course'.
+    The status is normalised once per distinct value, not once per row.
+    """
+    caa = caa.astype('category')
+    is_course = caa.cat.categories.astype(str).str.strip().str.lower() == 'course'
+    # Missing values have code -1, which picks the trailing False
+    lookup = np.append(is_course, False)
+    return pd.Series(lookup[caa.cat.codes.to_numpy()], index=caa.index)
+
+
+# CAA statuses counted by activity_metrics()
+STATUS_METRICS = {'course': 'drive_sec', 'arrêt': 'idle_sec', 'arret': 'idle_sec', 'attente': 'wait_sec'}
+STATUS_TIME_METRICS = ('drive_sec', 'idle_sec', 'wait_sec')
+TIME_METRICS = STATUS_TIME_METRICS + ('before_sec', 'after_sec')
+SITE_METRICS = TIME_METRICS + ('drive_km', 'km_before', 'km_after', 'fuel_used')
+
+
+def split_drive(vehicle, start, stop, km, site, ref_hour=REF_HOUR):
+    """Split Course intervals (start < stop) at `ref_hour`, one row per interval:
+    vehicle, date (the start date), site, drive_sec, drive_km, before_sec,
+    after_sec, km_before, km_after. process_dataframe sums these rows into its
+    totals and passes them to activity_metrics(), so both use the same split.
+    """
+    start = np.asarray(start, dtype='datetime64[s]')
+    _, seconds = split_buckets(start, np.asarray(stop, dtype='datetime64[s]'), cutoff_schedule(ref_hour))
+    km = np.asarray(km, dtype=float)
+    km_split = prorate_km(km, seconds)
+    return pd.DataFrame({
+        'vehicle': vehicle,
+        'date': start.astype('datetime64[D]').astype('datetime64[s]'),
+        'site': site,
+        'drive_sec': seconds.sum(axis=1),
+        'drive_km': km,
+        'before_sec': seconds[:, 0],
+        'after_sec': seconds[:, 1],
+        'km_before': km_split[:, 0],
+        'km_after': km_split[:, 1],
+    })
+
+
+def activity_metrics(rows: pd.DataFrame, ref_hour=REF_HOUR, drive=None):
+    """Driving, idle and waiting time, driving KM and fuel of parsed export rows
+    (columns vehicle, start, stop, status, km, site, fuel_start, fuel_stop, fuel_used).
+    Driving time and KM are also split at `ref_hour` (before_sec/after_sec,
+    km_before/km_after). They come from `drive`, the split_drive() rows of the
+    Course intervals, when given; otherwise the Course rows with start < stop
+    are split here, as process_dataframe does.
+
+    Returns {'daily': one row per vehicle-day, 'sites': one row per vehicle-day-site}.
+    Rows count on their start date. fuel_used is "Consomation Carburant", or the
+    drop between "Carburant Depart" and "Carburant Arrêt" when it is empty;
+    daily fuel_start/fuel_end are the first and last levels of the day.
+    """
+    rows = rows.sort_values(['vehicle', 'start'], kind='stable')
+    start = pd.to_datetime(rows['start'])
+    stop = pd.to_datetime(rows['stop'])
+    seconds = (stop - start).dt.total_seconds().clip(lower=0).to_numpy()
+
+    # Map each distinct status once, then every row through its category code
+    status = rows['status'].astype('category')
+    labels = status.cat.categories.astype(str).str.strip().str.lower()
+    codes = status.cat.codes.to_numpy()
+    frame = pd.DataFrame({
+        'vehicle': rows['vehicle'].astype(str).to_numpy(),
+        'date': start.dt.normalize().to_numpy().astype('datetime64[s]'),
+        'site': rows['site'].astype('string').str.strip().fillna('').to_numpy(),
+    })
+    masks = {}
+    for metric in STATUS_TIME_METRICS:
+        wanted = [i for i, label in enumerate(labels) if STATUS_METRICS.get(label) == metric]
+        masks[metric] = np.isin(codes, wanted)
+    for metric in ('idle_sec', 'wait_sec'):
+        frame[metric] = np.where(masks[metric], seconds, 0.0)
+
+    fuel_start = rows['fuel_start'].to_numpy(dtype=float)
+    fuel_stop = rows['fuel_stop'].to_numpy(dtype=float)
+    used = rows['fuel_used'].to_numpy(dtype=float)
+    drop = np.clip(fuel_start - fuel_stop, 0, None)
+    frame['fuel_used'] = np.where(np.isnan(used), np.nan_to_num(drop), used)
+    frame['fuel_start'] = fuel_start
+    frame['fuel_end'] = fuel_stop
+
+    if drive is None:
+        course = masks['drive_sec'] & (stop > start).to_numpy()
+        drive = split_drive(frame['vehicle'].to_numpy()[course], start.to_numpy()[course],
+                            stop.to_numpy()[course], rows['km'].to_numpy(dtype=float)[course],
+                            frame['site'].to_numpy()[course], ref_hour)
+    # Driving rows carry no fuel levels, so first/last below only see the export rows
+    frame = pd.concat([frame, drive], ignore_index=True).fillna({m: 0.0 for m in SITE_METRICS})
+
+    sites = frame.groupby(['vehicle', 'date', 'site'], sort=True)[list(SITE_METRICS)].sum().reset_index()
+    daily = frame.groupby(['vehicle', 'date'], sort=True).agg(
+        **{m: (m, 'sum') for m in SITE_METRICS},
+        fuel_start=('fuel_start', 'first'),
+        fuel_end=('fuel_end', 'last'),
+    ).reset_index()
+    for table in (daily, sites):
+        table['date'] = table['date'].dt.date
+    return {'daily': daily, 'sites': sites}
+
+
 def parse_datetime(x):
     if pd.isna(x):
         return None
@@ -61,24 +248,61 @@ def parse_datetime(x):
 
 
 def parse_duration(x):
-    """Parse duration string like '8:00:00' or '08:00:40' to seconds."""
+    """Parse duration string like '8:00:00' or '08:00:40' to seconds (DURATION_PATTERN,
+    minutes and seconds below 60). Anything else is 0."""
     if pd.isna(x):
         return 0.0
-    s = str(x).strip()
-    if not s:
+    match = re.match(DURATION_PATTERN, str(x).strip())
+    if not match:
         return 0.0
-    # Try HH:MM:SS or H:MM:SS format
-    parts = s.split(':')
-    try:
-        if len(parts) == 3:
-            h, m, s_val = int(parts[0]), int(parts[1]), float(parts[2])
-            return h * 3600 + m * 60 + s_val
-        elif len(parts) == 2:
-            h, m = int(parts[0]), int(parts[1])
-            return h * 3600 + m * 60
-    except Exception:
-        pass
-    return 0.0
+    h, m, s_val = int(match[1]), int(match[2]), float((match[3] or '0').replace(',', '.'))
+    if m >= 60 or s_val >= 60:
+        return 0.0
+    return h * 3600 + m * 60 + s_val
+
+
+def parse_duration_column(col: pd.Series):
+    """Column-wide version of parse_duration ('8:00:40', '30:15', timedeltas).
+    Empty or unparseable cells become NaN instead of 0, so they are not checked.
+    """
+    if pd.api.types.is_timedelta64_dtype(col) or pd.api.types.infer_dtype(col, skipna=True) == 'timedelta':
+        # Durations read from Excel ([h]:mm:ss cells)
+        return pd.to_timedelta(col).dt.total_seconds()
+    if pd.api.types.is_numeric_dtype(col):
+        return pd.Series(np.nan, index=col.index)
+    # Every text cell goes through the same strict pattern as parse_duration
+    parts = col.astype(str).str.strip().str.extract(DURATION_PATTERN)
+    hours = parts[0].astype(float)
+    minutes = parts[1].astype(float)
+    seconds = parts[2].str.replace(',', '.', regex=False).astype(float).fillna(0.0)
+    return (hours * 3600 + minutes * 60 + seconds).where((minutes < 60) & (seconds < 60))
+
+
+def check_durations(start: pd.Series, stop: pd.Series, duration: pd.Series, tolerance=DURATION_TOLERANCE, fix=False):
+    """Compare the export's "Durée" with stop - start on every row.
+
+    The stop is rebuilt from a time of day, so an interval longer than 24h
+    comes out whole days short. Rows whose difference is a whole number of
+    days (within `tolerance` seconds) are 'multi_day'; with `fix` their stop
+    is moved forward by those days. Returns (stop, stats).
+    """
+    expected = parse_duration_column(duration).to_numpy()
+    actual = (stop - start).dt.total_seconds().to_numpy()
+    diff = expected - actual
+    checked = ~np.isnan(expected)
+    mismatch = checked & (np.abs(np.nan_to_num(diff)) > tolerance)
+    days = np.round(np.nan_to_num(diff) / 86400)
+    multi_day = mismatch & (days >= 1) & (np.abs(np.nan_to_num(diff) - days * 86400) <= tolerance)
+    if fix and multi_day.any():
+        stop = stop + pd.to_timedelta(np.where(multi_day, days, 0), unit='D')
+    stats = {
+        'checked': int(checked.sum()),
+        'mismatches': int(mismatch.sum()),
+        'multi_day': int(multi_day.sum()),
+        'corrected': int(multi_day.sum()) if fix else 0,
+        'max_diff_hours': round(float(np.abs(diff[mismatch]).max()) / 3600, 2) if mismatch.any() else 0.0,
+    }
+    return stop, stats
 
 
 def parse_km(x):
@@ -96,41 +320,128 @@ def parse_km(x):
         return 0.0
 
 
+def parse_number_column(col: pd.Series):
+    """Parse a French-locale numeric column to floats; empty or invalid cells become NaN."""
+    if pd.api.types.is_numeric_dtype(col):
+        return col.astype(float)
+    s = col.astype('string').str.strip().str.replace(',', '.', regex=False)
+    return pd.to_numeric(s, errors='coerce').astype(float)
+
+
+def parse_km_column(col: pd.Series):
+    """Column-wide version of parse_km.
+    Returns (float Series, number of non-empty cells that could not be parsed).
+    Unparseable and empty cells both become 0.0.
+    """
+    if pd.api.types.is_numeric_dtype(col):
+        # Already parsed at read time (decimal=',')
+        return col.astype(float).fillna(0.0), 0
+    s = col.astype('string').str.strip().str.replace(',', '.', regex=False)
+    blank = s.isna() | (s == '')
+    values = pd.to_numeric(s, errors='coerce')
+    coerced = int((values.isna() & ~blank).sum())
+    return values.astype(float).fillna(0.0), coerced
+
+
 def split_interval_at_20(start: datetime, end: datetime):
     """Return (seconds_before20, seconds_after20) for interval [start, end).
-    Handles spans across multiple days by summing multiple splits.
+    Time until the cut-off of the start day is "before", everything after it
+    (later days included) is "after". REF_HOUR 24 is the next midnight.
     """
     if end <= start:
         return 0.0, 0.0
-    cur = start
-    s_before = 0.0
-    s_after = 0.0
-    while cur < end:
-        ref_dt = datetime.combine(cur.date(), time(REF_HOUR,0,0))
-        # Determine segment end: either end, or next ref boundary or midnight
-        seg_end = min(end, ref_dt) if cur < ref_dt else min(end, ref_dt + timedelta(days=1))
-        dur = (seg_end - cur).total_seconds()
-        if cur < ref_dt:
-            s_before += dur
-        else:
-            s_after += dur
-        cur = seg_end
-        # if at exact ref_dt and cur < end, continue loop (will go to after segment)
-        if cur == ref_dt and cur < end:
-            continue
-        # if seg_end reached end, loop ends
+    ref_dt = datetime.combine(start.date(), time()) + timedelta(hours=REF_HOUR)
+    s_before = max((min(end, ref_dt) - start).total_seconds(), 0.0)
+    s_after = (end - start).total_seconds() - s_before
     return s_before, s_after
 
 
-def seconds_to_hhmm(seconds: float):
-    seconds = int(round(seconds))
-    h = seconds // 3600
-    m = (seconds % 3600) // 60
-    return f"{h:02d}:{m:02d}"
+def sweep_overlaps(vehicle, start, stop, km):
+    """Find the intervals [start, stop) of the same vehicle (integer ids) that
+    overlap, by sort-and-sweep in O(n log n), and build their union.
 
+    Returns (merged, stats). merged is (vehicle, start, stop, km, first) arrays
+    of the union segments, each segment's KM summed over its rows with exact
+    duplicate rows counted once; first is the position of the segment's first
+    (earliest) row in the input. stats holds the overlapping 'rows', the exact
+    'duplicates', and the 'seconds' counted more than once, in total and per
+    vehicle id ('by_vehicle').
+    """
+    v = np.asarray(vehicle, dtype=np.int64)
+    s = np.asarray(start, dtype='datetime64[s]').astype(np.int64)
+    e = np.asarray(stop, dtype='datetime64[s]').astype(np.int64)
+    km = np.asarray(km, dtype=float)
+    order = np.lexsort((e, s, v))
+    v, s, e, km = v[order], s[order], e[order], km[order]
+    n = len(v)
+    if n == 0:
+        stats = {'rows': 0, 'duplicates': 0, 'seconds': 0.0, 'by_vehicle': {}}
+        return (v, s.astype('datetime64[s]'), e.astype('datetime64[s]'), km, order), stats
 
-def process_dataframe(df: pd.DataFrame, include_date=False):
-    """Process DataFrame and aggregate vehicle working time and KM split at 20:00."""
+    # Offset each vehicle past the previous one's times, so one running max of
+    # the stops sweeps all vehicles and never carries over between them
+    base = s.min()
+    span = max(e.max(), s.max()) - base + 1
+    reach = np.maximum.accumulate(v * span + (e - base))
+    new_segment = np.ones(n, dtype=bool)
+    new_segment[1:] = v[1:] * span + (s[1:] - base) >= reach[:-1]
+    segment = np.cumsum(new_segment) - 1
+    first = np.flatnonzero(new_segment)
+
+    duplicate = np.zeros(n, dtype=bool)
+    duplicate[1:] = (v[1:] == v[:-1]) & (s[1:] == s[:-1]) & (e[1:] == e[:-1])
+    seg_stop = np.maximum.reduceat(e, first)
+    seg_km = np.bincount(segment, weights=np.where(duplicate, 0.0, km))
+    excess = np.bincount(segment, weights=(e - s).astype(float)) - (seg_stop - s[first])
+
+    rows_per_segment = np.bincount(segment)
+    by_vehicle = np.bincount(v[first], weights=excess)
+    stats = {
+        'rows': int(rows_per_segment[rows_per_segment > 1].sum()),
+        'duplicates': int(duplicate.sum()),
+        'seconds': float(excess.sum()),
+        'by_vehicle': {int(vid): float(sec) for vid, sec in enumerate(by_vehicle) if sec > 0},
+    }
+    merged = (v[first], s[first].astype('datetime64[s]'), seg_stop.astype('datetime64[s]'), seg_km, order[first])
+    return merged, stats
+
+
+def split_intervals(start, stop, ref_hour=REF_HOUR):
+    """Vectorized split_interval_at_20 for arrays of datetimes and any cut-off hour.
+    Returns (seconds_before, seconds_after) float arrays.
+
+    Same rule as split_interval_at_20: time until the first cut-off after the
+    start (on the start day) is "before", everything after it is "after".
+    """
+    _, seconds = split_buckets(start, stop, cutoff_schedule(ref_hour))
+    return seconds[:, 0], seconds[:, 1]
+
+
+def aggregate_intervals(intervals: pd.DataFrame, ref_hour=REF_HOUR, by=()):
+    """Per vehicle-day totals of Course intervals (columns vehicle, start, stop, km).
+    Returns a DataFrame with vehicle, date, the `by` columns, before_sec,
+    after_sec, km_before, km_after; the day is the start date, as in process_dataframe.
+    """
+    return bucket_intervals(intervals, cutoff_schedule(ref_hour), by=by)
+
+
+def process_dataframe(df: pd.DataFrame, include_date=False, timer=None, return_intervals=False, return_metrics=False,
+                      merge_overlaps=None, fix_durations=None):
+    """Process DataFrame and aggregate vehicle working time and KM split at 20:00.
+    Pass a StageTimer as `timer` to collect per-stage durations and row counts.
+    Course rows of a vehicle that overlap are reported in result.attrs['overlaps']
+    and, with `merge_overlaps` (default GPS_MERGE_OVERLAPS), merged before the split.
+    "Durée" is checked against stop - start (result.attrs['durations']); with
+    `fix_durations` (default GPS_FIX_DURATIONS) multi-day stops are corrected.
+    With `return_intervals`, the parsed Course rows (vehicle, start, stop, km, site)
+    are returned too; with `return_metrics`, the activity_metrics() of all rows
+    (idle time, sites, fuel) from the same parse, driving time and KM coming
+    from the same (merged) intervals as the totals. Extra results follow `result`
+    in that order, e.g. (result, intervals, metrics).
+    """
+    timer = timer if timer is not None else StageTimer()
+    merge_overlaps = MERGE_OVERLAPS if merge_overlaps is None else merge_overlaps
+    fix_durations = FIX_DURATIONS if fix_durations is None else fix_durations
     # Skip empty rows
     df = df.dropna(how='all').copy()
     
@@ -151,6 +462,16 @@ def process_dataframe(df: pd.DataFrame, include_date=False):
             col_map['caa'] = c
         if 'KM' in uc:
             col_map['km'] = c
+        if 'CHANTIER' in uc:
+            col_map['site'] = c
+        if 'DURÉE' in uc or 'DUREE' in uc:
+            col_map['duration'] = c
+        if 'CARBURANT' in uc and ('DÉPART' in uc or 'DEPART' in uc):
+            col_map['fuel_start'] = c
+        if 'CARBURANT' in uc and ('ARRÊT' in uc or 'ARRET' in uc):
+            col_map['fuel_stop'] = c
+        if 'CONSOM' in uc:
+            col_map['fuel_used'] = c
 
     if 'vehicle' not in col_map or 'start_time' not in col_map or 'stop_time' not in col_map or 'caa' not in col_map:
         raise ValueError(f'Could not find required columns. Found: {list(df.columns)}. Expected: Code, Heure de départ, Heure d\'arrêt, CAA.')
@@ -165,105 +486,178 @@ def process_dataframe(df: pd.DataFrame, include_date=False):
     cols_to_keep = [vcol, start_col, stop_col, caacol]
     if kmcol:
         cols_to_keep.append(kmcol)
+    if 'duration' in col_map:
+        cols_to_keep.append(col_map['duration'])
+    if 'site' in col_map and (return_intervals or return_metrics):
+        cols_to_keep.append(col_map['site'])
+    if return_metrics:
+        cols_to_keep += [col_map[k] for k in ('fuel_start', 'fuel_stop', 'fuel_used') if k in col_map]
     
     df = df[cols_to_keep].copy()
     df = df.dropna(subset=[vcol, start_col, stop_col, caacol])
     
-    # Parse start time (contains full datetime)
-    df[start_col] = df[start_col].apply(parse_datetime)
-    df = df.dropna(subset=[start_col])
+    timer.count('rows_input', len(df))
+    with timer.stage('parse_dates'):
+        # Parse start time (contains full datetime)
+        df[start_col] = df[start_col].apply(parse_datetime)
+        df = df.dropna(subset=[start_col])
     
-    # Parse stop time (contains only time, combine with date from start_time)
-    def parse_stop_time_with_date(row):
-        stop_str = str(row[stop_col]).strip()
-        start_dt = row[start_col]
-        if not stop_str or pd.isna(start_dt):
+        # Parse stop time (contains only time, combine with date from start_time)
+        def parse_stop_time_with_date(row):
+            stop_str = str(row[stop_col]).strip()
+            start_dt = row[start_col]
+            if not stop_str or pd.isna(start_dt):
+                return None
+            for fmt in ("%H:%M:%S", "%H:%M"):
+                try:
+                    stop_time = datetime.strptime(stop_str, fmt).time()
+                    stop_dt = datetime.combine(start_dt.date(), stop_time)
+                    if stop_dt < start_dt:
+                        stop_dt = stop_dt + timedelta(days=1)
+                    return stop_dt
+                except Exception:
+                    continue
             return None
-        for fmt in ("%H:%M:%S", "%H:%M"):
-            try:
-                stop_time = datetime.strptime(stop_str, fmt).time()
-                stop_dt = datetime.combine(start_dt.date(), stop_time)
-                if stop_dt < start_dt:
-                    stop_dt = stop_dt + timedelta(days=1)
-                return stop_dt
-            except Exception:
-                continue
-        return None
     
-    df[stop_col] = df.apply(lambda row: parse_stop_time_with_date(row), axis=1)
-    df = df.dropna(subset=[stop_col])
+        df[stop_col] = df.apply(lambda row: parse_stop_time_with_date(row), axis=1)
+        df = df.dropna(subset=[stop_col])
+        df[start_col] = pd.to_datetime(df[start_col])
+        df[stop_col] = pd.to_datetime(df[stop_col])
     
+    timer.count('rows_parsed', len(df))
+
+    # Cross-check the rebuilt stop times against "Durée"
+    durations = None
+    if 'duration' in col_map:
+        with timer.stage('check_durations'):
+            df[stop_col], durations = check_durations(df[start_col], df[stop_col], df[col_map['duration']],
+                                                      fix=fix_durations)
+        timer.count('rows_duration_mismatch', durations['mismatches'])
+
     # Parse KM
-    if kmcol:
-        df[kmcol] = df[kmcol].apply(parse_km)
-    else:
-        df['__km'] = 0.0
-        kmcol = '__km'
-
-    # Process each vehicle
-    results = []
-    for vehicle, g in df.groupby(vcol):
-        g = g.reset_index(drop=True)
-        day_map = {} if include_date else None
-        total_before_sec = 0.0
-        total_after_sec = 0.0
-        km_before = 0.0
-        km_after = 0.0
-        
-        for i, row in g.iterrows():
-            if str(row[caacol]).strip().lower() != 'course':
-                continue
-            
-            start = row[start_col]
-            stop = row[stop_col]
-            
-            if stop <= start:
-                continue
-            
-            km = row[kmcol]
-            
-            # Split time and KM at 20:00
-            sec_before, sec_after = split_interval_at_20(start, stop)
-            
-            # Proportionally allocate KM
-            total_dur = (stop - start).total_seconds()
-            if total_dur > 0:
-                km_b = km * (sec_before / total_dur)
-                km_a = km * (sec_after / total_dur)
-            else:
-                km_b = km_a = 0.0
-            
-            total_before_sec += sec_before
-            total_after_sec += sec_after
-            km_before += km_b
-            km_after += km_a
-            
-            if include_date:
-                day_key = (start.year, start.month, start.day)
-                if day_key not in day_map:
-                    day_map[day_key] = {'before_sec': 0.0, 'after_sec': 0.0, 'km_before': 0.0, 'km_after': 0.0}
-                day_map[day_key]['before_sec'] += sec_before
-                day_map[day_key]['after_sec'] += sec_after
-                day_map[day_key]['km_before'] += km_b
-                day_map[day_key]['km_after'] += km_a
-        
-        results.append({
-            'vehicle': vehicle,
-            'time_before_hhmm': seconds_to_hhmm(total_before_sec),
-            'time_after_hhmm': seconds_to_hhmm(total_after_sec),
-            'time_before_seconds': int(round(total_before_sec)),
-            'time_after_seconds': int(round(total_after_sec)),
-            'km_before': round(km_before, 3),
-            'km_after': round(km_after, 3),
-            'day_map': day_map
-        })
-    
-    return pd.DataFrame(results)
+    km_coerced = 0
+    with timer.stage('parse_km'):
+        if kmcol:
+            df[kmcol], km_coerced = parse_km_column(df[kmcol])
+        else:
+            df['__km'] = 0.0
+            kmcol = '__km'
+
+    with timer.stage('aggregate'):
+        # Encode vehicles as integer ids; categories come out sorted like groupby keys
+        vehicle_cat = df[vcol].astype('category').cat.remove_unused_categories()
+        df['__vid'] = vehicle_cat.cat.codes
+        vehicles = vehicle_cat.cat.categories
+
+        # Keep only "Course" rows with one mask
+        course = df[course_mask(df[caacol]).to_numpy()]
+        timer.count('rows_course', len(course))
+
+        # Split every interval at the cut-off in one pass (see bucketing.py)
+        starts = pd.to_datetime(course[start_col]).to_numpy()
+        stops = pd.to_datetime(course[stop_col]).to_numpy()
+        valid = stops > starts
+        vids, starts, stops = course['__vid'].to_numpy()[valid], starts[valid], stops[valid]
+        km = course[kmcol].to_numpy(dtype=float)[valid]
+
+        # Site of each interval, for the activity metrics and stored intervals
+        if 'site' in col_map and (return_intervals or return_metrics):
+            sites = course[col_map['site']].astype('string').str.strip().fillna('').to_numpy()[valid]
+        else:
+            sites = np.full(len(vids), '', dtype=object)
+
+        # Overlapping rows of a vehicle (duplicated exports, ...) count the same time twice
+        merged, overlaps = sweep_overlaps(vids, starts, stops, km)
+        if merge_overlaps:
+            # A merged segment counts on the site of its first row
+            vids, starts, stops, km, first = merged
+            sites = sites[first]
+        timer.count('rows_overlapping', overlaps['rows'])
+
+        per_interval = split_drive(vids, starts, stops, km, sites, REF_HOUR)
+        metrics = ['before_sec', 'after_sec', 'km_before', 'km_after']
+        totals = per_interval.groupby('vehicle')[metrics].sum().reindex(range(len(vehicles)), fill_value=0.0)
+
+        day_maps = {}
+        if include_date:
+            daily = per_interval.groupby(['vehicle', 'date'], sort=True)[metrics].sum().reset_index()
+            days = pd.to_datetime(daily['date'])
+            columns = [daily['vehicle'], days.dt.year, days.dt.month, days.dt.day] + [daily[m] for m in metrics]
+            for vid, year, month, day, b, a, kb, ka in zip(*(c.tolist() for c in columns)):
+                day_maps.setdefault(vid, {})[(year, month, day)] = {
+                    'before_sec': b, 'after_sec': a, 'km_before': kb, 'km_after': ka,
+                }
+
+        # One line per vehicle, including vehicles without any Course row
+        results = []
+        for vid, row in enumerate(totals.itertuples(index=False)):
+            results.append({
+                'vehicle': vehicles[vid],
+                'time_before_hhmm': seconds_to_hhmm(row.before_sec),
+                'time_after_hhmm': seconds_to_hhmm(row.after_sec),
+                'time_before_seconds': int(round(row.before_sec)),
+                'time_after_seconds': int(round(row.after_sec)),
+                'km_before': round(row.km_before, 3),
+                'km_after': round(row.km_after, 3),
+                'day_map': day_maps.get(vid, {}) if include_date else None
+            })
 
+    result = pd.DataFrame(results)
+    result.attrs['km_coerced'] = km_coerced
+    result.attrs['durations'] = durations
+    result.attrs['overlaps'] = {
+        'rows': overlaps['rows'],
+        'duplicates': overlaps['duplicates'],
+        'hours': round(overlaps['seconds'] / 3600, 2),
+        'merged': bool(merge_overlaps and overlaps['rows']),
+        'vehicles': {str(vehicles[vid]): round(sec / 3600, 2) for vid, sec in overlaps['by_vehicle'].items()},
+    }
+    extra = []
+    if return_intervals:
+        # The intervals the aggregates were computed from (merged if merging)
+        extra.append(pd.DataFrame({
+            'vehicle': np.asarray(vehicles.astype(str))[vids] if len(vids) else np.array([], dtype=str),
+            'start': starts,
+            'stop': stops,
+            'km': km,
+            'site': sites,
+        }))
+    if return_metrics:
+        with timer.stage('metrics'):
+            rows = pd.DataFrame({
+                'vehicle': df[vcol],
+                'start': df[start_col],
+                'stop': df[stop_col],
+                'status': df[caacol],
+                'km': df[kmcol],
+                'site': df[col_map['site']] if 'site' in col_map else '',
+            })
+            for key in ('fuel_start', 'fuel_stop', 'fuel_used'):
+                # Empty fuel cells stay NaN: no reading is not a zero reading
+                rows[key] = parse_number_column(df[col_map[key]]) if key in col_map else np.nan
+            # The split the totals were summed from (merged intervals if merging)
+            drive = per_interval.assign(vehicle=np.asarray(vehicles.astype(str))[vids] if len(vids) else '')
+            extra.append(activity_metrics(rows, drive=drive))
+    return (result, *extra) if extra else result
 
-def generate_reports(infile: Path, outdir: Path, period='daily', out_format='csv'):
-    df = load_file(infile)
-    processed = process_dataframe(df, include_date=True)
+
+def generate_reports(infile: Path, outdir: Path, period='daily', out_format='csv', processed=None):
+    """Write a daily or monthly report for `infile`; pass `processed` to reuse
+    an existing process_dataframe(..., include_date=True) result."""
+    if processed is None:
+        df = load_file(infile)
+        processed = process_dataframe(df, include_date=True)
+    if processed.attrs.get('km_coerced'):
+        print(f"Warning: {processed.attrs['km_coerced']} KM value(s) could not be parsed and were counted as 0")
+    durations = processed.attrs.get('durations')
+    if durations and durations['mismatches']:
+        fixed = f", {durations['corrected']} multi-day stop(s) corrected" if durations['corrected'] else \
+            f" ({durations['multi_day']} multi-day, see --fix-durations)" if durations['multi_day'] else ''
+        print(f"Warning: {durations['mismatches']} row(s) where Durée differs from stop - start{fixed}")
+    overlaps = processed.attrs.get('overlaps')
+    if overlaps and overlaps['rows']:
+        action = 'merged' if overlaps['merged'] else 'counted more than once (see --merge-overlaps)'
+        print(f"Warning: {overlaps['rows']} overlapping Course row(s), {overlaps['hours']} h {action}")
 
     if period == 'daily':
         # Generate one report per day
@@ -284,7 +678,7 @@ def generate_reports(infile: Path, outdir: Path, period='daily', out_format='csv
                         'km_after': round(metrics['km_after'], 3)
                     })
         report_df = pd.DataFrame(all_daily)
-        out = outdir / f"report_daily_{infile.stem}.{out_format}"
+        out = outdir / f"report_daily_{report_stem(infile)}.{out_format}"
     else:
         # Generate one report per month
         all_monthly = []
@@ -313,11 +707,50 @@ def generate_reports(infile: Path, outdir: Path, period='daily', out_format='csv
                     'km_after': round(metrics['km_after'], 3)
                 })
         report_df = pd.DataFrame(all_monthly)
-        out = outdir / f"report_monthly_{infile.stem}.{out_format}"
+        out = outdir / f"report_monthly_{report_stem(infile)}.{out_format}"
+
+    if out_format == 'csv':
+        report_df.to_csv(out, index=False)
+    else:
+        report_df.to_excel(out, index=False)
+    print(f"Wrote {out}")
+    return report_df
+
 
+def generate_bucket_report(infile: Path, outdir: Path, intervals: pd.DataFrame, schedule, holidays=(), out_format='csv'):
+    """Write hours and KM per vehicle-day for each bucket of `schedule`
+    (see bucketing.py), from process_dataframe(..., return_intervals=True)."""
+    daily = bucket_intervals(intervals, schedule, holidays)
+    report_df = pd.DataFrame({'date': [d.isoformat() for d in daily['date']], 'vehicle': daily['vehicle']})
+    for name in bucket_names(schedule):
+        report_df[f'hours_{name}'] = (daily[f'{name}_sec'] / 3600).round(2)
+    for name in bucket_names(schedule):
+        report_df[f'km_{name}'] = daily[f'km_{name}'].round(3)
+    out = outdir / f"report_buckets_{report_stem(infile)}.{out_format}"
     if out_format == 'csv':
         report_df.to_csv(out, index=False)
     else:
         report_df.to_excel(out, index=False)
     print(f"Wrote {out}")
     return report_df
+
+
+def generate_metrics_reports(infile: Path, outdir: Path, metrics, out_format='csv'):
+    """Write the per vehicle-day and per site activity_metrics() reports
+    (driving, idle and waiting hours, driving KM, fuel)."""
+    written = {}
+    for name, table in (('metrics', metrics['daily']), ('sites', metrics['sites'])):
+        report_df = table.copy()
+        report_df['date'] = [d.isoformat() for d in report_df['date']]
+        for metric in TIME_METRICS:
+            report_df[metric] = (report_df[metric] / 3600).round(2)
+        report_df = report_df.round({'drive_km': 3, 'km_before': 3, 'km_after': 3, 'fuel_used': 2, 'fuel_start': 2, 'fuel_end': 2})
+        report_df = report_df.rename(columns={m: m.replace('_sec', '_hours') for m in TIME_METRICS})
+        out = outdir / f"report_{name}_{report_stem(infile)}.{out_format}"
+        if out_format == 'csv':
+            report_df.to_csv(out, index=False)
+        else:
+            report_df.to_excel(out, index=False)
+        print(f"Wrote {out}")
+        written[name] = report_df
+    return written
@@ -1,21 +1,52 @@
 import argparse
+import os
 from pathlib import Path
-from report_logic import generate_reports
 
 
 def main():
     p = argparse.ArgumentParser(description="Vehicle activity report generator")
-    p.add_argument("input", help="Input CSV or Excel file")
+    p.add_argument("input", help="Input CSV or Excel file, gzip/zstd-compressed (.csv.gz, .csv.zst) or a .zip of exports")
     p.add_argument("--output-dir", default="out", help="Output directory")
     p.add_argument("--period", choices=["daily","monthly"], default="daily", help="Report period")
     p.add_argument("--format", choices=["csv","xlsx"], default="csv", help="Output file format")
+    p.add_argument("--store", action="store_true", help="Also store the daily records in the database")
+    p.add_argument("--merge-overlaps", action="store_true", default=None, help="Merge overlapping Course rows of a vehicle before splitting (default GPS_MERGE_OVERLAPS)")
+    p.add_argument("--fix-durations", action="store_true", default=None, help="Correct stops of intervals longer than 24h from the Durée column (default GPS_FIX_DURATIONS)")
+    p.add_argument("--metrics", action="store_true", help="Also write idle/waiting time, per-site (Chantier) and fuel reports from the same pass")
+    p.add_argument("--buckets", choices=["cutoff","tariff"], help="Also write hours/KM per time bucket (cutoff: before/after GPS_REF_HOUR; tariff: night, Sunday, holiday, day)")
+    p.add_argument("--holidays", default=os.environ.get("GPS_HOLIDAYS", ""), help="Holiday dates for --buckets tariff: comma-separated YYYY-MM-DD or a file (default GPS_HOLIDAYS)")
     args = p.parse_args()
 
+    # pandas is only loaded once the arguments are valid
+    from report_logic import REF_HOUR, load_file, process_dataframe, generate_reports, generate_bucket_report, generate_metrics_reports
+
     infile = Path(args.input)
     outdir = Path(args.output_dir)
     outdir.mkdir(parents=True, exist_ok=True)
 
-    generate_reports(infile, outdir, period=args.period, out_format=args.format)
+    processed, intervals, *metrics = process_dataframe(load_file(infile), include_date=True, return_intervals=True,
+                                                       return_metrics=args.metrics or args.store,
+                                                       merge_overlaps=args.merge_overlaps,
+                                                       fix_durations=args.fix_durations)
+    generate_reports(infile, outdir, period=args.period, out_format=args.format, processed=processed)
+    if args.metrics:
+        generate_metrics_reports(infile, outdir, metrics[0], out_format=args.format)
+    if args.buckets:
+        from bucketing import get_schedule, parse_holidays
+        generate_bucket_report(infile, outdir, intervals, get_schedule(args.buckets, REF_HOUR),
+                               parse_holidays(args.holidays), out_format=args.format)
+
+    if args.store:
+        from datastore import session_scope, create_schema, existing_dates, store_daily_activity, intervals_enabled, sites_enabled
+        create_schema()
+        with session_scope() as session:
+            duplicates = existing_dates(session, processed)
+            if duplicates:
+                print(f"Not stored: date(s) already in the database: {', '.join(d.isoformat() for d in duplicates)}")
+                return
+            count = store_daily_activity(session, processed, intervals if intervals_enabled() else None,
+                                         metrics[0]['sites'] if sites_enabled() else None)
+        print(f"✓ Stored {count} records in database")
 
 if __name__ == '__main__':
     main()
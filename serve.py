@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Production entry point.
+
+Runs the app under gunicorn (multi-process, settings in gunicorn.conf.py) or,
+where gunicorn is not available (Windows), under waitress with a thread pool.
+
+Usage:
+  python serve.py
+  GPS_WORKERS=4 GPS_THREADS=8 GPS_BIND=0.0.0.0:8000 python serve.py
+"""
+
+import os
+import sys
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+
+def main():
+    os.chdir(HERE)
+    try:
+        import gunicorn  # noqa: F401 - only checks availability
+    except ImportError:
+        gunicorn = None
+
+    if gunicorn is not None and os.name != 'nt':
+        os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', str(HERE / 'gunicorn.conf.py'), 'wsgi:app'])
+
+    try:
+        from waitress import serve
+    except ImportError:
+        sys.exit("Install gunicorn (Linux/macOS) or waitress (Windows) to run in production mode.")
+
+    from wsgi import app
+    host, _, port = os.environ.get('GPS_BIND', '127.0.0.1:8000').rpartition(':')
+    threads = int(os.environ.get('GPS_THREADS', 8))
+    print(f"Serving on http://{host}:{port} with waitress ({threads} threads)")
+    serve(app, host=host, port=int(port), threads=threads, channel_timeout=int(os.environ.get('GPS_TIMEOUT', 300)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Storage smoke test on a real database: bulk insert (COPY on PostgreSQL), the
+vehicle registry upsert (ON CONFLICT), delete_activity / update_cumulative,
+recompute_activity, the day counts of the site totals and the pruning of
+request timings.
+
+    GPS_TEST_DATABASE_URL=postgresql+psycopg://localhost/gps_test python -m pytest tests/test_backend.py
+
+The tables of that database are dropped and recreated. Skipped when the
+variable is not set.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+URL = os.environ.get('GPS_TEST_DATABASE_URL')
+pytestmark = pytest.mark.skipif(not URL, reason='GPS_TEST_DATABASE_URL is not set')
+
+
+@pytest.fixture
+def session():
+    from datastore import create_schema
+    engine = create_schema(URL, drop=True)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture(scope='module')
+def upload(tmp_path_factory):
+    """process_dataframe output of a synthetic export (8 vehicles, 5 days)."""
+    from benchmarks.synthetic import write_rapport_csv
+    from report_logic import load_file, process_dataframe
+    path = tmp_path_factory.mktemp('export') / 'rapport.csv'
+    write_rapport_csv(path, vehicles=8, days=5, rows_per_day=12)
+    processed, intervals, metrics = process_dataframe(load_file(path), include_date=True,
+                                                      return_intervals=True, return_metrics=True)
+    return processed, intervals, metrics['sites']
+
+
+def _direct_totals(session, start, end):
+    from datastore import VehicleActivity as A
+    rows = session.query(A.vehicle_code, func.sum(A.hours_before_20h), func.sum(A.km_after), func.count()) \
+        .filter(A.date >= start, A.date <= end).group_by(A.vehicle_code)
+    return {v: (before, km, days) for v, before, km, days in rows}
+
+
+def _assert_cumulative_matches(session, start, end):
+    from datastore import range_totals
+    direct = _direct_totals(session, start, end)
+    totals = range_totals(session, start, end)
+    assert set(totals) == set(direct)
+    for vehicle, (before, km, days) in direct.items():
+        assert totals[vehicle]['hours_before_20h'] == pytest.approx(before)
+        assert totals[vehicle]['km_after'] == pytest.approx(km)
+        assert totals[vehicle]['days'] == days
+
+
+def test_store_activity_bulk_insert(session, upload):
+    from datastore import CourseInterval, SiteActivity, VehicleActivity, store_daily_activity
+    processed, intervals, sites = upload
+    stored = store_daily_activity(session, processed, intervals, sites)
+    session.commit()
+    assert stored == session.query(VehicleActivity).count() > 0
+    assert session.query(CourseInterval).count() == len(intervals)
+    assert session.query(SiteActivity).count() == len(sites)
+    _assert_cumulative_matches(session, date(2025, 12, 1), date(2025, 12, 5))
+    _assert_cumulative_matches(session, date(2025, 12, 2), date(2025, 12, 3))
+
+
+def test_delete_activity_updates_cumulative(session, upload):
+    from datastore import CourseInterval, SiteActivity, VehicleActivity, delete_activity, store_daily_activity
+    store_daily_activity(session, *upload)
+    session.commit()
+    counts = delete_activity(session, date(2025, 12, 2), date(2025, 12, 3))
+    session.commit()
+    assert sorted(counts) == [date(2025, 12, 2), date(2025, 12, 3)]
+    for model in (VehicleActivity, CourseInterval, SiteActivity):
+        assert session.query(model).filter(model.date.between(date(2025, 12, 2), date(2025, 12, 3))).count() == 0
+    _assert_cumulative_matches(session, date(2025, 12, 1), date(2025, 12, 5))
+    _assert_cumulative_matches(session, date(2025, 12, 3), date(2025, 12, 5))
+
+    delete_activity(session, date(2025, 12, 5), vehicles=['C001'])
+    session.commit()
+    _assert_cumulative_matches(session, date(2025, 12, 1), date(2025, 12, 5))
+
+
+def _split_sums(session, model):
+    columns = [func.sum(getattr(model, c)) for c in ('hours_before_20h', 'hours_after_20h', 'km_before', 'km_after')]
+    rows = session.query(model.vehicle_code, model.date, *columns).group_by(model.vehicle_code, model.date)
+    return {(vehicle, day): values for vehicle, day, *values in rows}
+
+
+def test_recompute_activity_rewrites_sites(session, upload):
+    from datastore import SiteActivity, VehicleActivity, recompute_activity, store_daily_activity
+    store_daily_activity(session, *upload)
+    session.commit()
+    days, intervals, site_days = recompute_activity(session, 18)
+    session.commit()
+    assert days == site_days == session.query(VehicleActivity).count()
+
+    vehicles, sites = _split_sums(session, VehicleActivity), _split_sums(session, SiteActivity)
+    assert sites.keys() == vehicles.keys()
+    for key, values in sites.items():
+        assert values == pytest.approx(vehicles[key])
+    _assert_cumulative_matches(session, date(2025, 12, 1), date(2025, 12, 5))
+
+
+def test_site_totals_count_vehicle_days(session, upload):
+    from analytics import sql_totals
+    from datastore import store_daily_activity
+    sites = upload[2]
+    store_daily_activity(session, *upload)
+    session.commit()
+    start, end = date(2025, 12, 1), date(2025, 12, 5)
+    by_vehicle = sql_totals(session, start, end)
+    by_site = sql_totals(session, start, end, sites=set(sites['site']))
+    assert [row['days'] for row in by_site] == [row['days'] for row in by_vehicle]
+
+
+def test_prune_request_metrics(session):
+    from datastore import RequestMetric, prune_request_metrics
+    now = datetime(2025, 12, 31, 12, 0)
+    ages = [timedelta(days=d) for d in (0, 10, 29, 31, 400)]
+    session.add_all(RequestMetric(route='report_by_date', created_at=now - age) for age in ages)
+    session.commit()
+    assert prune_request_metrics(session, 30, now=now) == 2
+    session.commit()
+    assert sorted(now - row.created_at for row in session.query(RequestMetric)) == ages[:3]
+
+
+def test_sync_vehicle_registry_upsert(session):
+    from benchmarks.synthetic import registry_rows
+    from datastore import Vehicle, sync_vehicle_registry
+    rows = registry_rows(vehicles=6)
+    assert sync_vehicle_registry(session, rows)['added'] == 6
+    session.commit()
+
+    rows[0] = {**rows[0], 'name': 'Renamed'}
+    result = sync_vehicle_registry(session, rows[:4], mirror=True)
+    session.commit()
+    assert result['deleted'] == 2
+    assert session.query(Vehicle).count() == 4
+    assert session.get(Vehicle, rows[0]['id']).name == 'Renamed'
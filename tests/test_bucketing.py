@@ -0,0 +1,116 @@
+"""
+bucketing.split_buckets: equivalence with the per-interval reference split
+(report_logic.split_interval_at_20) and the calendar edge cases.
+"""
+
+from datetime import date, datetime, timedelta
+import random
+
+import numpy as np
+import pytest
+
+import report_logic
+from bucketing import TARIFF_SCHEDULE, cutoff_schedule, prorate_km, split_buckets
+
+
+def _arrays(intervals):
+    start = np.array([s for s, _ in intervals], dtype='datetime64[s]')
+    stop = np.array([e for _, e in intervals], dtype='datetime64[s]')
+    return start, stop
+
+
+def _random_intervals(n, seed=0):
+    rng = random.Random(seed)
+    base = datetime(2025, 1, 1)
+    intervals = []
+    for _ in range(n):
+        start = base + timedelta(minutes=rng.randrange(0, 60 * 24 * 60))
+        # Mostly short rides, some over several days, some empty or reversed
+        length = rng.choice([rng.randrange(1, 600), rng.randrange(0, 4 * 1440), 0, -30])
+        intervals.append((start, start + timedelta(minutes=length)))
+    return intervals
+
+
+@pytest.mark.parametrize('ref_hour', [0, 6, 20, 24])
+def test_cutoff_split_matches_reference(monkeypatch, ref_hour):
+    intervals = _random_intervals(5000, seed=ref_hour)
+    names, seconds = split_buckets(*_arrays(intervals), cutoff_schedule(ref_hour))
+    assert names == ['before', 'after']
+    monkeypatch.setattr(report_logic, 'REF_HOUR', ref_hour)
+    expected = [report_logic.split_interval_at_20(s, e) for s, e in intervals]
+    np.testing.assert_allclose(seconds, np.array(expected))
+
+
+def test_cutoff_zero_puts_everything_after():
+    start, stop = _arrays([(datetime(2025, 3, 1, 0, 0), datetime(2025, 3, 2, 12, 0))])
+    names, seconds = split_buckets(start, stop, cutoff_schedule(0))
+    assert dict(zip(names, seconds[0])) == {'before': 0.0, 'after': 36 * 3600.0}
+
+
+def test_reference_cutoff_24_is_next_midnight(monkeypatch):
+    monkeypatch.setattr(report_logic, 'REF_HOUR', 24)
+    split = report_logic.split_interval_at_20
+    assert split(datetime(2025, 3, 1, 22, 0), datetime(2025, 3, 2, 1, 30)) == (2 * 3600.0, 1.5 * 3600)
+    # Later days stay "after"
+    assert split(datetime(2025, 3, 1, 23, 0), datetime(2025, 3, 3, 1, 0)) == (3600.0, 25 * 3600.0)
+
+
+def test_cutoff_out_of_range():
+    with pytest.raises(ValueError):
+        cutoff_schedule(25)
+
+
+def _tariff_bucket(minute, holidays):
+    if minute.date() in holidays:
+        return 'holiday'
+    if minute.weekday() == 6:
+        return 'sunday'
+    if minute.hour >= 22 or minute.hour < 6:
+        return 'night'
+    return 'day'
+
+
+def test_tariff_matches_minute_by_minute():
+    holidays = [date(2025, 1, 1), date(2025, 1, 20)]
+    intervals = [(s, e) for s, e in _random_intervals(300, seed=7) if e - s < timedelta(days=3)]
+    names, seconds = split_buckets(*_arrays(intervals), TARIFF_SCHEDULE, holidays)
+    for (start, stop), row in zip(intervals, seconds):
+        expected = dict.fromkeys(names, 0.0)
+        minute = start
+        while minute < stop:
+            expected[_tariff_bucket(minute, set(holidays))] += 60
+            minute += timedelta(minutes=1)
+        assert dict(zip(names, row)) == expected
+
+
+def test_tariff_sunday_and_holiday_boundaries():
+    intervals = [
+        (datetime(2025, 1, 18, 23, 0), datetime(2025, 1, 19, 1, 0)),  # Saturday night into Sunday
+        (datetime(2025, 1, 19, 23, 0), datetime(2025, 1, 20, 2, 0)),  # Sunday into a holiday Monday
+        (datetime(2025, 1, 20, 23, 0), datetime(2025, 1, 21, 7, 0)),  # holiday into a working Tuesday
+        (datetime(2025, 1, 21, 5, 59), datetime(2025, 1, 21, 6, 1)),  # end of the night window
+    ]
+    names, seconds = split_buckets(*_arrays(intervals), TARIFF_SCHEDULE, [date(2025, 1, 20)])
+    got = [{name: sec / 60 for name, sec in zip(names, row) if sec} for row in seconds]
+    assert got == [
+        {'night': 60, 'sunday': 60},
+        {'sunday': 60, 'holiday': 120},
+        {'holiday': 60, 'night': 360, 'day': 60},
+        {'night': 1, 'day': 1},
+    ]
+
+
+def test_touching_intervals_split_independently():
+    intervals = [(datetime(2025, 2, 3, 19, 0), datetime(2025, 2, 3, 20, 0)),
+                 (datetime(2025, 2, 3, 20, 0), datetime(2025, 2, 3, 21, 0))]
+    _, seconds = split_buckets(*_arrays(intervals), cutoff_schedule(20))
+    np.testing.assert_array_equal(seconds, [[3600, 0], [0, 3600]])
+
+
+def test_prorate_km_keeps_totals():
+    _, seconds = split_buckets(*_arrays(_random_intervals(200, seed=3)), TARIFF_SCHEDULE)
+    km = np.linspace(0, 50, len(seconds))
+    split = prorate_km(km, seconds)
+    moving = seconds.sum(axis=1) > 0
+    np.testing.assert_allclose(split.sum(axis=1)[moving], km[moving])
+    assert not split[~moving].any()
@@ -0,0 +1,151 @@
+"""
+Vectorized checks of report_logic: the overlap sweep against a naive union
+per vehicle, the "Durée" cross-check, and the activity metrics against the
+per-vehicle totals.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from report_logic import activity_metrics, check_durations, parse_duration, parse_duration_column, process_dataframe, \
+    sweep_overlaps
+
+
+def _naive_union(rows):
+    """{vehicle: [(start, stop, km), ...]} merging rows that overlap (touching rows stay apart)."""
+    union = {}
+    seen = set()
+    for v, s, e, km in sorted(rows, key=lambda r: (r[0], r[1], r[2])):
+        km = 0.0 if (v, s, e) in seen else km
+        seen.add((v, s, e))
+        segments = union.setdefault(v, [])
+        if segments and s < segments[-1][1]:
+            start, stop, total = segments[-1]
+            segments[-1] = (start, max(stop, e), total + km)
+        else:
+            segments.append((s, e, km))
+    return union
+
+
+def test_sweep_matches_naive_union():
+    rng = random.Random(0)
+    base = datetime(2025, 1, 1)
+    rows = []
+    for _ in range(3000):
+        v = rng.randrange(12)
+        s = base + timedelta(minutes=rng.randrange(0, 5 * 1440))
+        rows.append((v, s, s + timedelta(minutes=rng.randrange(1, 240)), round(rng.uniform(0, 30), 1)))
+    rows += [rows[i] for i in range(0, 300, 3)]  # exact duplicates
+    v, s, e, km = (np.array(col) for col in zip(*rows))
+    (mv, ms, me, mkm, _), stats = sweep_overlaps(v, s.astype('datetime64[s]'), e.astype('datetime64[s]'), km)
+
+    expected = _naive_union(rows)
+    got = {}
+    for vehicle, start, stop, total in zip(mv, ms.astype(datetime), me.astype(datetime), mkm):
+        got.setdefault(int(vehicle), []).append((start, stop, total))
+    assert got.keys() == expected.keys()
+    for vehicle, segments in expected.items():
+        assert [(a, b) for a, b, _ in got[vehicle]] == [(a, b) for a, b, _ in segments]
+        np.testing.assert_allclose([k for *_, k in got[vehicle]], [k for *_, k in segments])
+
+    lengths = sum((b - a).total_seconds() for _, a, b, _ in rows)
+    union = sum((b - a).total_seconds() for segments in expected.values() for a, b, _ in segments)
+    assert stats['seconds'] == pytest.approx(lengths - union)
+    assert stats['duplicates'] == len(rows) - len({(v, s, e) for v, s, e, _ in rows})
+
+
+def test_sweep_touching_and_separate_vehicles():
+    t = np.array(['2025-01-01T08:00', '2025-01-01T09:00', '2025-01-01T08:30', '2025-01-01T08:30'], dtype='datetime64[s]')
+    stop = t + np.timedelta64(1, 'h')
+    # Vehicle 0: two touching rows; vehicle 1 overlaps vehicle 0 in time only
+    (mv, ms, me, _, first), stats = sweep_overlaps([0, 0, 1, 2], t, stop, [1.0, 2.0, 3.0, 4.0])
+    assert list(mv) == [0, 0, 1, 2] and list(first) == [0, 1, 2, 3]
+    assert stats['rows'] == 0 and stats['seconds'] == 0.0
+
+
+def test_parse_duration_column():
+    col = pd.Series(['30:15', '8:00:40', '', None, 'n/a', '1:02:03,5', '48:00:00', ' 2:05 '])
+    values = parse_duration_column(col).tolist()
+    assert values[:2] == [30 * 3600 + 15 * 60, 8 * 3600 + 40]
+    assert all(np.isnan(x) for x in values[2:5])
+    assert values[5:] == [3723.5, 48 * 3600, 2 * 3600 + 5 * 60]
+
+
+def test_parse_duration_column_matches_scalar():
+    # A bare number or a timedelta string must not change how the other cells are read
+    cells = ['8', '08:00:40', '1 day', '1:60:00', '0:59:60', '1:02:03,5', '1:02:03.25', '36:30', '100:00:00', 'x']
+    values = parse_duration_column(pd.Series(cells))
+    for cell, value in zip(cells, values):
+        expected = parse_duration(cell)
+        assert (np.isnan(value) and expected == 0.0) or value == expected, cell
+    assert values.notna().tolist() == [False, True, False, False, False, True, True, True, True, False]
+
+
+def test_check_durations_multi_day():
+    start = pd.Series(pd.to_datetime(['2025-01-01 20:00', '2025-01-01 08:00', '2025-01-01 10:00', '2025-01-01 10:00']))
+    # Stops rebuilt from a time of day on the start date
+    stop = pd.Series(pd.to_datetime(['2025-01-01 22:00', '2025-01-01 14:15', '2025-01-01 11:00', '2025-01-01 11:00']))
+    duration = pd.Series(['26:00:00', '30:15', '1:05:00', ''])
+
+    same, stats = check_durations(start, stop, duration, tolerance=60)
+    assert same.equals(stop)
+    assert stats == {'checked': 3, 'mismatches': 3, 'multi_day': 2, 'corrected': 0, 'max_diff_hours': 24.0}
+
+    fixed, stats = check_durations(start, stop, duration, tolerance=60, fix=True)
+    assert stats['corrected'] == 2
+    assert list(fixed) == list(pd.to_datetime(['2025-01-02 22:00', '2025-01-02 14:15', '2025-01-01 11:00', '2025-01-01 11:00']))
+
+
+def _export(rows):
+    return pd.DataFrame(rows, columns=['Code', 'Heure de départ', "Heure d'arrêt", 'CAA', 'KM', 'Chantier'])
+
+
+def test_metrics_match_totals():
+    df = _export([
+        ('V1', '2025-01-06 18:00:00', '21:00:00', 'Course', '30', 'A'),
+        ('V1', '2025-01-06 21:00:00', '21:00:00', 'Course', '5', 'A'),  # zero length
+        ('V1', '2025-01-06 21:30:00', '22:00:00', 'Arrêt', '0', 'B'),
+        ('V2', '2025-01-06 19:00:00', '20:30:00', 'Course', '12', 'B'),
+    ])
+    result, metrics = process_dataframe(df, return_metrics=True, merge_overlaps=False)
+    daily = metrics['daily'].set_index('vehicle')
+    for row in result.itertuples():
+        day = daily.loc[row.vehicle]
+        assert day.before_sec == row.time_before_seconds and day.after_sec == row.time_after_seconds
+        assert day.km_before == pytest.approx(row.km_before) and day.km_after == pytest.approx(row.km_after)
+        assert day.drive_km == pytest.approx(day.km_before + day.km_after)
+        assert day.drive_sec == day.before_sec + day.after_sec
+    assert daily.loc['V1', 'idle_sec'] == 1800
+
+    # Standalone, from the parsed rows, the same split
+    rows = pd.DataFrame({
+        'vehicle': df['Code'], 'start': pd.to_datetime(df['Heure de départ']),
+        'stop': pd.to_datetime(df['Heure de départ'].str[:11] + df["Heure d'arrêt"]),
+        'status': df['CAA'], 'km': df['KM'].astype(float), 'site': df['Chantier'],
+        'fuel_start': np.nan, 'fuel_stop': np.nan, 'fuel_used': np.nan,
+    })
+    standalone = activity_metrics(rows)
+    for key in ('daily', 'sites'):
+        pd.testing.assert_frame_equal(standalone[key], metrics[key], check_dtype=False)
+
+
+def test_merged_metrics_match_totals():
+    df = _export([
+        ('V1', '2025-01-06 18:00:00', '21:00:00', 'Course', '30', 'A'),
+        ('V1', '2025-01-06 19:00:00', '22:00:00', 'Course', '10', 'B'),  # overlaps the first
+        ('V1', '2025-01-06 18:00:00', '21:00:00', 'Course', '30', 'A'),  # exact duplicate
+    ])
+    result, metrics = process_dataframe(df, return_metrics=True, merge_overlaps=True)
+    row = result.iloc[0]
+    assert row.time_before_seconds + row.time_after_seconds == 4 * 3600
+    for key in ('daily', 'sites'):
+        day = metrics[key][['drive_sec', 'drive_km', 'before_sec', 'after_sec', 'km_before', 'km_after']].sum()
+        assert day.drive_sec == 4 * 3600 and day.drive_km == pytest.approx(40)
+        assert (day.before_sec, day.after_sec) == (row.time_before_seconds, row.time_after_seconds)
+        assert (day.km_before, day.km_after) == pytest.approx((row.km_before, row.km_after))
+    # The merged segment counts on the site of its first row
+    assert metrics['sites'].set_index('site')['drive_sec'].to_dict() == {'A': 4 * 3600, 'B': 0}
@@ -0,0 +1,20 @@
+"""
+uploads.HashingSpool: the digest and the spill-to-disk flag of an upload.
+"""
+
+import hashlib
+
+from uploads import HashingSpool
+
+
+def test_spool_tracks_rollover():
+    for size, chunks, on_disk in ((10, [b'12345', b'12345'], False), (10, [b'12345', b'123456'], True),
+                                  (0, [b'x' * 100], False)):
+        spool = HashingSpool(size)
+        for chunk in chunks:
+            spool.write(chunk)
+        assert spool.on_disk is on_disk
+        assert spool.sha256.hexdigest() == hashlib.sha256(b''.join(chunks)).hexdigest()
+        spool.seek(0)
+        assert spool.read() == b''.join(chunks)
+        spool.close()
@@ -0,0 +1,67 @@
+"""
+Upload handling: uploaded files are parsed straight from the request's spool
+(in memory, moved to an anonymous temporary file only above a size threshold)
+and hashed while the request body is received, instead of being saved to
+UPLOAD_FOLDER and read back.
+"""
+
+import hashlib
+import os
+from tempfile import SpooledTemporaryFile
+
+from flask import Request, current_app
+
+# Uploads up to this size stay in memory (GPS_UPLOAD_SPOOL_MB)
+SPOOL_BYTES = int(float(os.environ.get('GPS_UPLOAD_SPOOL_MB', 32)) * 1024 * 1024)
+
+
+class HashingSpool(SpooledTemporaryFile):
+    """SpooledTemporaryFile that keeps the SHA-256 of everything written to it.
+    Above `max_size` it rolls over to an unnamed temporary file in `dir`, which
+    disappears when the spool is closed.
+    """
+
+    def __init__(self, max_size=SPOOL_BYTES, dir=None):
+        super().__init__(max_size=max_size, mode='w+b', dir=dir)
+        self.sha256 = hashlib.sha256()
+        self.max_size = max_size
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.bytes_written += len(data)
+        return super().write(data)
+
+    @property
+    def on_disk(self):
+        """Whether more than `max_size` bytes were written (0: never), the
+        point where SpooledTemporaryFile moves to its temporary file."""
+        return bool(self.max_size) and self.bytes_written > self.max_size
+
+
+class UploadRequest(Request):
+    """Request whose uploaded files are received into a HashingSpool of
+    UPLOAD_SPOOL_BYTES (app config) instead of Werkzeug's 500 KB spool."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        return HashingSpool(config.get('UPLOAD_SPOOL_BYTES', SPOOL_BYTES), dir=config.get('UPLOAD_FOLDER'))
+
+
+def upload_digest(file):
+    """SHA-256 (hex) of an uploaded FileStorage, computed while it was received."""
+    stream = file.stream
+    if isinstance(stream, HashingSpool):
+        return stream.sha256.hexdigest()
+    # Not received through UploadRequest: hash it now and rewind
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def spooled_to_disk(file):
+    """Whether the upload went over the spool threshold (for the timings)."""
+    stream = file.stream
+    return isinstance(stream, HashingSpool) and stream.on_disk